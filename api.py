@@ -0,0 +1,491 @@
+"""
+API Lookup - Layanan HTTP/JSON ringan untuk scanner barcode dan kiosk bengkel
+
+Server asyncio (stdlib, HTTP/1.1 keep-alive) di atas lapisan data utils.py, tanpa Streamlit.
+Pembacaan dilayani dari indeks hangat di memori: snapshot seluruh alat dan servis per kolom
+plus cache LRU payload per ID alat. Setiap request mengecek token versi penyimpanan, sehingga
+perubahan dari proses lain (aplikasi Streamlit, CLI) langsung terlihat; snapshot lalu dibangun
+ulang di background dan sementara itu alat dimuat per ID lewat utils. Panggilan utils yang
+memblokir dijalankan di thread pool; lookup dari indeks dijawab langsung di event loop.
+
+Endpoint:
+    GET  /                     status server dan ukuran indeks
+    GET  /alat/{id}            detail alat, agregat servis, dan 5 servis terbaru
+    GET  /alat/{id}/servis     riwayat servis lengkap (opsional ?limit=N, N terakhir)
+    POST /alat/batch           {"ids": [...]} -> {"ditemukan": {...}, "tidak_ditemukan": [...]}
+    POST /servis               satu objek / list objek servis (kolom seperti impor CSV)
+
+Cara menjalankan:
+    python api.py --host 127.0.0.1 --port 8600
+    BENGKEL_STORAGE=sqlite python api.py
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+import utils
+from utils import (
+    add_servis_many, baris_json, get_all_alat, get_all_servis, get_backend, get_scan_card,
+    get_versi_data, kolom_json,
+)
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+HOST = "127.0.0.1"
+PORT = 8600
+SERVIS_TERBARU = 5          # servis terbaru yang ikut di GET /alat/{id}
+BATCH_MAX = 500             # ID per POST /alat/batch
+BODY_MAX = 64 * 1024        # byte body request
+HEADER_MAX = 16 * 1024      # byte request line + header
+KAPASITAS_INDEX = 4096      # payload alat di cache LRU
+JEDA_BANGUN = 0.5           # detik data harus diam sebelum snapshot dibangun ulang
+KEEPALIVE_TIMEOUT = 30      # detik menunggu request berikutnya di koneksi yang sama
+WORKERS = 4
+
+STATUS_TEKS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    """Error yang dijawab ke klien sebagai {"error": pesan} dengan status tertentu"""
+
+    def __init__(self, status, pesan, **extra):
+        super().__init__(pesan)
+        self.status = status
+        self.body = {"error": pesan, **extra}
+
+
+# ==================== INDEKS HANGAT ====================
+
+class SnapshotData:
+    """Seluruh alat dan servis pada satu versi penyimpanan, per kolom dalam bentuk siap-JSON,
+    dengan index ID -> posisi baris; payload satu alat disusun dari sini tanpa menyentuh
+    pandas atau file"""
+
+    def __init__(self, versi, df_alat, df_servis):
+        self.versi = versi
+        self.alat = kolom_json(df_alat)
+        self.servis = kolom_json(df_servis)
+        self.idx_alat = {}
+        for pos, alat_id in enumerate(self.alat["ID"]):
+            self.idx_alat.setdefault(alat_id, pos)
+        self.idx_servis = {}
+        for pos, alat_id in enumerate(self.servis["ID_Alat"]):
+            self.idx_servis.setdefault(alat_id, []).append(pos)
+        # Payload alat yang berubah lewat tulis server ini sejak snapshot dibangun
+        self.tambalan = {}
+
+    def payload(self, alat_id):
+        if alat_id in self.tambalan:
+            return self.tambalan[alat_id]
+        pos = self.idx_alat.get(alat_id)
+        if pos is None:
+            return None
+        alat = {kolom: nilai[pos] for kolom, nilai in self.alat.items()}
+        servis = [
+            {kolom: nilai[p] for kolom, nilai in self.servis.items()}
+            for p in self.idx_servis.get(alat_id, ())
+        ]
+        return susun_payload(alat, servis)
+
+
+def bangun_snapshot():
+    """Snapshot lengkap; None jika data berubah selama dibaca (alat dan servis tidak sevesi)"""
+    utils.init_excel()
+    versi = get_versi_data()
+    df_alat, df_servis = get_all_alat(), get_all_servis()
+    if get_versi_data() != versi:
+        return None
+    return SnapshotData(versi, df_alat, df_servis)
+
+
+def muat_payload(alat_id):
+    """Payload satu alat dari kartu scan utils, dipakai selama snapshot belum siap"""
+    kartu = get_scan_card(alat_id)
+    if kartu is None:
+        return None
+    return susun_payload(baris_json(kartu["alat"]), baris_json(kartu["servis"]))
+
+
+def susun_payload(alat, servis):
+    """Detail untuk GET /alat/{id} (sudah di-encode) dan riwayat lengkap untuk /servis"""
+    tanggal = [s["Tanggal"] for s in servis if s["Tanggal"] is not None]
+    detail = {
+        "alat": alat,
+        "jumlah_servis": len(servis),
+        "total_biaya": sum(s["Biaya"] for s in servis),
+        "servis_terakhir": max(tanggal, default=None),
+        "servis_terbaru": servis[::-1][:SERVIS_TERBARU],
+    }
+    return {"detail": detail, "detail_json": _json_bytes(detail), "servis": servis}
+
+
+def _json_bytes(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class IndeksLookup:
+    """Indeks hangat: snapshot seluruh data plus cache LRU payload per ID alat
+
+    Keduanya hanya berlaku untuk satu token versi penyimpanan; begitu versi berubah (tulis
+    dari proses mana pun) cache dikosongkan dan snapshot dianggap basi sampai dibangun ulang.
+    Selama itu payload dimuat per ID dari utils. Payload None (alat tidak ada) ikut disimpan
+    agar scan ID asing tidak membaca ulang penyimpanan.
+    """
+
+    def __init__(self, kapasitas=KAPASITAS_INDEX):
+        self.kapasitas = kapasitas
+        self.versi = None
+        self.berubah_pada = float("-inf")
+        self.snapshot = None
+        self.tulis_sendiri = False
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def segarkan(self):
+        """Cek token versi; kosongkan cache jika data berubah. Selama tulis server ini sendiri
+        berjalan, versi antara diabaikan (yang berubah hanya alat yang ditulis, dan hasilnya
+        baru dijanjikan setelah request tulis selesai)"""
+        versi = get_versi_data()
+        with self._lock:
+            if versi != self.versi and not self.tulis_sendiri:
+                self._data.clear()
+                self.versi = versi
+                self.berubah_pada = time.monotonic()
+
+    def siap(self):
+        return self.snapshot is not None and self.snapshot.versi == self.versi
+
+    def pasang(self, snapshot):
+        """Pakai snapshot baru jika masih sesuai versi terkini"""
+        with self._lock:
+            if snapshot is not None and snapshot.versi == self.versi:
+                self.snapshot = snapshot
+                return True
+            return False
+
+    def ambil(self, alat_id):
+        """(True, payload) dari cache atau snapshot, (False, None) jika harus dimuat dari utils"""
+        with self._lock:
+            if alat_id in self._data:
+                self._data.move_to_end(alat_id)
+                self.hit += 1
+                return True, self._data[alat_id]
+            self.miss += 1
+            if not self.siap():
+                return False, None
+            snapshot, versi = self.snapshot, self.versi
+        payload = snapshot.payload(alat_id)
+        self.simpan(alat_id, versi, payload)
+        return True, payload
+
+    def simpan(self, alat_id, versi, payload):
+        with self._lock:
+            if versi != self.versi:
+                return
+            self._simpan(alat_id, payload)
+
+    def _simpan(self, alat_id, payload):
+        self._data[alat_id] = payload
+        self._data.move_to_end(alat_id)
+        while len(self._data) > self.kapasitas:
+            self._data.popitem(last=False)
+
+    def mulai_tulis(self, sebelum):
+        """Tandai awal tulis server ini sendiri (dipanggil di dalam kunci tulis)"""
+        with self._lock:
+            self.tulis_sendiri = self.versi == sebelum
+
+    def selesai_tulis(self, sebelum, sesudah, payloads):
+        """Ikuti tulis server ini sendiri tanpa membuang indeks: hanya alat yang berubah
+        diganti. Berlaku jika indeks tepat di versi `sebelum` saat tulis dimulai; jika tidak
+        (atau tulis gagal, payloads None), perubahan ditangani seperti tulis dari luar"""
+        with self._lock:
+            diikuti, self.tulis_sendiri = self.tulis_sendiri, False
+            if not diikuti or payloads is None or self.versi != sebelum:
+                return False
+            if self.snapshot is not None and self.snapshot.versi == sebelum:
+                self.snapshot.tambalan.update(payloads)
+                self.snapshot.versi = sesudah
+            for alat_id, payload in payloads.items():
+                self._simpan(alat_id, payload)
+            self.versi = sesudah
+            return True
+
+
+# ==================== SERVER ====================
+
+class LookupServer:
+    """Server HTTP/1.1 minimal: routing, parsing body JSON, dan cache lookup"""
+
+    ROUTES = [
+        ("GET", re.compile(r"^/$"), "status"),
+        ("POST", re.compile(r"^/alat/batch$"), "batch"),
+        ("GET", re.compile(r"^/alat/([^/]+)/servis$"), "servis_alat"),
+        ("GET", re.compile(r"^/alat/([^/]+)$"), "alat"),
+        ("POST", re.compile(r"^/servis$"), "tambah_servis"),
+    ]
+
+    def __init__(self, workers=WORKERS, kapasitas=KAPASITAS_INDEX):
+        self.indeks = IndeksLookup(kapasitas)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self._tulis = asyncio.Lock()
+        self._membangun = None
+
+    async def _jalankan(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _payload(self, alat_id):
+        ada, payload = self.indeks.ambil(alat_id)
+        if ada:
+            return payload
+        versi = self.indeks.versi
+        payload = await self._jalankan(muat_payload, alat_id)
+        self.indeks.simpan(alat_id, versi, payload)
+        return payload
+
+    def _payload_banyak(self, ids, versi):
+        """Muat payload beberapa alat sekaligus di satu giliran thread pool"""
+        hasil = {}
+        for alat_id in ids:
+            hasil[alat_id] = muat_payload(alat_id)
+            self.indeks.simpan(alat_id, versi, hasil[alat_id])
+        return hasil
+
+    def _tambah_servis(self, df):
+        """add_servis_many lalu muat ulang alat yang terkena, semuanya di dalam kunci tulis:
+        perubahan versi selama kunci dipegang pasti hanya tulis ini"""
+        with get_backend().write_lock():
+            sebelum = get_versi_data()
+            self.indeks.mulai_tulis(sebelum)
+            payloads = None
+            try:
+                hasil = add_servis_many(df)
+                gagal = {baris - 2 for baris, _ in hasil["errors"]}
+                ids_alat = {
+                    str(alat_id).strip() for pos, alat_id in enumerate(df["ID_Alat"].tolist())
+                    if pos not in gagal
+                } if hasil["ids"] else set()
+                payloads = {alat_id: muat_payload(alat_id) for alat_id in ids_alat}
+            finally:
+                self.indeks.selesai_tulis(sebelum, get_versi_data(), payloads)
+        return hasil
+
+    # ---------- handler ----------
+
+    def _cek_snapshot(self):
+        """Bangun ulang snapshot di background bila basi dan data sudah diam JEDA_BANGUN detik,
+        agar rentetan tulis tidak memicu pembangunan berulang yang langsung basi lagi"""
+        if self.indeks.siap() or (self._membangun is not None and not self._membangun.done()):
+            return
+        if time.monotonic() - self.indeks.berubah_pada >= JEDA_BANGUN:
+            self._membangun = asyncio.create_task(self.bangun())
+
+    async def bangun(self):
+        mulai = time.perf_counter()
+        snapshot = await self._jalankan(bangun_snapshot)
+        if self.indeks.pasang(snapshot):
+            logger.info("Snapshot %d alat / %d servis dibangun dalam %.2f detik",
+                        len(snapshot.idx_alat), len(snapshot.servis["ID_Servis"]),
+                        time.perf_counter() - mulai)
+
+    async def status(self, query, body):
+        return 200, {
+            "status": "ok", "backend": utils.STORAGE_BACKEND, "snapshot": self.indeks.siap(),
+            "cache": len(self.indeks), "hit": self.indeks.hit, "miss": self.indeks.miss,
+        }
+
+    async def alat(self, query, body, alat_id):
+        payload = await self._payload(alat_id)
+        if payload is None:
+            raise HttpError(404, f"Alat dengan ID {alat_id} tidak ditemukan")
+        return 200, payload["detail_json"]
+
+    async def servis_alat(self, query, body, alat_id):
+        payload = await self._payload(alat_id)
+        if payload is None:
+            raise HttpError(404, f"Alat dengan ID {alat_id} tidak ditemukan")
+        servis = payload["servis"]
+        if "limit" in query:
+            try:
+                limit = int(query["limit"][0])
+            except ValueError:
+                raise HttpError(400, "limit harus bilangan bulat")
+            servis = servis[-limit:] if limit > 0 else []
+        return 200, {"ID_Alat": alat_id, "jumlah": len(payload["servis"]), "servis": servis}
+
+    async def batch(self, query, body):
+        ids = body.get("ids") if isinstance(body, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            raise HttpError(400, 'Body harus {"ids": ["ID", ...]}')
+        if len(ids) > BATCH_MAX:
+            raise HttpError(413, f"Maksimal {BATCH_MAX} ID per batch")
+        hasil, belum = {}, []
+        for alat_id in dict.fromkeys(ids):
+            ada, payload = self.indeks.ambil(alat_id)
+            if ada:
+                hasil[alat_id] = payload
+            else:
+                belum.append(alat_id)
+        if belum:
+            hasil.update(await self._jalankan(self._payload_banyak, belum, self.indeks.versi))
+        return 200, {
+            "ditemukan": {i: p["detail"] for i, p in hasil.items() if p is not None},
+            "tidak_ditemukan": [i for i, p in hasil.items() if p is None],
+        }
+
+    async def tambah_servis(self, query, body):
+        daftar = body if isinstance(body, list) else [body]
+        if not daftar or not all(isinstance(row, dict) for row in daftar):
+            raise HttpError(400, "Body harus objek servis atau list objek servis")
+        if len(daftar) > BATCH_MAX:
+            raise HttpError(413, f"Maksimal {BATCH_MAX} servis per request")
+        df = pd.DataFrame([{"Tanggal": date.today().isoformat(), **row} for row in daftar])
+        async with self._tulis:
+            hasil = await self._jalankan(self._tambah_servis, df)
+        # Nomor baris impor dimulai dari 2 (header CSV); di sini indeks list mulai 1
+        errors = [{"baris": baris - 1, "pesan": pesan} for baris, pesan in hasil["errors"]]
+        if not hasil["ids"]:
+            raise HttpError(400, "Data servis tidak valid", errors=errors)
+        if isinstance(body, list):
+            return 201, {"ID_Servis": hasil["ids"], "errors": errors}
+        return 201, {"ID_Servis": hasil["ids"][0]}
+
+    # ---------- HTTP ----------
+
+    async def _proses(self, method, target, body_bytes):
+        url = urlsplit(target)
+        path = unquote(url.path)
+        cocok_path = False
+        for route_method, pola, nama in self.ROUTES:
+            cocok = pola.match(path)
+            if not cocok:
+                continue
+            cocok_path = True
+            if route_method != method:
+                continue
+            body = None
+            if method == "POST":
+                try:
+                    body = json.loads(body_bytes or b"null")
+                except ValueError:
+                    raise HttpError(400, "Body bukan JSON yang valid")
+            # Token versi hanya stat / baca header file, cukup murah dicek di event loop
+            self.indeks.segarkan()
+            self._cek_snapshot()
+            return await getattr(self, nama)(parse_qs(url.query), body, *cocok.groups())
+        if cocok_path:
+            raise HttpError(405, f"Metode {method} tidak didukung untuk {path}")
+        raise HttpError(404, f"Path {path} tidak dikenal")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._kirim(writer, 413, {"error": "Header terlalu besar"}, tutup=True)
+                    break
+                baris = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, versi_http = baris[0].split(" ", 2)
+                except ValueError:
+                    await self._kirim(writer, 400, {"error": "Request line tidak valid"}, tutup=True)
+                    break
+                header = {}
+                for h in baris[1:]:
+                    if ":" in h:
+                        kunci, nilai = h.split(":", 1)
+                        header[kunci.strip().lower()] = nilai.strip()
+                koneksi = header.get("connection", "").lower()
+                tutup = koneksi == "close" or (versi_http == "HTTP/1.0" and koneksi != "keep-alive")
+                try:
+                    panjang = int(header.get("content-length", 0))
+                except ValueError:
+                    panjang = -1
+                if panjang < 0 or panjang > BODY_MAX:
+                    await self._kirim(writer, 413, {"error": f"Body maksimal {BODY_MAX} byte"}, tutup=True)
+                    break
+                try:
+                    body_bytes = await reader.readexactly(panjang) if panjang else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                try:
+                    status, data = await self._proses(method.upper(), target, body_bytes)
+                except HttpError as e:
+                    status, data = e.status, e.body
+                except Exception:
+                    logger.exception("Gagal memproses %s %s", method, target)
+                    status, data = 500, {"error": "Kesalahan internal server"}
+                await self._kirim(writer, status, data, tutup=tutup)
+                if tutup:
+                    break
+        finally:
+            writer.close()
+
+    async def _kirim(self, writer, status, data, tutup=False):
+        body = data if isinstance(data, bytes) else _json_bytes(data)
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEKS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'close' if tutup else 'keep-alive'}\r\n\r\n".encode("latin-1") + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def serve(host=HOST, port=PORT, warmup=True, workers=WORKERS):
+    server = LookupServer(workers=workers)
+    # Muat penyimpanan sekali sebelum menerima koneksi
+    await server._jalankan(utils.init_excel)
+    tcp = await asyncio.start_server(server.handle, host, port, limit=HEADER_MAX)
+    logger.info("API lookup (%s) di http://%s:%d", utils.STORAGE_BACKEND, host, port)
+    if warmup:
+        server.indeks.segarkan()
+        server._membangun = asyncio.create_task(server.bangun())
+    async with tcp:
+        await tcp.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="thread untuk baca/tulis utils")
+    parser.add_argument("--tanpa-warmup", action="store_true",
+                        help="jangan bangun snapshot saat start (dibangun saat request pertama)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, warmup=not args.tanpa_warmup, workers=args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,21 @@ import streamlit as st
 from streamlit_option_menu import option_menu
 import pandas as pd
 from datetime import date
-import matplotlib.pyplot as plt
 
 # Import fungsi dari utils.py
 from utils import (
-    init_excel, init_folders,
-    get_all_alat, get_alat_by_id, add_alat, update_alat, delete_alat, filter_alat,
-    get_all_servis, get_riwayat_servis, add_servis,
+    init_excel, init_folders, get_backend, export_to_excel,
+    get_all_alat, get_alat_by_id, get_scan_card, add_alat, update_alat, delete_alat, filter_alat, autocomplete_id,
+    get_all_servis, add_servis, join_nama_alat,
     get_statistik, get_chart_kondisi, get_servis_terbaru,
+    CHART_RENDERER, render_chart_kondisi, chart_kondisi_spec,
     generate_qr, save_qr_to_file, get_qr_file_path, decode_qr,
-    validate_input
+    export_qr_zip, export_qr_label_sheet, LABEL_COLUMNS, LABEL_ROWS,
+    decode_qr_batch, reconcile_stocktake,
+    validate_input, read_import_file, add_alat_many, add_servis_many, update_kondisi_many,
+    get_alat_page, get_servis_page, page_count, alat_options, get_alat_aggregate, PAGE_SIZE,
+    get_biaya_periode, get_biaya_per_jenis, get_top_alat_biaya, export_servis, FORMAT_EXPORT,
+    start_rerun, mark_section, finish_rerun
 )
 
 # ==================== KONFIGURASI STREAMLIT ====================
@@ -26,25 +31,81 @@ st.set_page_config(
     layout="wide"
 )
 
-# Inisialisasi
-init_excel()
-init_folders()
+# Inisialisasi: sekali per proses server, bukan setiap rerun
+@st.cache_resource(show_spinner=False)
+def inisialisasi():
+    init_folders()
+    init_excel()
+    return True
+
+metrik_rerun = start_rerun()
+mark_section("inisialisasi")
+inisialisasi()
+
+def pilih_halaman(total, key):
+    """Navigasi nomor halaman untuk tabel besar; kembalikan halaman aktif"""
+    jumlah_halaman = page_count(total, PAGE_SIZE)
+    if jumlah_halaman <= 1:
+        return 1
+    # Filter/data berubah sehingga halaman tersimpan melewati halaman terakhir: kembali ke halaman 1
+    if st.session_state.get(key, 1) > jumlah_halaman:
+        del st.session_state[key]
+    return st.number_input(
+        f"Halaman (1-{jumlah_halaman})", min_value=1, max_value=jumlah_halaman, value=1, step=1, key=key
+    )
+
+def tampilkan_kartu_scan(kartu):
+    """Detail alat dan ringkasan servis hasil scan QR (dari get_scan_card)"""
+    alat_data = kartu['alat']
+    st.subheader("Detail Alat")
+    st.write(f"**ID:** {alat_data['ID']}")
+    st.write(f"**Nama:** {alat_data['Nama']}")
+    st.write(f"**Kondisi:** {alat_data['Kondisi']}")
+    tgl_beli = alat_data['Tanggal_Beli']
+    st.write(f"**Tanggal Beli:** {tgl_beli:%Y-%m-%d}" if pd.notna(tgl_beli) else "**Tanggal Beli:** -")
+    st.write(f"**Keterangan:** {alat_data['Keterangan'] if pd.notna(alat_data['Keterangan']) else '-'}")
+    st.write(
+        f"**Servis:** {kartu['jumlah']} kali, total Rp {kartu['biaya']:,.0f}, "
+        f"terakhir {kartu['terakhir'] or '-'}"
+    )
+
+# Kolom tanggal (datetime64) ditampilkan tanpa jam
+KOLOM_TANGGAL = {
+    "Tanggal": st.column_config.DateColumn("Tanggal", format="YYYY-MM-DD"),
+    "Tanggal_Beli": st.column_config.DateColumn("Tanggal_Beli", format="YYYY-MM-DD"),
+}
 
 # ==================== SIDEBAR MENU ====================
+mark_section("sidebar")
 with st.sidebar:
     st.title("Bengkel Motor")
     st.divider()
     selected = option_menu(
         menu_title="Menu Utama",
-        options=["Dashboard", "Data Alat", "Scan QR", "Riwayat Servis"],
+        options=["Dashboard", "Data Alat", "Scan QR", "Riwayat Servis", "Analitik Biaya"],
         icons=None,
         menu_icon=None,
         default_index=0,
     )
+    if metrik_rerun is not None:
+        metrik_rerun["page"] = selected
+    
+    # Export laporan Excel saat memakai backend SQLite
+    if get_backend().name == "sqlite":
+        st.divider()
+        if st.button("Siapkan Export Excel", use_container_width=True):
+            st.download_button(
+                label="Download Excel",
+                data=export_to_excel().getvalue(),
+                file_name="data_peralatan.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
 
 # ==================== HALAMAN DASHBOARD ====================
 if selected == "Dashboard":
     st.title("Dashboard Peralatan Bengkel")
+    mark_section("Dashboard")
     
     stats = get_statistik()
     
@@ -62,25 +123,16 @@ if selected == "Dashboard":
     st.divider()
     
     # Grafik
+    mark_section("Dashboard: grafik")
     col_chart, col_empty = st.columns([1, 2])
     with col_chart:
         st.subheader("Grafik Kondisi Alat")
         chart_kondisi = get_chart_kondisi()
         if chart_kondisi:
-            fig1, ax1 = plt.subplots(figsize=(3, 3))
-            fig1.patch.set_alpha(0)
-            ax1.set_facecolor('none')
-            colors = ['#28a745', '#ffc107', '#dc3545']
-            ax1.pie(
-                chart_kondisi.values(), 
-                labels=chart_kondisi.keys(), 
-                autopct='%1.0f%%',
-                colors=colors[:len(chart_kondisi)],
-                startangle=90,
-                textprops={'color': 'white'}
-            )
-            ax1.axis('equal')
-            st.pyplot(fig1, transparent=True)
+            if CHART_RENDERER == "vega":
+                st.vega_lite_chart(spec=chart_kondisi_spec(chart_kondisi), use_container_width=True)
+            else:
+                st.image(render_chart_kondisi(chart_kondisi))
         else:
             st.info("Belum ada data.")
     
@@ -98,28 +150,31 @@ if selected == "Dashboard":
         st.subheader("Catatan Servis Terbaru")
         df_terbaru = get_servis_terbaru(5)
         if len(df_terbaru) > 0:
-            st.dataframe(df_terbaru, use_container_width=True, hide_index=True)
+            st.dataframe(df_terbaru, use_container_width=True, hide_index=True, column_config=KOLOM_TANGGAL)
         else:
             st.info("Belum ada catatan servis.")
     
     st.divider()
     
     # Daftar Semua Alat
+    mark_section("Dashboard: daftar alat")
     st.subheader("Daftar Semua Alat")
-    df_alat = get_all_alat()
-    if len(df_alat) > 0:
-        st.dataframe(df_alat, use_container_width=True, hide_index=True)
+    if stats['total'] > 0:
+        halaman = pilih_halaman(stats['total'], "hal_dashboard")
+        st.dataframe(get_alat_page(halaman)["rows"], use_container_width=True, hide_index=True, column_config=KOLOM_TANGGAL)
     else:
         st.info("Belum ada data alat. Silakan tambah alat baru di menu Data Alat.")
 
 # ==================== HALAMAN DATA ALAT ====================
 elif selected == "Data Alat":
     st.title("Manajemen Data Alat")
+    mark_section("Data Alat")
     
-    tab1, tab2 = st.tabs(["Tambah Alat Baru", "Daftar Alat"])
+    tab1, tab2, tab3 = st.tabs(["Tambah Alat Baru", "Daftar Alat", "Import CSV/XLSX"])
     
     with tab1:
         st.subheader("Form Tambah Alat Baru")
+        mark_section("Data Alat: tambah")
         
         with st.form("form_tambah_alat", clear_on_submit=True):
             nama = st.text_input("Nama Alat *", placeholder="Contoh: Kunci Pas 10mm")
@@ -142,13 +197,17 @@ elif selected == "Data Alat":
     
     with tab2:
         st.subheader("Daftar Alat")
+        mark_section("Data Alat: daftar")
         
         # Filter Section
         st.write("**Filter Data:**")
         col_filter1, col_filter2 = st.columns(2)
         
         with col_filter1:
-            keyword = st.text_input("Cari Nama/ID", placeholder="Ketik untuk mencari...")
+            keyword = st.text_input("Cari Nama/ID/Keterangan", placeholder="Ketik untuk mencari...")
+            saran_id = autocomplete_id(keyword, limit=5)
+            if saran_id:
+                st.caption("Saran ID: " + ", ".join(saran_id))
         with col_filter2:
             filter_kondisi = st.selectbox(
                 "Kondisi",
@@ -156,85 +215,185 @@ elif selected == "Data Alat":
                 key="filter_kond"
             )
         
-        # Tampilkan data dengan filter
-        df_alat = filter_alat(keyword, filter_kondisi)
+        # Tampilkan data dengan filter: hanya halaman aktif yang diambil dari utils
+        filter_data = dict(keyword=keyword, kondisi=filter_kondisi)
+        halaman_aktif = st.session_state.get("hal_daftar_alat", 1)
+        hasil = get_alat_page(halaman_aktif, **filter_data)
+        total_alat = hasil["total"]
         
-        if len(df_alat) > 0:
-            st.dataframe(df_alat, use_container_width=True, hide_index=True)
-            st.write(f"Menampilkan {len(df_alat)} data")
-            
-            st.divider()
+        if total_alat > 0:
+            halaman = pilih_halaman(total_alat, "hal_daftar_alat")
+            if halaman != halaman_aktif:
+                hasil = get_alat_page(halaman, **filter_data)
+            df_halaman = hasil["rows"]
+            st.dataframe(df_halaman, use_container_width=True, hide_index=True, column_config=KOLOM_TANGGAL)
+            st.write(f"Menampilkan {len(df_halaman)} dari {total_alat} data")
             
-            # Edit Section
-            st.subheader("Edit / Hapus Alat")
+            # Cetak label QR massal untuk semua alat sesuai filter (baru dibaca saat tombol diklik)
+            with st.expander("Cetak Label QR Massal"):
+                format_label = st.selectbox(
+                    "Format",
+                    options=["Lembar Label A4 (PDF)", "Lembar Label A4 (PNG)", "Arsip ZIP (PNG per alat)"],
+                    key="format_label"
+                )
+                if st.button(f"Buat Label untuk {total_alat} Alat", use_container_width=True):
+                    with st.spinner("Membuat QR Code..."):
+                        df_alat = filter_alat(keyword, filter_kondisi)
+                        if format_label.endswith("(PDF)"):
+                            data_label = export_qr_label_sheet(df_alat, "PDF").getvalue()
+                            nama_file, mime = "label_qr.pdf", "application/pdf"
+                        elif format_label.endswith("(PNG)"):
+                            data_label = export_qr_label_sheet(df_alat, "PNG").getvalue()
+                            if len(df_alat) > LABEL_COLUMNS * LABEL_ROWS:
+                                nama_file, mime = "label_qr.zip", "application/zip"
+                            else:
+                                nama_file, mime = "label_qr.png", "image/png"
+                        else:
+                            data_label = export_qr_zip(df_alat).getvalue()
+                            nama_file, mime = "qr_alat.zip", "application/zip"
+                    st.session_state["label_qr"] = (data_label, nama_file, mime)
+                
+                if "label_qr" in st.session_state:
+                    data_label, nama_file, mime = st.session_state["label_qr"]
+                    st.download_button(
+                        label=f"Download {nama_file}",
+                        data=data_label,
+                        file_name=nama_file,
+                        mime=mime,
+                        use_container_width=True
+                    )
+        else:
+            st.info("Tidak ada data yang sesuai filter.")
+        
+        st.divider()
+        
+        # Edit Section
+        st.subheader("Edit / Hapus Alat")
+        
+        # Dropdown "ID - Nama" dari index pencarian (seluruh inventaris, bukan hanya halaman ini)
+        col_cari_edit, col_pilih_edit = st.columns(2)
+        with col_cari_edit:
+            cari_edit = st.text_input(
+                "Cari Alat (Nama/ID)", placeholder="Ketik untuk mempersempit pilihan...", key="cari_edit_alat"
+            )
+        with col_pilih_edit:
+            selected_option = st.selectbox("Pilih Alat", options=alat_options(cari_edit), key="edit_select")
+        
+        if selected_option:
+            selected_id = selected_option.split(" - ")[0]
+            alat_data = get_alat_by_id(selected_id)
             
-            # Dropdown dengan format "ID - Nama"
-            alat_options = [f"{row['ID']} - {row['Nama']}" for _, row in df_alat.iterrows()]
-            selected_option = st.selectbox("Pilih Alat", options=alat_options, key="edit_select")
+            if alat_data:
+                col_edit, col_qr = st.columns([2, 1])
+                
+                with col_edit:
+                    with st.form("form_edit_alat"):
+                        nama_edit = st.text_input("Nama Alat", value=alat_data['Nama'])
+                        kondisi_options = ["Baik", "Rusak Ringan", "Rusak Berat"]
+                        kondisi_index = kondisi_options.index(alat_data['Kondisi']) if alat_data['Kondisi'] in kondisi_options else 0
+                        kondisi_edit = st.selectbox("Kondisi", options=kondisi_options, index=kondisi_index)
+                        
+                        try:
+                            tgl_beli_value = pd.to_datetime(alat_data['Tanggal_Beli']).date()
+                        except:
+                            tgl_beli_value = date.today()
+                        tanggal_beli_edit = st.date_input("Tanggal Beli", value=tgl_beli_value)
+                        keterangan_edit = st.text_area("Keterangan", value=str(alat_data['Keterangan']) if pd.notna(alat_data['Keterangan']) else "")
+                        
+                        col_btn1, col_btn2 = st.columns(2)
+                        
+                        with col_btn1:
+                            btn_update = st.form_submit_button("Update", use_container_width=True)
+                        with col_btn2:
+                            btn_delete = st.form_submit_button("Hapus", use_container_width=True, type="secondary")
+                        
+                        if btn_update:
+                            update_alat(selected_id, nama_edit, kondisi_edit, str(tanggal_beli_edit), keterangan_edit)
+                            st.success("Data alat berhasil diupdate!")
+                            st.rerun()
+                        
+                        if btn_delete:
+                            delete_alat(selected_id)
+                            st.success("Alat berhasil dihapus!")
+                            st.rerun()
+                
+                with col_qr:
+                    st.subheader("QR Code")
+                    qr_bytes = generate_qr(selected_id)
+                    st.image(qr_bytes, caption=f"QR: {selected_id}", width=150)
+                    st.download_button(
+                        label="Download QR",
+                        data=qr_bytes.getvalue(),
+                        file_name=f"QR_{selected_id}.png",
+                        mime="image/png",
+                        use_container_width=True
+                    )
+                    if st.button("Simpan ke /qr", use_container_width=True):
+                        file_path = save_qr_to_file(selected_id)
+                        st.success(f"Disimpan: {file_path}")
+    
+    with tab3:
+        st.subheader("Import Data dari CSV/XLSX")
+        mark_section("Data Alat: import")
+        
+        jenis_import = st.radio(
+            "Jenis Import",
+            options=["Data Alat", "Catatan Servis", "Update Kondisi (Stocktake)"],
+            horizontal=True
+        )
+        kolom_import = {
+            "Data Alat": "Nama, Kondisi, Tanggal_Beli, Keterangan",
+            "Catatan Servis": "ID_Alat, Tanggal, Jenis_Servis, Biaya, Keterangan",
+            "Update Kondisi (Stocktake)": "ID, Kondisi",
+        }
+        st.caption(f"Kolom yang dibaca: {kolom_import[jenis_import]}")
+        
+        import_file = st.file_uploader("Pilih file", type=['csv', 'xlsx'], key="import_file")
+        
+        if import_file is not None:
+            try:
+                df_import = read_import_file(import_file, import_file.name)
+            except Exception as e:
+                df_import = None
+                st.error(f"File tidak dapat dibaca: {e}")
             
-            if selected_option:
-                selected_id = selected_option.split(" - ")[0]
-                alat_data = get_alat_by_id(selected_id)
+            if df_import is not None:
+                st.write(f"**Pratinjau** ({len(df_import)} baris):")
+                st.dataframe(df_import.head(20), use_container_width=True, hide_index=True)
                 
-                if alat_data:
-                    col_edit, col_qr = st.columns([2, 1])
+                if st.button("Proses Import", use_container_width=True):
+                    progress_bar = st.progress(0.0, text="Memulai import...")
                     
-                    with col_edit:
-                        with st.form("form_edit_alat"):
-                            nama_edit = st.text_input("Nama Alat", value=alat_data['Nama'])
-                            kondisi_options = ["Baik", "Rusak Ringan", "Rusak Berat"]
-                            kondisi_index = kondisi_options.index(alat_data['Kondisi']) if alat_data['Kondisi'] in kondisi_options else 0
-                            kondisi_edit = st.selectbox("Kondisi", options=kondisi_options, index=kondisi_index)
-                            
-                            try:
-                                tgl_beli_value = pd.to_datetime(alat_data['Tanggal_Beli']).date()
-                            except:
-                                tgl_beli_value = date.today()
-                            tanggal_beli_edit = st.date_input("Tanggal Beli", value=tgl_beli_value)
-                            keterangan_edit = st.text_area("Keterangan", value=str(alat_data['Keterangan']) if pd.notna(alat_data['Keterangan']) else "")
-                            
-                            col_btn1, col_btn2 = st.columns(2)
-                            
-                            with col_btn1:
-                                btn_update = st.form_submit_button("Update", use_container_width=True)
-                            with col_btn2:
-                                btn_delete = st.form_submit_button("Hapus", use_container_width=True, type="secondary")
-                            
-                            if btn_update:
-                                update_alat(selected_id, nama_edit, kondisi_edit, str(tanggal_beli_edit), keterangan_edit)
-                                st.success("Data alat berhasil diupdate!")
-                                st.rerun()
-                            
-                            if btn_delete:
-                                delete_alat(selected_id)
-                                st.success("Alat berhasil dihapus!")
-                                st.rerun()
+                    def update_progress(fraksi, pesan):
+                        progress_bar.progress(fraksi, text=pesan)
                     
-                    with col_qr:
-                        st.subheader("QR Code")
-                        qr_bytes = generate_qr(selected_id)
-                        st.image(qr_bytes, caption=f"QR: {selected_id}", width=150)
-                        st.download_button(
-                            label="Download QR",
-                            data=qr_bytes.getvalue(),
-                            file_name=f"QR_{selected_id}.png",
-                            mime="image/png",
-                            use_container_width=True
-                        )
-                        if st.button("Simpan ke /qr", use_container_width=True):
-                            file_path = save_qr_to_file(selected_id)
-                            st.success(f"Disimpan: {file_path}")
-        else:
-            st.info("Tidak ada data yang sesuai filter.")
+                    if jenis_import == "Data Alat":
+                        hasil = add_alat_many(df_import, progress=update_progress)
+                        jumlah = len(hasil['ids'])
+                    elif jenis_import == "Catatan Servis":
+                        hasil = add_servis_many(df_import, progress=update_progress)
+                        jumlah = len(hasil['ids'])
+                    else:
+                        hasil = update_kondisi_many(df_import, progress=update_progress)
+                        jumlah = hasil['updated']
+                    
+                    if jumlah > 0:
+                        st.success(f"{jumlah} baris berhasil diproses.")
+                    if hasil['errors']:
+                        st.warning(f"{len(hasil['errors'])} kesalahan ditemukan, baris tersebut dilewati:")
+                        df_errors = pd.DataFrame(hasil['errors'], columns=["Baris", "Kesalahan"])
+                        st.dataframe(df_errors, use_container_width=True, hide_index=True)
 
 # ==================== HALAMAN SCAN QR ====================
 elif selected == "Scan QR":
     st.title("Scan QR Code")
+    mark_section("Scan QR")
     
-    tab_scan1, tab_scan2 = st.tabs(["Scan dengan Kamera", "Upload Gambar"])
+    tab_scan1, tab_scan2, tab_scan3 = st.tabs(["Scan dengan Kamera", "Upload Gambar", "Stocktake Massal"])
     
     with tab_scan1:
         st.subheader("Scan dengan Kamera")
+        mark_section("Scan QR: kamera")
         camera_image = st.camera_input("Arahkan kamera ke QR Code")
         
         if camera_image is not None:
@@ -243,20 +402,52 @@ elif selected == "Scan QR":
             
             if alat_id:
                 st.success(f"QR Code terdeteksi: {alat_id}")
-                alat_data = get_alat_by_id(alat_id)
+                kartu = get_scan_card(alat_id)
                 
-                if alat_data:
-                    st.subheader("Detail Alat")
-                    st.write(f"**ID:** {alat_data['ID']}")
-                    st.write(f"**Nama:** {alat_data['Nama']}")
-                    st.write(f"**Kondisi:** {alat_data['Kondisi']}")
+                if kartu:
+                    tampilkan_kartu_scan(kartu)
                 else:
                     st.warning(f"Alat dengan ID {alat_id} tidak ditemukan.")
             else:
                 st.info("Arahkan kamera ke QR Code dan ambil foto.")
     
+    with tab_scan3:
+        st.subheader("Stocktake Massal")
+        mark_section("Scan QR: stocktake")
+        st.caption("Upload banyak foto rak (boleh berisi beberapa QR per foto) atau file ZIP berisi foto.")
+        stocktake_files = st.file_uploader(
+            "Pilih foto / ZIP",
+            type=['png', 'jpg', 'jpeg', 'zip'],
+            accept_multiple_files=True,
+            key="stocktake_files"
+        )
+        
+        if stocktake_files and st.button("Proses Stocktake", use_container_width=True):
+            with st.spinner("Membaca QR Code..."):
+                hasil_decode = decode_qr_batch([(f.name, f.getvalue()) for f in stocktake_files])
+                laporan = reconcile_stocktake(hasil_decode)
+            
+            col_st1, col_st2, col_st3 = st.columns(3)
+            with col_st1:
+                st.metric(label="Alat Terscan", value=len(laporan['terlihat']))
+            with col_st2:
+                st.metric(label="Belum Terscan", value=len(laporan['tidak_terscan']))
+            with col_st3:
+                st.metric(label="ID Tidak Dikenal", value=len(laporan['tidak_dikenal']))
+            
+            st.write("**Alat yang terscan**")
+            st.dataframe(laporan['terlihat'], use_container_width=True, hide_index=True)
+            st.write("**Alat yang tidak terscan**")
+            st.dataframe(laporan['tidak_terscan'], use_container_width=True, hide_index=True)
+            if len(laporan['tidak_dikenal']) > 0:
+                st.write("**ID tidak dikenal**")
+                st.dataframe(laporan['tidak_dikenal'], use_container_width=True, hide_index=True)
+            if laporan['gagal']:
+                st.warning("Tidak ada QR terbaca pada: " + ", ".join(h['file'] for h in laporan['gagal']))
+    
     with tab_scan2:
         st.subheader("Upload Gambar QR Code")
+        mark_section("Scan QR: upload")
         uploaded_file = st.file_uploader("Pilih file gambar QR", type=['png', 'jpg', 'jpeg'])
     
     if uploaded_file is not None:
@@ -267,19 +458,15 @@ elif selected == "Scan QR":
         
         image_bytes = uploaded_file.getvalue()
         alat_id = decode_qr(image_bytes)
+        # Detail, riwayat, dan ringkasan servis dari satu snapshot data
+        kartu = get_scan_card(alat_id) if alat_id else None
         
         with col2:
             if alat_id:
                 st.success(f"QR Code terdeteksi: {alat_id}")
-                alat_data = get_alat_by_id(alat_id)
                 
-                if alat_data:
-                    st.subheader("Detail Alat")
-                    st.write(f"**ID:** {alat_data['ID']}")
-                    st.write(f"**Nama:** {alat_data['Nama']}")
-                    st.write(f"**Kondisi:** {alat_data['Kondisi']}")
-                    st.write(f"**Tanggal Beli:** {alat_data['Tanggal_Beli']}")
-                    st.write(f"**Keterangan:** {alat_data['Keterangan'] if pd.notna(alat_data['Keterangan']) else '-'}")
+                if kartu:
+                    tampilkan_kartu_scan(kartu)
                 else:
                     st.warning(f"Alat dengan ID {alat_id} tidak ditemukan dalam database.")
             else:
@@ -287,17 +474,17 @@ elif selected == "Scan QR":
         
         # Jika QR terdeteksi dan alat ditemukan, tampilkan fitur tambahan
         if alat_id:
-            alat_data = get_alat_by_id(alat_id)
+            alat_data = kartu['alat'] if kartu else None
             
             if alat_data:
                 st.divider()
                 
                 # Riwayat Servis
                 st.subheader("Riwayat Servis")
-                df_servis = get_riwayat_servis(alat_id)
+                df_servis = kartu['servis']
                 
                 if len(df_servis) > 0:
-                    st.dataframe(df_servis, use_container_width=True, hide_index=True)
+                    st.dataframe(df_servis, use_container_width=True, hide_index=True, column_config=KOLOM_TANGGAL)
                 else:
                     st.info("Belum ada riwayat servis untuk alat ini.")
                 
@@ -349,48 +536,193 @@ elif selected == "Scan QR":
 # ==================== HALAMAN RIWAYAT SERVIS ====================
 elif selected == "Riwayat Servis":
     st.title("Riwayat Servis")
-    
-    df_alat = get_all_alat()
-    df_servis = get_all_servis()
+    mark_section("Riwayat Servis")
     
     # Filter
     st.subheader("Filter")
-    filter_options = ["Semua Alat"] + [f"{row['ID']} - {row['Nama']}" for _, row in df_alat.iterrows()]
-    selected_filter = st.selectbox("Pilih Alat", options=filter_options)
+    col_cari, col_pilih = st.columns(2)
+    with col_cari:
+        cari_alat = st.text_input("Cari Alat (Nama/ID)", placeholder="Ketik untuk mempersempit pilihan...")
+    with col_pilih:
+        filter_options = ["Semua Alat"] + alat_options(cari_alat)
+        selected_filter = st.selectbox("Pilih Alat", options=filter_options)
+    
+    col_urut, col_arah = st.columns(2)
+    with col_urut:
+        sort_by = st.selectbox(
+            "Urutkan",
+            options=["ID_Servis", "Tanggal", "Biaya", "Jenis_Servis", "ID_Alat"],
+            key="urut_servis"
+        )
+    with col_arah:
+        descending = st.checkbox("Terbaru/terbesar dulu", key="urut_servis_desc")
     
     st.divider()
     
     st.subheader("Data Riwayat Servis")
+    mark_section("Riwayat Servis: tabel")
     
     if selected_filter == "Semua Alat":
-        if len(df_servis) > 0:
-            df_display = df_servis.copy()
-            
-            def get_nama_alat(alat_id):
-                alat = get_alat_by_id(alat_id)
-                return alat['Nama'] if alat else "-"
-            
-            df_display['Nama_Alat'] = df_display['ID_Alat'].apply(get_nama_alat)
+        stats = get_statistik()
+        if stats['total_servis'] > 0:
+            halaman = pilih_halaman(stats['total_servis'], "hal_servis")
+            df_display = get_servis_page(halaman, sort_by=sort_by, descending=descending)["rows"]
             cols = ['ID_Servis', 'ID_Alat', 'Nama_Alat', 'Tanggal', 'Jenis_Servis', 'Biaya', 'Keterangan']
             df_display = df_display[cols]
             
-            st.dataframe(df_display, use_container_width=True, hide_index=True)
+            st.dataframe(df_display, use_container_width=True, hide_index=True, column_config=KOLOM_TANGGAL)
             
             # Statistik
-            total_biaya = df_servis['Biaya'].sum()
+            total_biaya = stats['total_biaya']
             st.write(f"**Total Biaya Servis:** Rp {total_biaya:,.0f}")
         else:
             st.info("Belum ada data riwayat servis.")
     else:
         alat_id = selected_filter.split(" - ")[0]
-        df_filtered = get_riwayat_servis(alat_id)
+        ringkasan = get_alat_aggregate(alat_id)
         
-        if len(df_filtered) > 0:
-            st.dataframe(df_filtered, use_container_width=True, hide_index=True)
+        if ringkasan['jumlah'] > 0:
+            halaman = pilih_halaman(ringkasan['jumlah'], "hal_servis_alat")
+            df_filtered = get_servis_page(
+                halaman, sort_by=sort_by, descending=descending, alat_id=alat_id
+            )["rows"].drop(columns=['Nama_Alat'])
+            st.dataframe(df_filtered, use_container_width=True, hide_index=True, column_config=KOLOM_TANGGAL)
             
-            total_biaya = df_filtered['Biaya'].sum()
+            total_biaya = ringkasan['biaya']
             st.write(f"**Total Biaya Servis untuk {selected_filter}:** Rp {total_biaya:,.0f}")
         else:
             st.info(f"Belum ada riwayat servis untuk {selected_filter}.")
+    
+    # Export mengikuti filter alat di atas; file baru dibuat (per chunk) saat tombol diklik
+    st.divider()
+    mark_section("Riwayat Servis: export")
+    with st.expander("Export Riwayat Servis"):
+        col_mulai, col_sampai, col_format = st.columns(3)
+        with col_mulai:
+            export_mulai = st.date_input("Dari tanggal", value=None, key="export_mulai")
+        with col_sampai:
+            export_sampai = st.date_input("Sampai tanggal", value=None, key="export_sampai")
+        with col_format:
+            format_export = st.radio("Format", options=list(FORMAT_EXPORT), horizontal=True, key="export_format")
+        dengan_nama = st.checkbox("Sertakan nama alat", value=True, key="export_nama")
+        export_alat = None if selected_filter == "Semua Alat" else selected_filter.split(" - ")[0]
+        
+        if export_mulai and export_sampai and export_mulai > export_sampai:
+            st.warning("Tanggal awal melewati tanggal akhir.")
+        else:
+            def unduh_riwayat():
+                with export_servis(
+                    file_format=format_export, alat_id=export_alat, mulai=export_mulai,
+                    sampai=export_sampai, dengan_nama=dengan_nama
+                ) as f:
+                    return f.read()
+            
+            ekstensi, mime = FORMAT_EXPORT[format_export]
+            st.download_button(
+                label=f"Download {format_export}",
+                data=unduh_riwayat,
+                file_name=f"riwayat_servis_{export_alat or 'semua'}.{ekstensi}",
+                mime=mime,
+                use_container_width=True
+            )
 
+# ==================== HALAMAN ANALITIK BIAYA ====================
+elif selected == "Analitik Biaya":
+    st.title("Analitik Biaya Servis")
+    mark_section("Analitik Biaya")
+    
+    # Semua angka di halaman ini dibaca dari rollup biaya, bukan dari baris servis
+    df_tahunan = get_biaya_periode("tahun")
+    if len(df_tahunan) == 0:
+        st.info("Belum ada data riwayat servis.")
+    else:
+        col_tahun, col_periode = st.columns(2)
+        with col_tahun:
+            pilihan_tahun = st.selectbox(
+                "Tahun", options=["Semua"] + [str(t) for t in reversed(df_tahunan['Tahun'].tolist())]
+            )
+        with col_periode:
+            periode = st.radio("Periode", options=["Bulanan", "Tahunan"], horizontal=True)
+        tahun = None if pilihan_tahun == "Semua" else int(pilihan_tahun)
+        kolom_periode = "Bulan" if periode == "Bulanan" else "Tahun"
+        
+        df_jenis = get_biaya_per_jenis(tahun)
+        total_biaya = df_jenis['Biaya'].sum()
+        total_servis = int(df_jenis['Jumlah'].sum())
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric(label="Total Biaya", value=f"Rp {total_biaya:,.0f}")
+        with col2:
+            st.metric(label="Jumlah Servis", value=total_servis)
+        with col3:
+            rata_rata = total_biaya / total_servis if total_servis else 0
+            st.metric(label="Rata-rata per Servis", value=f"Rp {rata_rata:,.0f}")
+        
+        st.divider()
+        
+        # Biaya per periode, ditumpuk per jenis servis
+        mark_section("Analitik Biaya: periode")
+        st.subheader(f"Biaya Servis {periode}")
+        df_periode = get_biaya_periode(kolom_periode.lower(), kelompok="Jenis_Servis", tahun=tahun)
+        if len(df_periode) > 0:
+            if kolom_periode == "Tahun":
+                df_periode[kolom_periode] = df_periode[kolom_periode].astype(str)
+            st.bar_chart(df_periode, x=kolom_periode, y="Biaya", color="Jenis_Servis")
+        else:
+            st.info("Tidak ada servis bertanggal pada periode ini.")
+        
+        col_jenis, col_top = st.columns(2)
+        with col_jenis:
+            st.subheader("Per Jenis Servis")
+            st.dataframe(df_jenis, use_container_width=True, hide_index=True)
+        with col_top:
+            mark_section("Analitik Biaya: alat")
+            st.subheader("Alat dengan Biaya Tertinggi")
+            df_top = get_top_alat_biaya(10, tahun)
+            df_top = join_nama_alat(df_top, get_backend().get_alat_many(df_top['ID_Alat'].tolist()))
+            st.dataframe(
+                df_top[['ID_Alat', 'Nama_Alat', 'Jumlah', 'Biaya']], use_container_width=True, hide_index=True
+            )
+        
+        st.divider()
+        
+        # Tren biaya satu alat
+        st.subheader("Biaya per Alat")
+        col_cari, col_pilih = st.columns(2)
+        with col_cari:
+            cari_alat = st.text_input("Cari Alat (Nama/ID)", key="cari_analitik",
+                                      placeholder="Ketik untuk mempersempit pilihan...")
+        with col_pilih:
+            pilihan_alat = st.selectbox("Pilih Alat", options=alat_options(cari_alat), key="alat_analitik")
+        if pilihan_alat:
+            alat_id = pilihan_alat.split(" - ")[0]
+            df_alat_periode = get_biaya_periode(kolom_periode.lower(), tahun=tahun, alat_id=alat_id)
+            if len(df_alat_periode) > 0:
+                if kolom_periode == "Tahun":
+                    df_alat_periode[kolom_periode] = df_alat_periode[kolom_periode].astype(str)
+                st.bar_chart(df_alat_periode, x=kolom_periode, y="Biaya")
+            else:
+                st.info(f"Belum ada biaya servis untuk {pilihan_alat} pada periode ini.")
 
+# ==================== PANEL PERFORMA ====================
+# Hanya tampil bila instrumentasi aktif (BENGKEL_METRICS=1)
+metrik_rerun = finish_rerun()
+if metrik_rerun is not None:
+    with st.sidebar.expander("Performance"):
+        st.caption(f"Rerun {metrik_rerun['page']}: {metrik_rerun['seconds'] * 1000:,.1f} ms")
+        df_fungsi = pd.DataFrame([
+            {
+                "Fungsi": nama,
+                "Panggilan": entry["calls"],
+                "ms": round(entry["seconds"] * 1000, 1),
+                "KB baca": round(entry["bytes_read"] / 1024, 1),
+                "KB tulis": round(entry["bytes_written"] / 1024, 1),
+            }
+            for nama, entry in metrik_rerun["functions"].items()
+        ], columns=["Fungsi", "Panggilan", "ms", "KB baca", "KB tulis"])
+        st.dataframe(df_fungsi.sort_values("ms", ascending=False), use_container_width=True, hide_index=True)
+        df_bagian = pd.DataFrame(
+            [{"Bagian": nama, "ms": round(detik * 1000, 1)} for nama, detik in metrik_rerun["sections"]],
+            columns=["Bagian", "ms"],
+        )
+        st.dataframe(df_bagian, use_container_width=True, hide_index=True)
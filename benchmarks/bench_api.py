@@ -0,0 +1,233 @@
+"""
+Load test API lookup (api.py): request/detik dan latensi p50/p95/p99 per endpoint.
+
+Secara default script membuat dataset sintetis bench_utils (--size alat, 10x servis) di
+folder sementara, menjalankan `api.py` di proses terpisah, lalu menembakkan request dari
+beberapa klien asyncio keep-alive sekaligus selama --durasi detik. ID alat dipilih acak dengan
+distribusi condong (sebagian kecil alat paling sering discan), ditambah sebagian kecil ID yang
+tidak ada. Dengan --tulis, sebagian request adalah POST /servis sehingga indeks hangat ikut
+diuji saat data berubah. Gunakan --url untuk menguji server yang sudah berjalan.
+
+Cara menjalankan:
+    python benchmarks/bench_api.py --size 10000 --klien 16 --durasi 10
+    python benchmarks/bench_api.py --backend sqlite --tulis 0.02
+    python benchmarks/bench_api.py --url http://127.0.0.1:8600 --ids ALT00001 ALT00002
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED = 20240101
+PORSI_ID_ASING = 0.02   # porsi lookup ID yang tidak ada
+UKURAN_BATCH = 20
+
+
+def siapkan_data(folder, n_alat, backend):
+    """Tulis dataset sintetis ke folder/data, kembalikan daftar ID alat"""
+    from bench_utils import build_dataset
+    import utils
+
+    df_alat, df_servis = build_dataset(n_alat)
+    os.chdir(folder)
+    utils.init_folders()
+    utils.get_backend().replace_all(df_alat, df_servis)
+    os.chdir(ROOT)
+    return df_alat['ID'].tolist()
+
+
+def port_bebas():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def tunggu_port(host, port, proses, batas=120):
+    mulai = time.perf_counter()
+    while time.perf_counter() - mulai < batas:
+        if proses.poll() is not None:
+            raise RuntimeError("api.py berhenti sebelum siap")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"api.py tidak siap dalam {batas} detik")
+
+
+class Klien:
+    """Satu koneksi HTTP/1.1 keep-alive"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1")
+            + data
+        )
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        baris = head.decode("latin-1").split("\r\n")
+        status = int(baris[0].split(" ")[1])
+        panjang = 0
+        for h in baris[1:]:
+            if h.lower().startswith("content-length:"):
+                panjang = int(h.split(":", 1)[1])
+        isi = await self.reader.readexactly(panjang)
+        return status, isi
+
+    def tutup(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def pilih_id(rng, ids):
+    if rng.random() < PORSI_ID_ASING:
+        return "TIDAKADA" + str(rng.randint(0, 999))
+    # Condong: 80% scan jatuh ke 20% alat pertama
+    if rng.random() < 0.8:
+        return ids[rng.randrange(max(1, len(ids) // 5))]
+    return rng.choice(ids)
+
+
+def buat_request(rng, ids, porsi_tulis):
+    r = rng.random()
+    if r < porsi_tulis:
+        return "POST /servis", "POST", "/servis", {
+            "ID_Alat": rng.choice(ids), "Jenis_Servis": "Perawatan Rutin",
+            "Biaya": rng.randint(1, 20) * 5000, "Keterangan": "load test",
+        }
+    r = rng.random()
+    if r < 0.70:
+        return "GET /alat/{id}", "GET", f"/alat/{pilih_id(rng, ids)}", None
+    if r < 0.95:
+        return "GET /alat/{id}/servis", "GET", f"/alat/{pilih_id(rng, ids)}/servis?limit=10", None
+    return "POST /alat/batch", "POST", "/alat/batch", {
+        "ids": [pilih_id(rng, ids) for _ in range(UKURAN_BATCH)]
+    }
+
+
+async def jalankan_klien(host, port, ids, sampai, porsi_tulis, seed, hasil, gagal):
+    rng = random.Random(seed)
+    klien = Klien(host, port)
+    try:
+        while time.perf_counter() < sampai:
+            nama, method, path, body = buat_request(rng, ids, porsi_tulis)
+            t0 = time.perf_counter()
+            status, _ = await klien.request(method, path, body)
+            hasil.setdefault(nama, []).append(time.perf_counter() - t0)
+            if status >= 500 or (status >= 400 and "TIDAKADA" not in path):
+                gagal.append((nama, status))
+    finally:
+        klien.tutup()
+
+
+async def load_test(host, port, ids, n_klien, durasi, porsi_tulis):
+    hasil, gagal = {}, []
+    mulai = time.perf_counter()
+    await asyncio.gather(*(
+        jalankan_klien(host, port, ids, mulai + durasi, porsi_tulis, SEED + i, hasil, gagal)
+        for i in range(n_klien)
+    ))
+    return hasil, gagal, time.perf_counter() - mulai
+
+
+def persentil(nilai, p):
+    urut = sorted(nilai)
+    return urut[min(len(urut) - 1, int(round(p / 100 * (len(urut) - 1))))]
+
+
+def ringkas(hasil, waktu):
+    ringkasan = {}
+    semua = [x for nilai in hasil.values() for x in nilai]
+    for nama, nilai in list(hasil.items()) + [("TOTAL", semua)]:
+        if not nilai:
+            continue
+        ringkasan[nama] = {
+            "jumlah": len(nilai),
+            "rps": len(nilai) / waktu,
+            "p50_ms": statistics.median(nilai) * 1000,
+            "p95_ms": persentil(nilai, 95) * 1000,
+            "p99_ms": persentil(nilai, 99) * 1000,
+        }
+    return ringkasan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=10000, help="jumlah alat dataset sintetis")
+    parser.add_argument("--backend", choices=["excel", "sqlite"], default="excel")
+    parser.add_argument("--klien", type=int, default=16, help="koneksi keep-alive bersamaan")
+    parser.add_argument("--durasi", type=float, default=10, help="detik per pengukuran")
+    parser.add_argument("--tulis", type=float, default=0.0, help="porsi request POST /servis")
+    parser.add_argument("--url", help="uji server yang sudah berjalan (butuh --ids)")
+    parser.add_argument("--ids", nargs="+", help="ID alat untuk --url")
+    parser.add_argument("--simpan", help="simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    proses = None
+    with tempfile.TemporaryDirectory() as folder:
+        if args.url:
+            if not args.ids:
+                parser.error("--url butuh --ids")
+            url = urlsplit(args.url)
+            host, port, ids = url.hostname, url.port or 80, args.ids
+        else:
+            os.environ["BENGKEL_STORAGE"] = args.backend
+            print(f"Menyiapkan {args.size} alat ({args.backend}) ...")
+            ids = siapkan_data(folder, args.size, args.backend)
+            host, port = "127.0.0.1", port_bebas()
+            proses = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "api.py"), "--host", host, "--port", str(port)],
+                cwd=folder, env=dict(os.environ, BENGKEL_STORAGE=args.backend),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        try:
+            if proses is not None:
+                tunggu_port(host, port, proses)
+            # Pemanasan singkat agar pengukuran mencerminkan server yang sudah hangat
+            asyncio.run(load_test(host, port, ids, args.klien, min(2.0, args.durasi), 0.0))
+            hasil, gagal, waktu = asyncio.run(
+                load_test(host, port, ids, args.klien, args.durasi, args.tulis)
+            )
+        finally:
+            if proses is not None:
+                proses.terminate()
+                proses.wait()
+
+    ringkasan = ringkas(hasil, waktu)
+    print(f"\n{args.klien} klien, {waktu:.1f} detik, porsi tulis {args.tulis:.0%}")
+    print(f"{'Endpoint':>22} {'jumlah':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for nama, r in ringkasan.items():
+        print(f"{nama:>22} {r['jumlah']:>8} {r['rps']:>9.1f} {r['p50_ms']:>8.2f} "
+              f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    if gagal:
+        print(f"\n{len(gagal)} request gagal, contoh: {gagal[:5]}")
+    if args.simpan:
+        with open(args.simpan, "w") as f:
+            json.dump({"backend": args.backend, "size": args.size, "klien": args.klien,
+                       "tulis": args.tulis, "hasil": ringkasan}, f, indent=2)
+        print(f"\nHasil disimpan ke {args.simpan}")
+    sys.exit(1 if gagal else 0)
+
+
+if __name__ == "__main__":
+    main()
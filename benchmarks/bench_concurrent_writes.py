@@ -0,0 +1,87 @@
+"""
+Benchmark throughput penulisan dengan N proses penulis bersamaan.
+
+Setiap proses menjalankan add_servis berulang kali pada DATA_DIR sementara yang sama,
+lalu diukur jumlah tulis per detik dan dicek tidak ada baris yang hilang.
+
+Cara menjalankan:
+    python benchmarks/bench_concurrent_writes.py --writers 1 2 4 8 --writes 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _writer(work_dir, backend, jumlah, siap, start_event, selesai):
+    """Proses penulis: tambah `jumlah` catatan servis, laporkan waktu selesai"""
+    os.chdir(work_dir)
+    import utils
+    utils.STORAGE_BACKEND = backend
+    utils.init_excel()
+    siap.put(os.getpid())
+    start_event.wait()
+    for i in range(jumlah):
+        utils.add_servis("ALT01", "2026-01-01", "Perawatan Rutin", 1000, f"bench {os.getpid()} {i}")
+    # Catat waktu selesai di sini agar waktu shutdown interpreter tidak ikut terukur
+    selesai.put(time.time())
+
+
+def run(backend, writers, jumlah):
+    """Jalankan satu skenario, kembalikan (tulis/detik, baris hilang)"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        import utils
+        utils.STORAGE_BACKEND = backend
+        utils.invalidate_cache()
+        utils.add_alat("Kompresor", "Baik", "2026-01-01", "")
+
+        ctx = multiprocessing.get_context("spawn")
+        siap = ctx.Queue()
+        start_event = ctx.Event()
+        selesai = ctx.Queue()
+        procs = [
+            ctx.Process(target=_writer, args=(work_dir, backend, jumlah, siap, start_event, selesai))
+            for _ in range(writers)
+        ]
+        for p in procs:
+            p.start()
+        for _ in procs:
+            siap.get()  # tunggu semua proses selesai import utils
+        t0 = time.time()
+        start_event.set()
+        waktu_selesai = [selesai.get() for _ in procs]
+        for p in procs:
+            p.join()
+        durasi = max(waktu_selesai) - t0
+
+        df_servis = utils.get_all_servis()
+        expected = writers * jumlah
+        hilang = expected - len(df_servis)
+        duplikat = int(df_servis['ID_Servis'].duplicated().sum())
+        os.chdir(ROOT)
+    return expected / durasi, hilang, duplikat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["excel", "sqlite"], default="excel")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--writes", type=int, default=50, help="jumlah tulis per proses")
+    args = parser.parse_args()
+
+    print(f"Backend: {args.backend}, {args.writes} tulis per proses")
+    print(f"{'Penulis':>8} {'Tulis/detik':>12} {'Hilang':>8} {'Duplikat':>9}")
+    for n in args.writers:
+        throughput, hilang, duplikat = run(args.backend, n, args.writes)
+        print(f"{n:>8} {throughput:>12.1f} {hilang:>8} {duplikat:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark latensi dan tingkat keberhasilan decode QR.
+
+Korpus berisi foto sintetis (ukuran kamera ponsel) dengan variasi bersih, kecil, blur,
+glare, dan miring, ditambah foto asli dari benchmarks/corpus/ bila ada. Nama foto asli
+harus diawali ID alat yang seharusnya terbaca, misalnya `ALT01_rak3.jpg`.
+
+Cara menjalankan:
+    python benchmarks/bench_decode.py --per-variant 10
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+import zxingcpp  # noqa: E402
+
+import utils  # noqa: E402
+
+FOTO_SIZE = (3024, 4032)
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def _latar(rng):
+    """Latar belakang foto: gradasi abu-abu dengan bintik acak"""
+    small = Image.effect_noise((FOTO_SIZE[0] // 16, FOTO_SIZE[1] // 16), 40)
+    latar = small.resize(FOTO_SIZE, Image.BILINEAR).point(lambda v: 90 + v // 2)
+    return Image.merge("RGB", [latar] * 3)
+
+
+def _foto(alat_id, variant, rng):
+    """Buat satu foto sintetis berisi QR untuk alat_id"""
+    foto = _latar(rng)
+    qr = Image.open(utils.generate_qr(alat_id)).convert("RGB")
+    ukuran = rng.randint(500, 900) if variant != "kecil" else rng.randint(110, 160)
+    qr = qr.resize((ukuran, ukuran), Image.NEAREST)
+    if variant == "miring":
+        qr = qr.convert("RGBA").rotate(rng.choice([-1, 1]) * rng.randint(25, 40), expand=True)
+    x = rng.randint(100, FOTO_SIZE[0] - qr.size[0] - 100)
+    y = rng.randint(100, FOTO_SIZE[1] - qr.size[1] - 100)
+    foto.paste(qr, (x, y), qr if qr.mode == "RGBA" else None)
+    if variant == "blur":
+        foto = foto.filter(ImageFilter.GaussianBlur(rng.uniform(6, 10)))
+    if variant == "glare":
+        glare = Image.new("L", FOTO_SIZE, 0)
+        cx, cy, r = x + ukuran // 2, y + ukuran // 3, ukuran // 2
+        ImageDraw.Draw(glare).ellipse([cx - r, cy - r, cx + r, cy + r], fill=235)
+        glare = glare.filter(ImageFilter.GaussianBlur(ukuran // 6))
+        foto = Image.composite(Image.new("RGB", FOTO_SIZE, "white"), foto, glare)
+    buffer = BytesIO()
+    foto.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def build_corpus(per_variant, seed=42):
+    """Daftar (nama, variant, ID yang diharapkan, bytes JPEG)"""
+    rng = random.Random(seed)
+    corpus = []
+    for variant in ["bersih", "kecil", "blur", "glare", "miring"]:
+        for i in range(per_variant):
+            alat_id = f"ALT{rng.randint(1, 5000):02d}"
+            corpus.append((f"{variant}_{i}", variant, alat_id, _foto(alat_id, variant, rng)))
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*"))):
+        if path.lower().endswith((".jpg", ".jpeg", ".png")):
+            nama = os.path.basename(path)
+            with open(path, "rb") as f:
+                corpus.append((nama, "asli", nama.split("_")[0].split(".")[0], f.read()))
+    return corpus
+
+
+def decode_naif(image_bytes):
+    """Cara lama: gambar RGB resolusi penuh langsung ke zxing, semua format"""
+    results = zxingcpp.read_barcodes(Image.open(BytesIO(image_bytes)))
+    return results[0].text if results else None
+
+
+def _persentil(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def measure(corpus, decoder):
+    """Kembalikan {variant: (p50 ms, p95 ms, tingkat berhasil)} plus total"""
+    per_variant = {}
+    for _, variant, expected, data in corpus:
+        t0 = time.perf_counter()
+        text = decoder(data)
+        ms = (time.perf_counter() - t0) * 1000
+        per_variant.setdefault(variant, []).append((ms, text == expected))
+    per_variant["TOTAL"] = [hasil for daftar in list(per_variant.values()) for hasil in daftar]
+    return {
+        variant: (
+            statistics.median([m for m, _ in hasil]),
+            _persentil([m for m, _ in hasil], 95),
+            sum(ok for _, ok in hasil) / len(hasil),
+        )
+        for variant, hasil in per_variant.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--per-variant", type=int, default=10)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.per_variant)
+    print(f"Korpus: {len(corpus)} foto")
+    for nama, decoder in [("naif", decode_naif), ("pipeline", utils.decode_qr)]:
+        print(f"\n[{nama}]")
+        print(f"{'Variasi':>8} {'p50 ms':>9} {'p95 ms':>9} {'Berhasil':>9}")
+        for variant, (p50, p95, rate) in measure(corpus, decoder).items():
+            print(f"{variant:>8} {p50:>9.1f} {p95:>9.1f} {rate:>8.0%}")
+    print("\nStatistik tahap pipeline:")
+    for tahap, stat in utils.get_decode_stats().items():
+        print(f"  {tahap:>7}: {stat['success']}/{stat['attempts']} berhasil, rata-rata {stat['avg_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark cold start: waktu import dan waktu render pertama halaman Streamlit.
+
+Setiap pengukuran dijalankan di proses Python baru (seperti worker Streamlit yang baru
+start). Waktu import diambil dari `python -X importtime -c "import utils"`, sedangkan
+waktu render pertama diukur dengan streamlit.testing AppTest di folder sementara yang
+berisi salinan data/.
+
+Hasil bisa disimpan sebagai baseline lalu dibandingkan pada run berikutnya; script keluar
+dengan kode 1 jika ada metrik yang lebih lambat dari baseline melebihi --toleransi, atau
+jika dependensi berat ikut ter-import saat `import utils`.
+
+Cara menjalankan:
+    python benchmarks/bench_startup.py --simpan benchmarks/startup_baseline.json
+    python benchmarks/bench_startup.py --baseline benchmarks/startup_baseline.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modul yang hanya boleh dimuat saat fiturnya dipakai (QR, decode, grafik, Excel)
+MODUL_LAZY = ["qrcode", "PIL", "zxingcpp", "matplotlib", "openpyxl"]
+
+HALAMAN = ["Dashboard", "Data Alat", "Scan QR"]
+
+SCRIPT_RENDER = """
+import sys, time
+t0 = time.perf_counter()
+import streamlit_option_menu
+streamlit_option_menu.option_menu = lambda *a, **k: {halaman!r}
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+if at.exception:
+    sys.exit("exception: " + at.exception[0].value)
+print(time.perf_counter() - t0)
+"""
+
+
+def ukur_import():
+    """Waktu import kumulatif (ms) utils dan modul top-level yang dimuatnya"""
+    proses = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import utils"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    kumulatif = {}
+    for baris in proses.stderr.splitlines():
+        if not baris.startswith("import time:") or "|" not in baris:
+            continue
+        _, cumulative, nama = baris.split("|")
+        if cumulative.strip().isdigit():
+            kumulatif[nama.strip()] = int(cumulative) / 1000
+    dimuat = [m for m in MODUL_LAZY if m in kumulatif]
+    return kumulatif.get("utils", 0.0), dimuat
+
+
+def ukur_render(halaman, folder):
+    """Waktu (ms) dari proses baru sampai halaman selesai dirender pertama kali"""
+    script = SCRIPT_RENDER.format(halaman=halaman, app=os.path.join(ROOT, "app.py"))
+    proses = subprocess.run(
+        [sys.executable, "-c", script], cwd=folder, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+    if proses.returncode != 0:
+        raise RuntimeError(f"Render {halaman} gagal: {proses.stderr.strip()[-500:]}")
+    return float(proses.stdout.strip().splitlines()[-1]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ulang", type=int, default=3, help="jumlah pengulangan (diambil median)")
+    parser.add_argument("--simpan", help="simpan hasil sebagai baseline JSON")
+    parser.add_argument("--baseline", help="bandingkan dengan baseline JSON")
+    parser.add_argument("--toleransi", type=float, default=0.25, help="batas regresi relatif")
+    args = parser.parse_args()
+
+    hasil = {}
+    import_ms, dimuat = [], []
+    for _ in range(args.ulang):
+        ms, dimuat = ukur_import()
+        import_ms.append(ms)
+    hasil["import utils"] = statistics.median(import_ms)
+
+    with tempfile.TemporaryDirectory() as folder:
+        data_dir = os.path.join(ROOT, "data")
+        if os.path.isdir(data_dir):
+            shutil.copytree(data_dir, os.path.join(folder, "data"))
+        for halaman in HALAMAN:
+            hasil[f"render {halaman}"] = statistics.median(
+                ukur_render(halaman, folder) for _ in range(args.ulang)
+            )
+
+    print(f"{'Metrik':>20} {'ms':>9}")
+    for nama, ms in hasil.items():
+        print(f"{nama:>20} {ms:>9.1f}")
+    print(f"Modul berat saat import utils: {', '.join(dimuat) or '-'}")
+
+    gagal = bool(dimuat)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nDibanding baseline ({args.baseline}):")
+        for nama, ms in hasil.items():
+            if nama not in baseline:
+                continue
+            rasio = ms / baseline[nama] if baseline[nama] else 1.0
+            status = "REGRESI" if rasio > 1 + args.toleransi else "ok"
+            gagal = gagal or status == "REGRESI"
+            print(f"{nama:>20} {baseline[nama]:>9.1f} -> {ms:>9.1f} ({rasio:.2f}x) {status}")
+    if args.simpan:
+        with open(args.simpan, "w") as f:
+            json.dump(hasil, f, indent=2)
+        print(f"\nBaseline disimpan ke {args.simpan}")
+    sys.exit(1 if gagal else 0)
+
+
+if __name__ == "__main__":
+    main()
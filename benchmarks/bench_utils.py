@@ -0,0 +1,285 @@
+"""
+Benchmark fungsi publik utils.py pada dataset bengkel sintetis.
+
+Dataset dibuat deterministik (seed tetap) dengan ukuran 1k / 10k / 100k alat dan 10x baris
+servis, distribusi Kondisi dan Jenis_Servis yang realistis, serta rentang tanggal beli dan
+servis yang masuk akal. Data ditulis ke DATA_DIR sementara; setiap ukuran dibuat di satu
+proses lalu diukur di proses baru, sehingga pembacaan pertama benar-benar cold.
+
+Untuk setiap fungsi dicatat latensi panggilan pertama (cold), p50/p95 panggilan berikutnya,
+dan puncak alokasi memori (tracemalloc, diukur terpisah dari waktu). Per ukuran dicatat juga
+ukuran file data dan puncak RSS proses. Hasil bisa disimpan sebagai baseline JSON dan
+dibandingkan pada run berikutnya.
+
+Cara menjalankan:
+    python benchmarks/bench_utils.py --sizes 1000 10000 --simpan benchmarks/utils_baseline.json
+    python benchmarks/bench_utils.py --sizes 1000 10000 --baseline benchmarks/utils_baseline.json
+    python benchmarks/bench_utils.py --sizes 100000 --backend sqlite
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED = 20240101
+SERVIS_PER_ALAT = 10
+
+KONDISI_BOBOT = {"Baik": 0.72, "Rusak Ringan": 0.19, "Rusak Berat": 0.09}
+JENIS_SERVIS_BOBOT = {
+    "Perawatan Rutin": 0.45, "Perbaikan": 0.25, "Penggantian Komponen": 0.15,
+    "Kalibrasi": 0.10, "Lainnya": 0.05,
+}
+# Median biaya (Rp) per jenis servis; sebaran lognormal di sekitar nilai ini
+BIAYA_MEDIAN = {
+    "Perawatan Rutin": 50000, "Perbaikan": 250000, "Penggantian Komponen": 400000,
+    "Kalibrasi": 150000, "Lainnya": 75000,
+}
+JENIS_ALAT = [
+    "Kunci Ring", "Kunci Pas", "Kunci Sok", "Kunci Inggris", "Obeng Plus", "Obeng Minus", "Tang Kombinasi",
+    "Tang Potong", "Bor Listrik", "Gerinda Tangan", "Kompresor Angin", "Dongkrak Hidrolik", "Impact Wrench",
+    "Multimeter", "Kunci Torsi", "Tracker Klep", "Feeler Gauge", "Solder", "Jangka Sorong", "Treker Bearing",
+]
+MEREK = ["Tekiro", "Krisbow", "Makita", "Bosch", "Stanley", "Kenmaster", "Sellery", "Yamaha", "Honda", "Lippro"]
+KETERANGAN = [None, None, None, "Rak A", "Rak B", "Lemari alat", "Dipinjam bengkel 2", "Perlu cek ulang"]
+
+
+def build_dataset(n_alat, seed=SEED):
+    """Frame (alat, servis) sintetis yang selalu sama untuk n_alat dan seed yang sama"""
+    import numpy as np
+    import pandas as pd
+    import utils
+
+    rng = np.random.default_rng(seed + n_alat)
+    lebar = utils.ID_FORMAT["alat"][1]
+    ids = [f"ALT{i:0{lebar}d}" for i in range(1, n_alat + 1)]
+    beli = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 10 * 365, n_alat), unit="D")
+    df_alat = pd.DataFrame({
+        "ID": ids,
+        "Nama": [
+            f"{JENIS_ALAT[j]} {MEREK[m]} {u} mm"
+            for j, m, u in zip(rng.integers(0, len(JENIS_ALAT), n_alat),
+                               rng.integers(0, len(MEREK), n_alat),
+                               rng.integers(6, 33, n_alat))
+        ],
+        "Kondisi": rng.choice(list(KONDISI_BOBOT), n_alat, p=list(KONDISI_BOBOT.values())),
+        "Tanggal_Beli": beli.strftime("%Y-%m-%d"),
+        "Keterangan": [KETERANGAN[k] for k in rng.integers(0, len(KETERANGAN), n_alat)],
+    })
+
+    n_servis = n_alat * SERVIS_PER_ALAT
+    # Alat tertentu lebih sering diservis (distribusi Zipf ringan)
+    pos_alat = np.minimum(rng.zipf(1.3, n_servis) - 1, n_alat - 1)
+    pos_alat = (pos_alat + rng.integers(0, n_alat, n_servis)) % n_alat
+    jenis = rng.choice(list(JENIS_SERVIS_BOBOT), n_servis, p=list(JENIS_SERVIS_BOBOT.values()))
+    umur_hari = (pd.Timestamp("2026-06-30") - beli[pos_alat]).days.to_numpy()
+    tanggal = beli[pos_alat] + pd.to_timedelta((rng.random(n_servis) * umur_hari).astype(int), unit="D")
+    biaya = np.array([BIAYA_MEDIAN[j] for j in jenis]) * rng.lognormal(0, 0.5, n_servis)
+    lebar_servis = utils.ID_FORMAT["servis"][1]
+    df_servis = pd.DataFrame({
+        "ID_Servis": [f"SRV{i:0{lebar_servis}d}" for i in range(1, n_servis + 1)],
+        "ID_Alat": [ids[p] for p in pos_alat],
+        "Tanggal": tanggal.strftime("%Y-%m-%d"),
+        "Jenis_Servis": jenis,
+        "Biaya": (biaya // 1000 * 1000).astype("int64"),
+        "Keterangan": None,
+    }).sort_values(["Tanggal", "ID_Servis"], kind="stable", ignore_index=True)
+    return df_alat, df_servis
+
+
+def _ukuran_file(data_dir):
+    return {
+        nama: os.path.getsize(os.path.join(data_dir, nama))
+        for nama in sorted(os.listdir(data_dir))
+        if not nama.endswith(".lock") and os.path.isfile(os.path.join(data_dir, nama))
+    }
+
+
+def _worker_generate(n_alat, backend):
+    """Proses 1: tulis dataset ke DATA_DIR (cwd) lewat backend yang diuji"""
+    import utils
+    utils.STORAGE_BACKEND = backend
+    utils.init_folders()
+    df_alat, df_servis = build_dataset(n_alat)
+    t0 = time.perf_counter()
+    if backend == "sqlite":
+        store = utils.SQLiteBackend(utils.SQLITE_FILE)
+        store.init()
+        store.replace_all(df_alat, df_servis)
+    else:
+        utils.ExcelBackend(utils.EXCEL_FILE).replace_all(df_alat, df_servis)
+    return {"generate_s": time.perf_counter() - t0, "file_bytes": _ukuran_file(utils.DATA_DIR)}
+
+
+def _skenario(utils, n_alat):
+    """Daftar (nama, fungsi tanpa argumen) yang diukur; fungsi tulis di akhir"""
+    import itertools
+
+    ids = [f"ALT{i:0{utils.ID_FORMAT['alat'][1]}d}" for i in (1, n_alat // 2, n_alat)]
+    id_tengah = ids[1]
+    hapus = itertools.count(n_alat)   # hapus dari ID terbesar agar tiap panggilan menghapus alat berbeda
+    qr_png = utils.generate_qr(ids[0]).getvalue()   # ID lain, agar generate_qr di bawah tetap cold
+    lebar = utils.ID_FORMAT["alat"][1]
+    return [
+        ("get_all_alat", utils.get_all_alat),
+        ("get_all_servis", utils.get_all_servis),
+        ("get_alat_by_id", lambda: utils.get_alat_by_id(id_tengah)),
+        ("get_riwayat_servis", lambda: utils.get_riwayat_servis(id_tengah)),
+        ("filter_alat[kata]", lambda: utils.filter_alat("kunci ring")),
+        ("filter_alat[kondisi]", lambda: utils.filter_alat("", "Rusak Berat")),
+        ("filter_alat[kata+kondisi]", lambda: utils.filter_alat("makita", "Baik")),
+        ("autocomplete_id", lambda: utils.autocomplete_id("ALT1")),
+        ("get_statistik", utils.get_statistik),
+        ("get_chart_kondisi", utils.get_chart_kondisi),
+        ("get_servis_terbaru", utils.get_servis_terbaru),
+        ("get_alat_page", lambda: utils.get_alat_page(2, sort_by="Nama")),
+        ("get_servis_page", lambda: utils.get_servis_page(2, sort_by="Tanggal", descending=True)),
+        ("join_nama_alat", lambda: utils.join_nama_alat(utils.get_all_servis())),
+        ("generate_qr", lambda: utils.generate_qr(id_tengah)),
+        ("decode_qr", lambda: utils.decode_qr(qr_png)),
+        ("add_alat", lambda: utils.add_alat("Kunci Bench", "Baik", "2026-01-01", "bench")),
+        ("add_servis", lambda: utils.add_servis(id_tengah, "2026-01-02", "Perbaikan", 100000, "bench")),
+        ("update_alat", lambda: utils.update_alat(id_tengah, "Kunci Bench 2", "Rusak Ringan", "2026-01-01", "")),
+        ("delete_alat", lambda: utils.delete_alat(f"ALT{next(hapus):0{lebar}d}")),
+    ]
+
+
+def _worker_measure(n_alat, backend, ulang):
+    """Proses 2: ukur setiap fungsi pada data yang sudah ada di DATA_DIR (cwd)"""
+    import resource
+    import utils
+    utils.STORAGE_BACKEND = backend
+
+    hasil = {}
+    t0 = time.perf_counter()
+    utils.init_excel()
+    hasil["init_excel"] = {"cold_ms": (time.perf_counter() - t0) * 1000}
+    for nama, fungsi in _skenario(utils, n_alat):
+        t0 = time.perf_counter()
+        fungsi()
+        cold = (time.perf_counter() - t0) * 1000
+        waktu = []
+        for _ in range(ulang):
+            t0 = time.perf_counter()
+            fungsi()
+            waktu.append((time.perf_counter() - t0) * 1000)
+        tracemalloc.start()
+        fungsi()
+        _, puncak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        waktu.sort()
+        hasil[nama] = {
+            "cold_ms": cold,
+            "p50_ms": statistics.median(waktu),
+            "p95_ms": waktu[min(len(waktu) - 1, int(round(0.95 * (len(waktu) - 1))))],
+            "peak_kb": puncak / 1024,
+        }
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"functions": hasil, "peak_rss_mb": rss / 1024 if sys.platform != "darwin" else rss / 1024 / 1024}
+
+
+def _jalankan_worker(perintah, folder, n_alat, backend, ulang):
+    proses = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--_worker", perintah,
+         "--sizes", str(n_alat), "--backend", backend, "--ulang", str(ulang)],
+        cwd=folder, capture_output=True, text=True,
+    )
+    if proses.returncode != 0:
+        raise RuntimeError(f"Worker {perintah} ({backend}, {n_alat}) gagal:\n{proses.stderr[-2000:]}")
+    return json.loads(proses.stdout.strip().splitlines()[-1])
+
+
+def run(sizes, backends, ulang):
+    hasil = {}
+    for backend in backends:
+        for n_alat in sizes:
+            with tempfile.TemporaryDirectory() as folder:
+                gen = _jalankan_worker("generate", folder, n_alat, backend, ulang)
+                ukur = _jalankan_worker("measure", folder, n_alat, backend, ulang)
+            hasil.setdefault(backend, {})[str(n_alat)] = {**gen, **ukur}
+            print(f"[{backend} {n_alat} alat] dataset dibuat dalam {gen['generate_s']:.1f} s, "
+                  f"file {sum(gen['file_bytes'].values()) / 1e6:.1f} MB, puncak RSS {ukur['peak_rss_mb']:.0f} MB")
+            print(f"{'Fungsi':>26} {'cold ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'peak KB':>9}")
+            for nama, m in ukur["functions"].items():
+                print(f"{nama:>26} {m['cold_ms']:>9.2f} {m.get('p50_ms', 0):>9.2f} "
+                      f"{m.get('p95_ms', 0):>9.2f} {m.get('peak_kb', 0):>9.0f}")
+            print()
+    return hasil
+
+
+def bandingkan(hasil, baseline, toleransi):
+    """Cetak metrik yang lebih lambat dari baseline melebihi toleransi; kembalikan jumlahnya"""
+    regresi = 0
+    for backend, per_ukuran in hasil.items():
+        for ukuran, data in per_ukuran.items():
+            lama = baseline.get("results", {}).get(backend, {}).get(ukuran)
+            if not lama:
+                continue
+            for nama, m in data["functions"].items():
+                m_lama = lama["functions"].get(nama, {})
+                for metrik in ("p50_ms", "cold_ms"):
+                    if metrik not in m or not m_lama.get(metrik):
+                        continue
+                    rasio = m[metrik] / m_lama[metrik]
+                    # Abaikan selisih di bawah 1 ms: terlalu kecil untuk dibedakan dari noise
+                    if rasio > 1 + toleransi and m[metrik] - m_lama[metrik] > 1.0:
+                        regresi += 1
+                        print(f"REGRESI {backend}/{ukuran} {nama} {metrik}: "
+                              f"{m_lama[metrik]:.2f} -> {m[metrik]:.2f} ms ({rasio:.2f}x)")
+    return regresi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="jumlah alat")
+    parser.add_argument("--backend", nargs="+", default=["excel"], choices=["excel", "sqlite"])
+    parser.add_argument("--ulang", type=int, default=5, help="panggilan warm per fungsi")
+    parser.add_argument("--simpan", help="simpan hasil sebagai baseline JSON")
+    parser.add_argument("--baseline", help="bandingkan dengan baseline JSON")
+    parser.add_argument("--toleransi", type=float, default=0.25, help="batas regresi relatif")
+    parser.add_argument("--_worker", choices=["generate", "measure"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._worker == "generate":
+        print(json.dumps(_worker_generate(args.sizes[0], args.backend[0])))
+        return
+    if args._worker == "measure":
+        print(json.dumps(_worker_measure(args.sizes[0], args.backend[0], args.ulang)))
+        return
+
+    hasil = run(args.sizes, args.backend, args.ulang)
+    gagal = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        jumlah = bandingkan(hasil, baseline, args.toleransi)
+        print(f"{jumlah} regresi dibanding {args.baseline}")
+        gagal = jumlah > 0
+    if args.simpan:
+        with open(args.simpan, "w") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                    "waktu": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "seed": SEED,
+                    "ulang": args.ulang,
+                },
+                "results": hasil,
+            }, f, indent=2)
+        print(f"Hasil disimpan ke {args.simpan}")
+    sys.exit(1 if gagal else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,2531 @@ Berisi: CRUD, QR Code, Statistik, Filter
 """
 
 import pandas as pd
+import numpy as np
 import os
-import qrcode
+import logging
+import json
+import hashlib
+import zipfile
+import sqlite3
+import threading
+import time
+import tempfile
+import bisect
+import contextvars
+import multiprocessing
+import functools
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
-from PIL import Image
-import zxingcpp
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
 
 # ==================== KONFIGURASI ====================
 DATA_DIR = "data"
 QR_DIR = "qr"
 EXCEL_FILE = os.path.join(DATA_DIR, "data_peralatan.xlsx")
+SQLITE_FILE = os.path.join(DATA_DIR, "data_peralatan.db")
+
+# Backend penyimpanan: "excel" (default) atau "sqlite"
+STORAGE_BACKEND = os.environ.get("BENGKEL_STORAGE", "excel")
+
+KOLOM_ALAT = ["ID", "Nama", "Kondisi", "Tanggal_Beli", "Keterangan"]
+KOLOM_SERVIS = ["ID_Servis", "ID_Alat", "Tanggal", "Jenis_Servis", "Biaya", "Keterangan"]
+
+KONDISI_OPTIONS = ["Baik", "Rusak Ringan", "Rusak Berat"]
+JENIS_SERVIS_OPTIONS = ["Perbaikan", "Perawatan Rutin", "Penggantian Komponen", "Kalibrasi", "Lainnya"]
+
+# ==================== INSTRUMENTASI ====================
+# Opt-in (BENGKEL_METRICS=1): jumlah panggilan, waktu, dan byte baca/tulis per fungsi,
+# dikumpulkan per rerun Streamlit dan kumulatif per proses. Saat mati, overhead per
+# panggilan hanya satu pengecekan flag.
+INSTRUMENTATION = os.environ.get("BENGKEL_METRICS", "0") == "1"
+METRICS_JSONL_FILE = os.path.join(DATA_DIR, "metrics.jsonl")
+METRICS_PROM_FILE = os.path.join(DATA_DIR, "metrics.prom")
+METRICS_FLUSH_SECONDS = 30
+
+_metrics_total = {}
+_metrics_lock = threading.Lock()
+_metrics_reruns = {"count": 0, "seconds": 0.0}
+_metrics_last_flush = [time.monotonic()]
+_rerun_metrics = contextvars.ContextVar("rerun_metrics", default=None)
+_active_span = contextvars.ContextVar("active_span", default=None)
+
+def _metric_entry(tabel, nama):
+    entry = tabel.get(nama)
+    if entry is None:
+        entry = tabel[nama] = {"calls": 0, "seconds": 0.0, "bytes_read": 0, "bytes_written": 0, "errors": 0}
+    return entry
+
+def _record_metric(nama, seconds=0.0, calls=0, bytes_read=0, bytes_written=0, errors=0):
+    rerun = _rerun_metrics.get()
+    with _metrics_lock:
+        for tabel in (_metrics_total, rerun["functions"] if rerun is not None else None):
+            if tabel is None:
+                continue
+            entry = _metric_entry(tabel, nama)
+            entry["calls"] += calls
+            entry["seconds"] += seconds
+            entry["bytes_read"] += bytes_read
+            entry["bytes_written"] += bytes_written
+            entry["errors"] += errors
+
+def record_io(bytes_read=0, bytes_written=0):
+    """Catat byte yang dibaca/ditulis ke fungsi terinstrumentasi yang sedang berjalan"""
+    if INSTRUMENTATION:
+        _record_metric(_active_span.get() or "lainnya", bytes_read=bytes_read, bytes_written=bytes_written)
+
+def instrument(nama):
+    """Dekorator: catat panggilan, waktu (inklusif), dan error fungsi dengan nama metrik `nama`"""
+    def dekorator(fungsi):
+        @functools.wraps(fungsi)
+        def wrapper(*args, **kwargs):
+            if not INSTRUMENTATION:
+                return fungsi(*args, **kwargs)
+            token = _active_span.set(nama)
+            t0 = time.perf_counter()
+            gagal = 0
+            try:
+                return fungsi(*args, **kwargs)
+            except BaseException:
+                gagal = 1
+                raise
+            finally:
+                _active_span.reset(token)
+                _record_metric(nama, seconds=time.perf_counter() - t0, calls=1, errors=gagal)
+        wrapper.__wrapped_metric__ = nama
+        return wrapper
+    return dekorator
+
+def start_rerun(page=None):
+    """Mulai pengumpulan metrik untuk satu rerun (panggil di awal script Streamlit)"""
+    if not INSTRUMENTATION:
+        return None
+    rerun = {"page": page, "start": time.perf_counter(), "functions": {}, "sections": [], "section": None}
+    _rerun_metrics.set(rerun)
+    return rerun
+
+def mark_section(nama):
+    """Tandai awal bagian halaman; bagian sebelumnya ditutup (seperti stopwatch lap)"""
+    rerun = _rerun_metrics.get()
+    if rerun is None:
+        return
+    sekarang = time.perf_counter()
+    if rerun["section"] is not None:
+        lama, mulai = rerun["section"]
+        rerun["sections"].append((lama, sekarang - mulai))
+    rerun["section"] = (nama, sekarang)
+
+def finish_rerun():
+    """Tutup rerun aktif; kembalikan ringkasannya dan tulis file metrik bila sudah waktunya"""
+    rerun = _rerun_metrics.get()
+    if rerun is None:
+        return None
+    mark_section(None)
+    rerun["seconds"] = time.perf_counter() - rerun["start"]
+    _rerun_metrics.set(None)
+    with _metrics_lock:
+        _metrics_reruns["count"] += 1
+        _metrics_reruns["seconds"] += rerun["seconds"]
+        for nama, detik in rerun["sections"]:
+            entry = _metric_entry(_metrics_total, f"section:{nama}")
+            entry["calls"] += 1
+            entry["seconds"] += detik
+    flush_metrics()
+    return rerun
+
+def get_metrics():
+    """Salinan metrik kumulatif proses ini"""
+    with _metrics_lock:
+        return {
+            "reruns": dict(_metrics_reruns),
+            "functions": {nama: dict(entry) for nama, entry in _metrics_total.items()},
+        }
+
+def _prom_label(nama):
+    return nama.replace("\\", "\\\\").replace('"', '\\"')
+
+def _prometheus_text(metrics):
+    baris = [
+        "# HELP bengkel_reruns_total Jumlah rerun Streamlit",
+        "# TYPE bengkel_reruns_total counter",
+        f"bengkel_reruns_total {metrics['reruns']['count']}",
+        "# HELP bengkel_rerun_seconds_total Total waktu rerun Streamlit",
+        "# TYPE bengkel_rerun_seconds_total counter",
+        f"bengkel_rerun_seconds_total {metrics['reruns']['seconds']:.6f}",
+    ]
+    for kunci, metrik, keterangan in (
+        ("calls", "bengkel_calls_total", "Jumlah panggilan per fungsi"),
+        ("seconds", "bengkel_seconds_total", "Total waktu per fungsi (inklusif)"),
+        ("bytes_read", "bengkel_bytes_read_total", "Byte dibaca dari disk per fungsi"),
+        ("bytes_written", "bengkel_bytes_written_total", "Byte ditulis ke disk per fungsi"),
+        ("errors", "bengkel_errors_total", "Jumlah panggilan yang gagal per fungsi"),
+    ):
+        baris += [f"# HELP {metrik} {keterangan}", f"# TYPE {metrik} counter"]
+        for nama, entry in sorted(metrics["functions"].items()):
+            nilai = f"{entry[kunci]:.6f}" if kunci == "seconds" else str(entry[kunci])
+            baris.append(f'{metrik}{{fungsi="{_prom_label(nama)}"}} {nilai}')
+    return "\n".join(baris) + "\n"
+
+def flush_metrics(force=False):
+    """Tulis metrik ke JSON-lines (append) dan file teks Prometheus (atomik) setiap METRICS_FLUSH_SECONDS"""
+    if not INSTRUMENTATION:
+        return False
+    with _metrics_lock:
+        if not force and time.monotonic() - _metrics_last_flush[0] < METRICS_FLUSH_SECONDS:
+            return False
+        _metrics_last_flush[0] = time.monotonic()
+    metrics = get_metrics()
+    try:
+        os.makedirs(os.path.dirname(METRICS_JSONL_FILE) or ".", exist_ok=True)
+        with open(METRICS_JSONL_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"time": time.time(), "pid": os.getpid(), **metrics}) + "\n")
+        _atomic_write_text(METRICS_PROM_FILE, _prometheus_text(metrics))
+    except OSError as e:
+        logger.warning("Gagal menulis metrik: %s", e)
+        return False
+    return True
+
+# ==================== SKEMA DTYPE ====================
+# Tipe kolom yang dijamin untuk DataFrame Alat dan Servis, diterapkan saat load (workbook,
+# snapshot, jurnal, SQLite) dan saat tulis, sehingga filter, value_counts, dan sum berjalan
+# di array bertipe, bukan perbandingan string per baris.
+try:
+    # Teks Arrow (pandas >= 2.3): satu buffer per kolom tanpa objek Python per baris, kosong = NaN
+    DTYPE_TEKS = pd.StringDtype(na_value=np.nan)
+except TypeError:
+    DTYPE_TEKS = object
+DTYPE_TANGGAL = "datetime64[us]"
+
+SKEMA = {
+    "alat": {"ID": "teks", "Nama": "teks", "Kondisi": "kategori", "Tanggal_Beli": "tanggal", "Keterangan": "teks"},
+    "servis": {"ID_Servis": "teks", "ID_Alat": "teks", "Tanggal": "tanggal", "Jenis_Servis": "kategori",
+               "Biaya": "angka", "Keterangan": "teks"},
+}
+_OPSI_KATEGORI = {"Kondisi": KONDISI_OPTIONS, "Jenis_Servis": JENIS_SERVIS_OPTIONS}
+_JENIS_KOLOM = {kolom: jenis for skema in SKEMA.values() for kolom, jenis in skema.items()}
+
+def _kolom_tanggal(series):
+    """Kolom tanggal sebagai datetime64 (teks YYYY-MM-DD, datetime, atau kosong -> NaT)"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.astype(DTYPE_TANGGAL)
+    teks = series.astype("string").str[:10]
+    return pd.to_datetime(teks, format="%Y-%m-%d", errors="coerce").astype(DTYPE_TANGGAL)
+
+@functools.lru_cache(maxsize=64)
+def _dtype_kategori(opsi, lain):
+    # Membangun CategoricalDtype relatif mahal untuk frame kecil (baris hasil query SQLite)
+    return pd.CategoricalDtype(list(opsi) + list(lain))
+
+def _kolom_kategori(series, opsi):
+    """Categorical dengan opsi baku lebih dulu, ditambah nilai lain yang ada di data (urut abjad)"""
+    teks = series.astype(DTYPE_TEKS)
+    lain = sorted(set(teks.dropna().unique()) - set(opsi))
+    return teks.astype(_dtype_kategori(tuple(opsi), tuple(lain)))
+
+def _sesuai_skema(series, jenis, kolom):
+    dtype = series.dtype
+    if jenis == "kategori":
+        opsi = _OPSI_KATEGORI[kolom]
+        return isinstance(dtype, pd.CategoricalDtype) and list(dtype.categories[:len(opsi)]) == opsi
+    if jenis == "tanggal":
+        return dtype == DTYPE_TANGGAL
+    if jenis == "angka":
+        return dtype == "int64"
+    return dtype == DTYPE_TEKS
+
+def _kolom_angka(df, kolom):
+    """Kolom bilangan bulat int64 (sel kosong -> 0)
+
+    Nilai yang bukan angka (-> 0) atau berpecahan (-> dibulatkan) dicatat ke log beserta ID
+    barisnya, karena nilai aslinya hilang saat workbook ditulis ulang.
+    """
+    series = df[kolom]
+    angka = pd.to_numeric(series, errors='coerce')
+    bukan_angka = angka.isna() & series.notna()
+    if bukan_angka.any():
+        bukan_angka[bukan_angka] = series[bukan_angka].astype(str).str.strip() != ""
+    pecahan = angka.notna() & (angka != angka.round())
+    salah = bukan_angka | pecahan
+    if salah.any():
+        id_kolom = "ID_Servis" if "ID_Servis" in df.columns else None
+        contoh = [
+            f"{baris_id}={nilai!r}" for baris_id, nilai in zip(
+                df.loc[salah, id_kolom].tolist() if id_kolom else df.index[salah].tolist(),
+                series[salah].tolist()[:20],
+            )
+        ]
+        logger.warning(
+            "%s: %d nilai bukan bilangan bulat (bukan angka -> 0, pecahan -> dibulatkan): %s%s",
+            kolom, int(salah.sum()), ", ".join(contoh), " ..." if salah.sum() > len(contoh) else "",
+        )
+    return angka.fillna(0).round().astype("int64")
+
+def _biaya_bulat(value):
+    """Biaya sebagai int (kosong -> 0); ValueError jika bukan angka atau berpecahan"""
+    value = _kosongkan_nan(value)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return 0
+    angka = pd.to_numeric(value, errors='coerce')
+    if pd.isna(angka) or angka != round(angka):
+        raise ValueError(f"Biaya '{value}' bukan bilangan bulat")
+    return int(angka)
+
+def _terapkan_skema(df, tabel):
+    """Paksa dtype kolom sesuai SKEMA[tabel]; kolom yang sudah sesuai tidak disentuh"""
+    ubah = {}
+    for kolom, jenis in SKEMA[tabel].items():
+        if kolom not in df.columns or _sesuai_skema(df[kolom], jenis, kolom):
+            continue
+        if jenis == "kategori":
+            ubah[kolom] = _kolom_kategori(df[kolom], _OPSI_KATEGORI[kolom])
+        elif jenis == "tanggal":
+            ubah[kolom] = _kolom_tanggal(df[kolom])
+        elif jenis == "angka":
+            ubah[kolom] = _kolom_angka(df, kolom)
+        else:
+            ubah[kolom] = df[kolom].astype(DTYPE_TEKS)
+    return df.assign(**ubah) if ubah else df
+
+def _nilai_simpan(kolom, value):
+    """Satu nilai sesuai skema untuk jurnal/SQLite: tanggal 'YYYY-MM-DD', Biaya int, lainnya teks"""
+    value = _kosongkan_nan(value)
+    jenis = _JENIS_KOLOM.get(kolom)
+    if jenis == "angka":
+        # Ditolak, bukan diam-diam ditulis 0 (validasi import sudah menyaring lebih dulu)
+        return _biaya_bulat(value)
+    if value is None:
+        return None
+    if jenis == "tanggal":
+        try:
+            return datetime.strptime(str(value)[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            return None
+    return value if isinstance(value, str) else str(value)
+
+def _nilai_skema(kolom, value):
+    """Satu nilai sebagai skalar bertipe skema (Timestamp untuk tanggal, NaN/NaT untuk kosong)"""
+    value = _nilai_simpan(kolom, value)
+    if _JENIS_KOLOM.get(kolom) == "tanggal":
+        return pd.NaT if value is None else pd.Timestamp(value)
+    return np.nan if value is None else value
+
+def _baris_simpan(row):
+    return {kolom: _nilai_simpan(kolom, value) for kolom, value in row.items()}
+
+def _tanpa_skema(df):
+    """Kolom sebagai objek Python, seperti hasil read_excel/jurnal sebelum skema diterapkan"""
+    ubah = {}
+    for kolom in df.columns:
+        series = df[kolom]
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            series = series.dt.strftime("%Y-%m-%d")
+        ubah[kolom] = series.astype(object).where(series.notna(), None)
+    return df.assign(**ubah)
+
+def memory_report():
+    """Memori per kolom (byte, deep) tanpa skema dtype dan dengan skema, untuk kedua tabel
+
+    "Sebelum" diukur dari pembacaan mentah penyimpanan (read_excel / read_sql tanpa skema),
+    "Sesudah" dari data yang sama setelah _terapkan_skema.
+    """
+    init_excel()
+    backend = get_backend()
+    baris = []
+    for tabel, mentah in zip(("alat", "servis"), backend.read_tanpa_skema()):
+        df = _terapkan_skema(mentah, tabel)
+        sebelum = mentah.memory_usage(deep=True, index=False)
+        sesudah = df.memory_usage(deep=True, index=False)
+        for kolom in df.columns:
+            baris.append({
+                "Tabel": tabel, "Kolom": kolom, "Dtype": str(df[kolom].dtype),
+                "Sebelum": int(sebelum[kolom]), "Sesudah": int(sesudah[kolom]),
+            })
+    return pd.DataFrame(baris, columns=["Tabel", "Kolom", "Dtype", "Sebelum", "Sesudah"])
+
+# ==================== CACHE BACA SHEET ====================
+
+# Cache bersama (satu per proses, dipakai semua sesi browser) untuk sheet Alat dan Servis.
+# Kunci cache adalah (path, mtime, ukuran) file Excel sehingga perubahan file dari luar
+# ikut terdeteksi; penulisan lewat utils langsung menghapus cache.
+_sheet_cache = {}
+_sheet_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Mulai pandas 3 Copy-on-Write selalu aktif, shallow copy sudah aman dari modifikasi
+_PANDAS_COW = int(pd.__version__.split(".")[0]) >= 3
+
+def _file_signature(file_path):
+    """Tanda tangan file (mtime, ukuran) untuk validasi cache"""
+    try:
+        st_file = os.stat(file_path)
+    except OSError:
+        return None
+    return (st_file.st_mtime_ns, st_file.st_size)
+
+def _read_only_view(df):
+    """Salinan DataFrame yang aman dimodifikasi pemanggil tanpa merusak cache"""
+    return df.copy(deep=not _PANDAS_COW)
+
+def _load_sheets_cached(file_path, loader):
+    """Ambil (df_alat, df_servis) dari cache, parse ulang hanya jika file berubah"""
+    signature = _file_signature(file_path)
+    with _sheet_cache_lock:
+        entry = _sheet_cache.get(file_path)
+        if entry is not None and signature is not None and entry[0] == signature:
+            _cache_stats["hits"] += 1
+        else:
+            _cache_stats["misses"] += 1
+            entry = (signature, loader())
+            if signature is not None:
+                _sheet_cache[file_path] = entry
+    df_alat, df_servis = entry[1]
+    return _read_only_view(df_alat), _read_only_view(df_servis)
+
+def invalidate_cache(file_path=None):
+    """Hapus cache sheet untuk satu file (atau semua file)"""
+    with _sheet_cache_lock:
+        if file_path is None:
+            _sheet_cache.clear()
+        else:
+            _sheet_cache.pop(file_path, None)
+
+def get_cache_stats():
+    """Statistik hit/miss cache sheet"""
+    with _sheet_cache_lock:
+        hits, misses = _cache_stats["hits"], _cache_stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+# ==================== KUNCI TULIS & PENULISAN ATOMIK ====================
+
+# Batas waktu (detik) menunggu kunci tulis dari proses lain
+LOCK_TIMEOUT = 10
+
+
+class _InterProcessLock:
+    """Kunci tulis lintas proses (flock) yang reentrant di dalam satu proses"""
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def _try_lock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def acquire(self, timeout=None):
+        timeout = LOCK_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        if not self._rlock.acquire(timeout=timeout):
+            raise TimeoutError(f"Gagal mendapatkan kunci tulis {self.lock_path} dalam {timeout} detik")
+        if self._depth > 0:
+            self._depth += 1
+            return
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        jeda = 0.0002
+        while True:
+            try:
+                self._try_lock(fd)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    self._rlock.release()
+                    raise TimeoutError(
+                        f"Gagal mendapatkan kunci tulis {self.lock_path} dalam {timeout} detik"
+                    )
+                time.sleep(jeda)
+                jeda = min(jeda * 2, 0.002)
+        self._fd = fd
+        self._depth = 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                self._unlock(fd)
+            finally:
+                os.close(fd)
+        self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+def get_write_lock(data_file):
+    """Ambil kunci tulis (satu per file data) yang dipakai bersama dalam proses ini"""
+    lock_path = data_file + ".lock"
+    with _write_locks_guard:
+        lock = _write_locks.get(lock_path)
+        if lock is None:
+            lock = _InterProcessLock(lock_path)
+            _write_locks[lock_path] = lock
+        return lock
+
+def _tanggal_untuk_excel(df):
+    """Kolom datetime64 sebagai date, agar sel Excel berformat YYYY-MM-DD tanpa jam"""
+    ubah = {
+        kolom: df[kolom].dt.date for kolom in df.columns
+        if pd.api.types.is_datetime64_any_dtype(df[kolom].dtype)
+    }
+    return df.assign(**ubah) if ubah else df
+
+def _tulis_excel_sementara(file_path, sheets):
+    """Tulis workbook (nama sheet -> DataFrame) ke file sementara di folder file_path;
+    kembalikan path file sementara yang siap di-rename"""
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".xlsx", dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            with pd.ExcelWriter(f, engine='openpyxl', date_format="YYYY-MM-DD") as writer:
+                for sheet, df in sheets.items():
+                    _tanggal_untuk_excel(df).to_excel(writer, sheet_name=sheet, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+            record_io(bytes_written=f.tell())
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path
+
+def _atomic_write_excel(file_path, sheets):
+    """Tulis workbook (nama sheet -> DataFrame) ke file sementara lalu rename, pembaca tidak
+    pernah melihat file setengah jadi"""
+    tmp_path = _tulis_excel_sementara(file_path, sheets)
+    try:
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _atomic_write_text(file_path, text):
+    """Tulis file teks secara atomik (file sementara lalu rename)"""
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".txt", dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _atomic_write_json(file_path, data):
+    """Tulis file JSON kecil secara atomik (file sementara lalu rename)"""
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# ==================== SNAPSHOT KOLUMNAR ====================
+# Salinan Arrow IPC (Feather, tanpa kompresi agar bisa di-memory-map) dari sheet Alat dan
+# Servis di sebelah workbook. Workbook tetap format utama yang bisa diedit manusia; snapshot
+# hanya jalur baca cepat dan selalu divalidasi terhadap tanda tangan + hash workbook.
+SNAPSHOT_ENABLED = os.environ.get("BENGKEL_SNAPSHOT", "1") != "0"
+SHEET_WORKBOOK = ("Alat", "Servis")
+
+def _snapshot_paths(excel_file, sheets=SHEET_WORKBOOK):
+    base = os.path.splitext(excel_file)[0]
+    return {sheet: f"{base}.{sheet.lower()}.arrow" for sheet in sheets}
+
+def _file_sha1(file_path):
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for blok in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(blok)
+    return sha1.hexdigest()
+
+def _arrow_table(df):
+    """DataFrame -> tabel Arrow; kolom object bertipe campuran disimpan sebagai teks"""
+    import pyarrow as pa
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for kolom in df.columns:
+            try:
+                pa.array(df[kolom], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[kolom] = df[kolom].map(lambda v: v if _kosongkan_nan(v) is None else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+def _write_snapshot(excel_file, sheets, signature=None):
+    """Tulis snapshot setiap sheet (nama -> DataFrame), ditandai tanda tangan dan SHA-1 workbook sumbernya"""
+    if not SNAPSHOT_ENABLED:
+        return False
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return False
+    signature = signature or _file_signature(excel_file)
+    if signature is None:
+        return False
+    meta = {b"bengkel_signature": json.dumps(list(signature)).encode(), b"bengkel_sha1": _file_sha1(excel_file).encode()}
+    folder = os.path.dirname(os.path.abspath(excel_file))
+    for sheet, df in sheets.items():
+        table = _arrow_table(df)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **meta})
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".arrow", dir=folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+                record_io(bytes_written=f.tell())
+            os.replace(tmp_path, _snapshot_paths(excel_file, [sheet])[sheet])
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return True
+
+def _read_snapshot(excel_file, signature, sheets=SHEET_WORKBOOK):
+    """Baca snapshot sheet (tuple DataFrame sesuai urutan sheets) jika masih sesuai workbook;
+    None jika harus parse ulang xlsx"""
+    if not SNAPSHOT_ENABLED or signature is None:
+        return None
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    tables, metas = {}, set()
+    try:
+        for sheet, path in _snapshot_paths(excel_file, sheets).items():
+            # memory_map: data kolom dibaca langsung dari page cache tanpa salinan tambahan
+            tables[sheet] = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            record_io(bytes_read=tables[sheet].nbytes)
+            meta = tables[sheet].schema.metadata or {}
+            metas.add((meta.get(b"bengkel_signature"), meta.get(b"bengkel_sha1")))
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if len(metas) != 1:
+        return None     # kedua file berasal dari versi workbook yang berbeda
+    snap_signature, snap_sha1 = metas.pop()
+    if snap_signature != json.dumps(list(signature)).encode():
+        # mtime/ukuran berubah (misal file disalin atau disimpan ulang tanpa perubahan isi):
+        # cek isi dengan hash sebelum memutuskan parse ulang
+        if snap_sha1 is None or snap_sha1.decode() != _file_sha1(excel_file):
+            return None
+        frames = {sheet: tables[sheet].to_pandas() for sheet in sheets}
+        _write_snapshot(excel_file, frames, signature)
+        return tuple(frames.values())
+    return tuple(tables[sheet].to_pandas() for sheet in sheets)
+
+def remove_snapshot(excel_file=None):
+    """Hapus snapshot kolumnar (akan dibangun ulang pada pembacaan berikutnya)"""
+    for path in _snapshot_paths(excel_file or EXCEL_FILE).values():
+        if os.path.exists(path):
+            os.remove(path)
+
+# ==================== INDEX PENCARIAN ====================
+# Kolom yang dicari beserta bobot relevansinya
+SEARCH_FIELDS = {"ID": 3, "Nama": 2, "Keterangan": 1}
+
+class _PrefixTrie:
+    """Trie karakter untuk autocomplete ID (case-insensitive)"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, kunci, nilai):
+        node = self.root
+        for ch in kunci.lower():
+            node = node.setdefault(ch, {})
+        node.setdefault("$", set()).add(nilai)
+
+    def remove(self, kunci, nilai):
+        kunci = kunci.lower()
+        jalur = [self.root]
+        for ch in kunci:
+            node = jalur[-1].get(ch)
+            if node is None:
+                return
+            jalur.append(node)
+        jalur[-1].get("$", set()).discard(nilai)
+        # Pangkas cabang yang sudah kosong dari daun ke atas
+        for i in range(len(kunci), 0, -1):
+            node = jalur[i]
+            if node.get("$"):
+                break
+            node.pop("$", None)
+            if node:
+                break
+            del jalur[i - 1][kunci[i - 1]]
+
+    def complete(self, prefix, limit=10):
+        node = self.root
+        for ch in prefix.lower():
+            node = node.get(ch)
+            if node is None:
+                return []
+        hasil, tumpukan = [], [node]
+        while tumpukan and len(hasil) < limit:
+            node = tumpukan.pop()
+            hasil.extend(sorted(node.get("$", ()), key=id_sort_key))
+            tumpukan.extend(node[ch] for ch in sorted((k for k in node if k != "$"), reverse=True))
+        return hasil[:limit]
+
+
+class _SearchIndex:
+    """Index pencarian alat: trigram untuk substring, trie untuk prefix ID, set per Kondisi
+
+    Dibangun sekali dari tabel alat lalu diperbarui per baris (upsert/remove) mengikuti
+    operasi tulis, sehingga pencarian tidak memindai ulang seluruh baris.
+    """
+
+    KOLOM = tuple(SEARCH_FIELDS)
+    BOBOT = tuple(SEARCH_FIELDS.values())
+
+    def __init__(self):
+        self.docs = {}          # ID -> (urutan, teks lowercase per kolom SEARCH_FIELDS, kondisi)
+        self.postings = {}      # trigram -> set ID
+        self.by_kondisi = {}    # kondisi -> set ID
+        self.trie = _PrefixTrie()
+        self._urutan = 0
+
+    @classmethod
+    def from_frame(cls, df_alat):
+        index = cls()
+        kolom = ["ID", "Kondisi"] + [k for k in cls.KOLOM if k != "ID"]
+        for row in df_alat.reindex(columns=kolom).itertuples(index=False):
+            index.upsert(dict(zip(kolom, row)))
+        return index
+
+    @staticmethod
+    def _grams(teks):
+        return {t[i:i + 3] for t in teks for i in range(len(t) - 2)}
+
+    def upsert(self, row):
+        """Tambah atau perbarui satu alat (kolom yang tidak diberikan tetap seperti semula)"""
+        alat_id = row["ID"]
+        lama = self.docs.get(alat_id)
+        if lama is not None:
+            urutan, teks, kondisi = lama
+            self._lepas(alat_id, teks, kondisi)
+        else:
+            urutan, teks, kondisi = self._urutan, ("",) * len(self.KOLOM), None
+            self._urutan += 1
+            self.trie.insert(str(alat_id), alat_id)
+        teks = tuple(
+            ("" if _kosongkan_nan(row[kolom]) is None else str(row[kolom]).lower()) if kolom in row else lama_teks
+            for kolom, lama_teks in zip(self.KOLOM, teks)
+        )
+        if "Kondisi" in row:
+            kondisi = _kosongkan_nan(row["Kondisi"])
+        self.docs[alat_id] = (urutan, teks, kondisi)
+        postings = self.postings
+        for gram in self._grams(teks):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = {alat_id}
+            else:
+                ids.add(alat_id)
+        self.by_kondisi.setdefault(kondisi, set()).add(alat_id)
+
+    def remove(self, alat_id):
+        lama = self.docs.pop(alat_id, None)
+        if lama is not None:
+            self._lepas(alat_id, lama[1], lama[2])
+            self.trie.remove(str(alat_id), alat_id)
+
+    def _lepas(self, alat_id, teks, kondisi):
+        for gram in self._grams(teks):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(alat_id)
+                if not ids:
+                    del self.postings[gram]
+        self.by_kondisi.get(kondisi, set()).discard(alat_id)
+
+    def apply_op(self, op):
+        """Terapkan satu operasi jurnal ke index"""
+        jenis = op.get("op")
+        if jenis == "insert_alat":
+            self.upsert(op["row"])
+        elif jenis == "update_alat" and op["id"] in self.docs:
+            self.upsert(dict(op["values"], ID=op["id"]))
+        elif jenis == "delete_alat":
+            self.remove(op["id"])
+
+    def _skor(self, teks, keyword):
+        """Skor relevansi: sama persis > awalan > awal kata > di tengah, lalu bobot kolom"""
+        skor = 0
+        for isi, bobot in zip(teks, self.BOBOT):
+            posisi = isi.find(keyword)
+            if posisi < 0:
+                continue
+            if posisi == 0:
+                nilai = 40 if len(isi) == len(keyword) else 30
+            elif not isi[posisi - 1].isalnum():
+                nilai = 20
+            else:
+                nilai = 10
+            if nilai + bobot > skor:
+                skor = nilai + bobot
+        return skor
+
+    def search(self, keyword, kondisi="Semua"):
+        """ID alat yang cocok, diurutkan dari yang paling relevan"""
+        keyword = str(keyword).strip().lower()
+        kandidat = self.by_kondisi.get(kondisi, set()) if kondisi != "Semua" else None
+        if len(keyword) >= 3:
+            # Irisan posting list dari yang terkecil; sisa false positive dibuang oleh _skor
+            daftar = [self.postings.get(g, set()) for g in self._grams((keyword,))]
+            if kandidat is not None:
+                daftar.append(kandidat)
+            daftar.sort(key=len)
+            kandidat = daftar[0].intersection(*daftar[1:])
+        elif kandidat is None:
+            kandidat = self.docs.keys()
+        docs, skor = self.docs, self._skor
+        hasil = []
+        for alat_id in kandidat:
+            urutan, teks, _ = docs[alat_id]
+            nilai = skor(teks, keyword) if keyword else 1
+            if nilai:
+                hasil.append((-nilai, urutan, alat_id))
+        hasil.sort()
+        return [alat_id for _, _, alat_id in hasil]
+
+    def complete_id(self, prefix, limit=10):
+        return self.trie.complete(str(prefix).strip(), limit)
+
+
+# ==================== PAGINASI ====================
+PAGE_SIZE = 50
+
+# Jumlah baris servis per chunk saat export streaming
+EXPORT_CHUNK_SIZE = 5000
+
+# Kolom yang boleh dipakai mengurutkan; kolom terakhir di tiap tabel adalah kunci unik
+# (pemecah seri), sehingga urutan total dan cursor keyset selalu stabil
+SORT_COLUMNS = {
+    "alat": ("ID", "Nama", "Kondisi", "Tanggal_Beli"),
+    "servis": ("ID_Servis", "ID_Alat", "Tanggal", "Jenis_Servis", "Biaya"),
+}
+_SORT_ID_COLUMNS = ("ID", "ID_Servis", "ID_Alat")
+_SORT_NUMERIC_COLUMNS = ("Biaya",)
+
+def _kunci_tabel(tabel):
+    return "ID" if tabel == "alat" else "ID_Servis"
+
+def _validate_sort(tabel, sort_by):
+    if sort_by not in SORT_COLUMNS[tabel]:
+        raise ValueError(f"Kolom urut tidak dikenal untuk {tabel}: {sort_by}")
+
+def _sort_keys(df, tabel, sort_by, posisi):
+    """Tuple urut per baris: (nilai kolom..., panjang ID, ID); ID diurut sebagai angka"""
+    def nilai_id(v):
+        v = "" if _kosongkan_nan(v) is None else str(v)
+        return (len(v), v)
+
+    pk = [nilai_id(v) for v in df[_kunci_tabel(tabel)].iloc[posisi].tolist()]
+    if sort_by == _kunci_tabel(tabel):
+        return pk
+    seri = df[sort_by].iloc[posisi]
+    if pd.api.types.is_datetime64_any_dtype(seri.dtype):
+        # Tanggal diurut sebagai angka (NaT paling kecil), urutannya sama dengan teks YYYY-MM-DD di SQLite
+        return [(v,) + k for v, k in zip(seri.to_numpy(dtype=DTYPE_TANGGAL).view("int64").tolist(), pk)]
+    kolom = seri.tolist()
+    if sort_by in _SORT_ID_COLUMNS:
+        nilai = [nilai_id(v) for v in kolom]
+    elif sort_by in _SORT_NUMERIC_COLUMNS:
+        nilai = [(_angka(v),) for v in kolom]
+    else:
+        nilai = [("" if _kosongkan_nan(v) is None else str(v),) for v in kolom]
+    return [a + b for a, b in zip(nilai, pk)]
+
+def _cursor(keys):
+    """Cursor keyset sebagai list nilai Python biasa (bisa di-JSON-kan dan di-bind ke SQL)"""
+    return [v.item() if hasattr(v, "item") else v for v in keys]
+
+def _sql_sort_exprs(tabel, sort_by):
+    """Ekspresi SQL yang menghasilkan tuple urut yang sama dengan _sort_keys"""
+    pk = _kunci_tabel(tabel)
+    exprs = [f"length({pk})", pk]
+    if sort_by == pk:
+        return exprs
+    if sort_by in _SORT_ID_COLUMNS:
+        nilai = [f"length(COALESCE({sort_by}, ''))", f"COALESCE({sort_by}, '')"]
+    elif sort_by in _SORT_NUMERIC_COLUMNS:
+        nilai = [f"COALESCE({sort_by}, 0)"]
+    else:
+        nilai = [f"COALESCE(CAST({sort_by} AS TEXT), '')"]
+    return nilai + exprs
+
+
+# ==================== BACKEND PENYIMPANAN ====================
+
+def _kosongkan_nan(value):
+    """Ubah NaN menjadi None agar bisa disimpan ke database"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def _json_default(value):
+    """Konversi nilai numpy/pandas agar bisa ditulis ke JSON"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+def _append_rows(df, rows, tabel):
+    """Tambahkan banyak baris sekaligus dengan satu kali concat (baris baru sudah bertipe skema)"""
+    if not rows:
+        return df
+    df, baru = _samakan_kategori(df, _terapkan_skema(pd.DataFrame(rows), tabel))
+    return _terapkan_skema(pd.concat([df, baru], ignore_index=True), tabel)
+
+def _samakan_kategori(df, baru):
+    """Samakan kategori kolom categorical kedua frame agar hasil concat tetap categorical"""
+    for kolom in df.columns:
+        dtype = df[kolom].dtype
+        if not isinstance(dtype, pd.CategoricalDtype) or kolom not in baru.columns:
+            continue
+        lain = [k for k in baru[kolom].dropna().unique() if k not in dtype.categories]
+        if lain:
+            df = df.assign(**{kolom: df[kolom].cat.add_categories(lain)})
+        baru = baru.assign(**{kolom: baru[kolom].astype(df[kolom].dtype)})
+    return df, baru
+
+def _apply_journal(df_alat, df_servis, ops, dedupe=False, arsip=None):
+    """Terapkan operasi jurnal (insert/update/delete) ke DataFrame snapshot
+
+    Dengan dedupe=True insert yang ID-nya sudah ada di snapshot (atau sudah disegel ke
+    partisi arsip) dilewati, sehingga replay setelah crash di tengah compaction (workbook
+    sudah ditulis, jurnal belum dihapus) tidak menggandakan baris.
+    """
+    if dedupe:
+        id_alat = set(df_alat['ID'].tolist())
+        id_servis = set(df_servis['ID_Servis'].tolist())
+        ops = [
+            op for op in ops
+            if not (op.get("op") == "insert_alat" and op["row"]["ID"] in id_alat)
+            and not (op.get("op") == "insert_servis" and (
+                op["row"]["ID_Servis"] in id_servis or (arsip is not None and arsip.berisi(op["row"]))
+            ))
+        ]
+    baru_alat, baru_servis = [], []
+    for op in ops:
+        jenis = op.get("op")
+        if jenis == "insert_alat":
+            baru_alat.append(op["row"])
+        elif jenis == "insert_servis":
+            baru_servis.append(op["row"])
+        else:
+            # Update/delete harus melihat semua insert sebelumnya
+            df_alat, baru_alat = _append_rows(df_alat, baru_alat, "alat"), []
+            df_servis, baru_servis = _append_rows(df_servis, baru_servis, "servis"), []
+            if jenis == "update_alat":
+                mask = df_alat['ID'] == op["id"]
+                for kolom, value in op["values"].items():
+                    # Nilai dibentuk sesuai skema dulu agar kolom tetap bertipe (tanpa lewat object)
+                    value = _nilai_skema(kolom, value)
+                    if kolom in df_alat.columns and isinstance(df_alat[kolom].dtype, pd.CategoricalDtype) \
+                            and pd.notna(value) and value not in df_alat[kolom].cat.categories:
+                        df_alat[kolom] = df_alat[kolom].cat.add_categories([value])
+                    df_alat.loc[mask, kolom] = value
+                df_alat = _terapkan_skema(df_alat, "alat")
+            elif jenis == "delete_alat":
+                df_alat = df_alat[df_alat['ID'] != op["id"]].reset_index(drop=True)
+                df_servis = df_servis[df_servis['ID_Alat'] != op["id"]].reset_index(drop=True)
+    return _append_rows(df_alat, baru_alat, "alat"), _append_rows(df_servis, baru_servis, "servis")
+
+
+def _index_posisi(kolom):
+    """Index hash nilai -> array posisi baris (urut); factorize + argsort sekali, bukan
+    groupby().indices yang mengambil kunci Arrow satu per satu"""
+    kode, nilai = pd.factorize(kolom)
+    urutan = np.argsort(kode, kind="stable")
+    batas = np.searchsorted(kode[urutan], np.arange(len(nilai) + 1))
+    return {v: urutan[batas[i]:batas[i + 1]] for i, v in enumerate(nilai.tolist())}
+
+def _ensure_indexes(state):
+    """Bangun index hash ID -> posisi baris Alat dan ID_Alat -> posisi baris Servis"""
+    if state["idx_alat"] is None:
+        idx_alat = {}
+        for pos, alat_id in enumerate(state["alat"]['ID'].tolist()):
+            # Sama seperti pencarian lama: baris pertama yang cocok yang dipakai
+            idx_alat.setdefault(alat_id, pos)
+        state["idx_alat"] = idx_alat
+    if state["idx_servis"] is None:
+        state["idx_servis"] = {
+            alat_id: posisi.tolist() for alat_id, posisi in _index_posisi(state["servis"]['ID_Alat']).items()
+        }
+    return state["idx_alat"], state["idx_servis"]
+
+def _extend_indexes(state, n_alat, n_servis):
+    """Perbarui index secara inkremental untuk baris yang baru di-append"""
+    if state["idx_alat"] is not None:
+        for pos, alat_id in enumerate(state["alat"]['ID'].iloc[n_alat:].tolist(), start=n_alat):
+            state["idx_alat"].setdefault(alat_id, pos)
+    if state["idx_servis"] is not None:
+        for pos, alat_id in enumerate(state["servis"]['ID_Alat'].iloc[n_servis:].tolist(), start=n_servis):
+            state["idx_servis"].setdefault(alat_id, []).append(pos)
+
+
+def _angka(value):
+    """Nilai Biaya sebagai angka (kosong / tidak valid -> 0)"""
+    value = pd.to_numeric(_kosongkan_nan(value), errors='coerce')
+    return 0 if value is None or pd.isna(value) else value
+
+def _tanggal_str(value):
+    """Tanggal sebagai string YYYY-MM-DD (atau None) agar bisa dibandingkan"""
+    value = _kosongkan_nan(value)
+    return None if value is None else str(value)[:10]
+
+def _compute_aggregates(df_alat, df_servis):
+    """Hitung agregat dashboard dari baris mentah (dipakai saat load dan cek konsistensi)"""
+    kondisi = Counter(_kosongkan_nan(k) for k in df_alat['Kondisi'].tolist())
+    # Tanggal sudah datetime64 (skema), jadi max per alat berjalan di jalur cython
+    df = pd.DataFrame({
+        "ID_Alat": df_servis['ID_Alat'].to_numpy(),
+        "Biaya": pd.to_numeric(df_servis['Biaya'], errors='coerce').fillna(0).to_numpy(),
+        "Tanggal": _kolom_tanggal(df_servis['Tanggal']).to_numpy(),
+    })
+    per_alat = {}
+    if len(df) > 0:
+        grouped = df.groupby('ID_Alat', sort=False).agg(
+            jumlah=('Biaya', 'size'), biaya=('Biaya', 'sum'), terakhir=('Tanggal', 'max')
+        )
+        terakhir = grouped['terakhir'].dt.strftime('%Y-%m-%d')
+        for alat_id, jumlah, biaya, tanggal in zip(grouped.index.tolist(), grouped['jumlah'].tolist(),
+                                                   grouped['biaya'].tolist(), terakhir.tolist()):
+            per_alat[alat_id] = {"jumlah": jumlah, "biaya": biaya, "terakhir": _kosongkan_nan(tanggal)}
+    return {
+        "kondisi": kondisi,
+        "kondisi_per_alat": dict(zip(df_alat['ID'].tolist(), (_kosongkan_nan(k) for k in df_alat['Kondisi'].tolist()))),
+        "total_servis": len(df_servis),
+        "total_biaya": df['Biaya'].sum().item() if len(df) > 0 else 0,
+        "per_alat": per_alat,
+    }
+
+def _apply_aggregate_delta(agg, op):
+    """Perbarui agregat secara O(1) untuk satu operasi jurnal"""
+    jenis = op.get("op")
+    if jenis == "insert_alat":
+        row = op["row"]
+        agg["kondisi_per_alat"][row["ID"]] = row.get("Kondisi")
+        agg["kondisi"][row.get("Kondisi")] += 1
+    elif jenis == "update_alat":
+        values = op["values"]
+        if op["id"] in agg["kondisi_per_alat"] and "Kondisi" in values:
+            agg["kondisi"][agg["kondisi_per_alat"][op["id"]]] -= 1
+            agg["kondisi"][values["Kondisi"]] += 1
+            agg["kondisi_per_alat"][op["id"]] = values["Kondisi"]
+    elif jenis == "delete_alat":
+        if op["id"] in agg["kondisi_per_alat"]:
+            agg["kondisi"][agg["kondisi_per_alat"].pop(op["id"])] -= 1
+        per = agg["per_alat"].pop(op["id"], None)
+        if per:
+            agg["total_servis"] -= per["jumlah"]
+            agg["total_biaya"] -= per["biaya"]
+    elif jenis == "insert_servis":
+        row = op["row"]
+        biaya = _angka(row.get("Biaya"))
+        tanggal = _tanggal_str(row.get("Tanggal"))
+        per = agg["per_alat"].setdefault(row["ID_Alat"], {"jumlah": 0, "biaya": 0, "terakhir": None})
+        per["jumlah"] += 1
+        per["biaya"] += biaya
+        if tanggal and (per["terakhir"] is None or tanggal > per["terakhir"]):
+            per["terakhir"] = tanggal
+        agg["total_servis"] += 1
+        agg["total_biaya"] += biaya
+
+def _ringkas_aggregates(kondisi, total_servis, total_biaya):
+    """Bentuk ringkasan agregat yang dikembalikan ke pemanggil"""
+    kondisi = {k: v for k, v in kondisi.items() if v > 0}
+    return {
+        "kondisi": kondisi,
+        "total_alat": sum(kondisi.values()),
+        "total_servis": total_servis,
+        "total_biaya": total_biaya,
+    }
+
+KOLOM_ROLLUP = ["Bulan", "Jenis_Servis", "ID_Alat", "Jumlah", "Biaya"]
+
+def _rollup_biaya(df_servis):
+    """Rollup biaya bulan x Jenis_Servis x ID_Alat dari baris servis (tanggal di-parse sekali, vectorized)
+
+    Kolom Bulan bertipe datetime64 (awal bulan); tanggal kosong/tidak valid menjadi NaT agar
+    total biaya tetap sama dengan agregat dashboard.
+    """
+    tanggal = _kolom_tanggal(df_servis['Tanggal'])
+    df = pd.DataFrame({
+        "Bulan": tanggal.dt.to_period("M").dt.to_timestamp(),
+        "Jenis_Servis": df_servis['Jenis_Servis'].astype("string").fillna("").replace("", "-"),
+        "ID_Alat": df_servis['ID_Alat'].astype("string").fillna(""),
+        "Biaya": pd.to_numeric(df_servis['Biaya'], errors='coerce').fillna(0).astype("float64"),
+    })
+    if len(df) == 0:
+        return pd.DataFrame({
+            "Bulan": pd.Series(dtype="datetime64[ns]"), "Jenis_Servis": pd.Series(dtype="string"),
+            "ID_Alat": pd.Series(dtype="string"), "Jumlah": pd.Series(dtype="int64"),
+            "Biaya": pd.Series(dtype="float64"),
+        })
+    return df.groupby(["Bulan", "Jenis_Servis", "ID_Alat"], dropna=False, sort=False).agg(
+        Jumlah=("Biaya", "size"), Biaya=("Biaya", "sum")
+    ).reset_index()
+
+def _gabung_rollup(*frames):
+    """Jumlahkan beberapa rollup dengan kunci yang sama"""
+    frames = [f for f in frames if len(f) > 0] or list(frames[-1:])
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True).groupby(
+        ["Bulan", "Jenis_Servis", "ID_Alat"], dropna=False, sort=False
+    ).agg(Jumlah=("Jumlah", "sum"), Biaya=("Biaya", "sum")).reset_index()
+
+
+class _RollupBiaya:
+    """Rollup biaya servis yang diperbarui incremental dari operasi jurnal
+
+    Servis baru ditampung lalu dilipat ke rollup sekali saat dibaca (satu groupby kecil untuk
+    baris baru saja), sehingga tanggal baris lama tidak pernah di-parse ulang.
+    """
+
+    def __init__(self, frame):
+        self._frame = frame
+        self._baru = []
+
+    @classmethod
+    def from_frame(cls, df_servis):
+        return cls(_rollup_biaya(df_servis))
+
+    def apply_op(self, op):
+        """Terapkan satu operasi jurnal ke rollup"""
+        jenis = op.get("op")
+        if jenis == "insert_servis":
+            self._baru.append(op["row"])
+        elif jenis == "delete_alat":
+            # Servis alat ikut terhapus; jarang terjadi, jadi langsung difilter
+            self._baru = [row for row in self._baru if row.get("ID_Alat") != op["id"]]
+            self._frame = self._frame[self._frame['ID_Alat'] != op["id"]].reset_index(drop=True)
+
+    def frame(self):
+        if self._baru:
+            delta = _rollup_biaya(pd.DataFrame(self._baru, columns=KOLOM_SERVIS))
+            self._frame = _gabung_rollup(self._frame, delta)
+            self._baru = []
+        return _read_only_view(self._frame)
+
+
+# ==================== ARSIP SERVIS PER TAHUN ====================
+# Riwayat servis backend Excel dipartisi per tahun Tanggal. Tahun berjalan (dan servis tanpa
+# tanggal) tetap "panas" di sheet Servis workbook utama; tahun-tahun sebelumnya disegel saat
+# compaction menjadi file arsip read-only (servis_<tahun>.xlsx) di folder <workbook>.arsip/.
+# Di sebelah setiap partisi ada snapshot Arrow berisi barisnya dan ringkasannya (agregat per
+# alat + rollup biaya), sedangkan manifest.json hanya menyimpan total per partisi. Total tidak
+# pernah membuka file arsip, dan riwayat per alat / servis terbaru hanya membuka partisi yang
+# mungkin berisi barisnya.
+ARSIP_ENABLED = os.environ.get("BENGKEL_ARSIP", "1") != "0"
+
+def _tahun_servis(df_servis):
+    """Tahun Tanggal setiap baris servis (array float, NaN untuk tanggal kosong)"""
+    return _kolom_tanggal(df_servis['Tanggal']).dt.year.to_numpy(dtype="float64", na_value=np.nan)
+
+def _baris_tahun_lama(df_servis):
+    """Mask baris servis bertahun sebelum tahun berjalan (kandidat disegel)"""
+    return _tahun_servis(df_servis) < datetime.now().year
+
+def _gabung_servis(frames):
+    """Gabungkan potongan tabel servis (urutan dipertahankan) tetap bertipe skema"""
+    frames = [f for f in frames if len(f) > 0] or frames[-1:]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    df = _terapkan_skema(pd.concat(frames, ignore_index=True), "servis")
+    for kolom in df.columns:
+        # concat kolom Arrow menyisakan satu chunk per partisi; take per halaman lebih cepat
+        # pada satu chunk utuh
+        if getattr(df[kolom].dtype, "storage", None) == "pyarrow":
+            df[kolom] = pd.array(df[kolom].array.__arrow_array__().combine_chunks(), dtype=df[kolom].dtype)
+    return df
+
+def _ringkas_partisi(df_servis):
+    """Ringkasan satu partisi (nama -> DataFrame): agregat per alat dan rollup biaya"""
+    per_alat = _compute_aggregates(pd.DataFrame(columns=KOLOM_ALAT), df_servis)["per_alat"]
+    return {
+        "Ringkasan_Alat": pd.DataFrame({
+            "ID_Alat": pd.Series(list(per_alat), dtype="string"),
+            "Jumlah": pd.Series([p["jumlah"] for p in per_alat.values()], dtype="int64"),
+            "Biaya": pd.Series([p["biaya"] for p in per_alat.values()]),
+            "Terakhir": pd.Series([p["terakhir"] for p in per_alat.values()], dtype="string"),
+        }),
+        "Rollup": _rollup_biaya(df_servis),
+    }
+
+def _skema_rollup(df):
+    """Samakan tipe kolom rollup hasil baca snapshot dengan keluaran _rollup_biaya"""
+    return df.astype({"Jenis_Servis": "string", "ID_Alat": "string", "Jumlah": "int64", "Biaya": "float64"})
+
+def _gabung_ringkasan_alat(a, b):
+    """Gabungkan dua agregat servis per alat (jumlah, biaya, tanggal terakhir)"""
+    terakhir = [t for t in (a["terakhir"], b["terakhir"]) if t]
+    return {"jumlah": a["jumlah"] + b["jumlah"], "biaya": a["biaya"] + b["biaya"],
+            "terakhir": max(terakhir) if terakhir else None}
+
+
+class _ArsipServis:
+    """Partisi tahunan riwayat servis yang sudah disegel, beserta ringkasannya
+
+    File partisi dan ringkasannya baru dibaca saat dibutuhkan (sekali per proses, lewat
+    snapshot Arrow). Alat yang dihapus setelah partisinya disegel dicatat sebagai tombstone
+    ("dihapus") di manifest: total partisi langsung dikurangi, baris dan ringkasannya disaring
+    saat dibaca, dan baru dibuang dari file saat tahun itu disegel ulang.
+    """
+
+    def __init__(self, folder, manifest=None):
+        manifest = manifest or {}
+        self.folder = folder
+        self.partisi = {int(tahun): p for tahun, p in manifest.get("partisi", {}).items()}
+        # Seal terakhir: tanda tangan workbook panas sebelum seal dan tahun yang dipindahkan
+        self.segel_terakhir = manifest.get("segel")
+        self.berubah = False
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._frames, self._idx, self._ringkasan, self._rollup = {}, {}, {}, None
+
+    @classmethod
+    def load(cls, folder):
+        try:
+            with open(os.path.join(folder, "manifest.json"), 'r', encoding='utf-8') as f:
+                return cls(folder, json.load(f))
+        except FileNotFoundError:
+            return cls(folder)
+
+    def simpan(self):
+        os.makedirs(self.folder, exist_ok=True)
+        _atomic_write_json(os.path.join(self.folder, "manifest.json"), {
+            "partisi": {str(tahun): p for tahun, p in sorted(self.partisi.items())},
+            "segel": self.segel_terakhir,
+        })
+        self.berubah = False
+
+    def path(self, tahun):
+        return os.path.join(self.folder, f"servis_{tahun}.xlsx")
+
+    def tahun(self):
+        return sorted(self.partisi)
+
+    def tahun_alat(self, alat_id):
+        """Tahun partisi yang berisi servis alat ini (dari ringkasan, tanpa membuka baris partisi)"""
+        return [tahun for tahun in self.tahun() if alat_id in self.ringkasan_alat(tahun)]
+
+    def _baca_partisi(self, tahun, sheets):
+        """Snapshot Arrow partisi (tuple DataFrame sesuai sheets); dibangun ulang dari file
+        partisi jika hilang atau tidak sesuai lagi"""
+        path = self.path(tahun)
+        frames = _read_snapshot(path, _file_signature(path), sheets=sheets)
+        if frames is not None:
+            return frames
+        if sheets == ("Servis",):
+            df = _terapkan_skema(pd.read_excel(path, sheet_name="Servis"), "servis")
+            record_io(bytes_read=os.path.getsize(path))
+            semua = {"Servis": df}
+        else:
+            semua = _ringkas_partisi(self.frame(tahun))
+        try:
+            _write_snapshot(path, semua)
+        except OSError as e:
+            logger.warning("Gagal menulis snapshot %s: %s", path, e)
+        return tuple(semua[sheet] for sheet in sheets)
+
+    def frame(self, tahun):
+        """Baris satu partisi, tanpa servis milik alat yang sudah dihapus"""
+        if tahun not in self._frames:
+            df = _terapkan_skema(self._baca_partisi(tahun, ("Servis",))[0], "servis")
+            dihapus = self.partisi[tahun]["dihapus"]
+            if dihapus:
+                df = df[~df['ID_Alat'].isin(dihapus)].reset_index(drop=True)
+            self._frames[tahun] = df
+        return self._frames[tahun]
+
+    def posisi_alat(self, tahun, alat_id):
+        """Posisi baris servis satu alat di partisi tahun (index ID_Alat -> posisi per partisi)"""
+        if tahun not in self._idx:
+            self._idx[tahun] = _index_posisi(self.frame(tahun)['ID_Alat'])
+        return self._idx[tahun].get(alat_id, np.empty(0, dtype=np.intp))
+
+    def ringkasan_alat(self, tahun):
+        """Agregat per alat satu partisi: ID_Alat -> (jumlah, biaya, terakhir)"""
+        if tahun not in self._ringkasan:
+            df = self._baca_partisi(tahun, ("Ringkasan_Alat",))[0]
+            ringkasan = dict(zip(df['ID_Alat'].tolist(), zip(
+                df['Jumlah'].tolist(), df['Biaya'].tolist(), df['Terakhir'].tolist(),
+            )))
+            for alat_id in self.partisi[tahun]["dihapus"]:
+                ringkasan.pop(alat_id, None)
+            self._ringkasan[tahun] = ringkasan
+        return self._ringkasan[tahun]
+
+    def total(self):
+        """(jumlah servis, total biaya) seluruh partisi arsip, dari manifest"""
+        return (sum(p["jumlah"] for p in self.partisi.values()),
+                sum(p["biaya"] for p in self.partisi.values()))
+
+    def per_alat(self, alat_id):
+        hasil = {"jumlah": 0, "biaya": 0, "terakhir": None}
+        for tahun in self.tahun_alat(alat_id):
+            jumlah, biaya, terakhir = self.ringkasan_alat(tahun)[alat_id]
+            hasil = _gabung_ringkasan_alat(
+                hasil, {"jumlah": jumlah, "biaya": biaya, "terakhir": _kosongkan_nan(terakhir)}
+            )
+        return hasil
+
+    def rollup(self):
+        if self._rollup is None:
+            bagian = []
+            for tahun in self.tahun():
+                df = _skema_rollup(self._baca_partisi(tahun, ("Rollup",))[0])
+                dihapus = self.partisi[tahun]["dihapus"]
+                bagian.append(df[~df['ID_Alat'].isin(dihapus)] if dihapus else df)
+            self._rollup = _gabung_rollup(*bagian, _rollup_biaya(pd.DataFrame(columns=KOLOM_SERVIS)))
+        return self._rollup
+
+    def berisi(self, row):
+        """True jika baris servis (dari jurnal) sudah tersimpan di partisi tahunnya"""
+        tanggal = _nilai_simpan("Tanggal", row.get("Tanggal"))
+        if tanggal is None or int(tanggal[:4]) not in self.partisi:
+            return False
+        return (self.frame(int(tanggal[:4]))['ID_Servis'] == row.get("ID_Servis")).any()
+
+    def apply_op(self, op):
+        """Hapus alat: kurangi total setiap partisi yang berisi alat itu dan catat sebagai tombstone"""
+        if op.get("op") != "delete_alat":
+            return
+        alat_id = op["id"]
+        for tahun in self.tahun_alat(alat_id):
+            jumlah, biaya, _ = self._ringkasan[tahun].pop(alat_id)
+            p = self.partisi[tahun]
+            p["jumlah"] -= jumlah
+            p["biaya"] -= biaya
+            p["dihapus"].append(alat_id)
+            if tahun in self._frames:
+                df = self._frames[tahun]
+                self._frames[tahun] = df[df['ID_Alat'] != alat_id].reset_index(drop=True)
+                self._idx.pop(tahun, None)
+            self._rollup = None
+            self.berubah = True
+
+    def saring_panas(self, df_servis, signature):
+        """Buang baris workbook panas yang sudah disegel jika workbook itu belum ditulis ulang
+        (proses mati setelah manifest disimpan, sebelum workbook panas diganti)"""
+        segel = self.segel_terakhir
+        if not segel or signature is None or segel.get("dari") != list(signature):
+            return df_servis
+        return df_servis[~np.isin(_tahun_servis(df_servis), segel["tahun"])].reset_index(drop=True)
+
+    def segel(self, df_servis, signature=None):
+        """Pindahkan baris bertahun lama dari partisi panas ke file arsip; kembalikan sisa baris panas
+
+        Tahun yang sudah punya partisi disegel ulang (baris lama + baris susulan, tombstone
+        dibuang dari file). Urutan tulis: file partisi, manifest, lalu (oleh pemanggil)
+        workbook panas; `signature` workbook panas dicatat di manifest untuk saring_panas.
+        """
+        lama = _baris_tahun_lama(df_servis)
+        if not lama.any():
+            return df_servis
+        os.makedirs(self.folder, exist_ok=True)
+        tahun_baris = _tahun_servis(df_servis)[lama].astype(int)
+        disegel = []
+        for tahun, df_tahun in df_servis[lama].groupby(tahun_baris, sort=True):
+            tahun = int(tahun)
+            if tahun in self.partisi:
+                df_tahun = _gabung_servis([self.frame(tahun), df_tahun])
+            self._tulis_partisi(tahun, _terapkan_skema(df_tahun.reset_index(drop=True), "servis"))
+            disegel.append(tahun)
+        self.segel_terakhir = {"dari": list(signature) if signature else None, "tahun": disegel}
+        self.simpan()
+        return df_servis[~lama].reset_index(drop=True)
+
+    def _tulis_partisi(self, tahun, df):
+        path = self.path(tahun)
+        if os.path.exists(path):
+            # Tahun yang disegel ulang: izinkan diganti (os.replace gagal di Windows untuk file read-only)
+            os.chmod(path, os.stat(path).st_mode | 0o200)
+        _atomic_write_excel(path, {"Servis": df})
+        ringkasan = _ringkas_partisi(df)
+        try:
+            _write_snapshot(path, {"Servis": df, **ringkasan})
+        except OSError as e:
+            logger.warning("Gagal menulis snapshot %s: %s", path, e)
+        # File arsip hanya dibaca; operasi tulis biasa tidak pernah menyentuhnya lagi
+        os.chmod(path, os.stat(path).st_mode & ~0o222)
+        self.partisi[tahun] = {
+            "jumlah": len(df), "biaya": sum(ringkasan["Ringkasan_Alat"]['Biaya'].tolist()), "dihapus": [],
+        }
+        self._frames[tahun] = df
+        self._idx.pop(tahun, None)
+        self._ringkasan.pop(tahun, None)
+        self._rollup = None
+
+    def hapus_semua(self):
+        """Hapus seluruh partisi arsip (dipakai saat isi penyimpanan ditimpa)"""
+        if os.path.isdir(self.folder):
+            for nama in os.listdir(self.folder):
+                path = os.path.join(self.folder, nama)
+                os.chmod(path, os.stat(path).st_mode | 0o200)
+                os.remove(path)
+            os.rmdir(self.folder)
+        self.partisi, self.segel_terakhir = {}, None
+        self._reset_cache()
+
+
+# Ukuran jurnal (byte) sebelum compaction otomatis dijalankan di background (~1500 entri).
+# Ukuran file dipakai (bukan jumlah entri) agar ambangnya sama untuk semua proses.
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+# State gabungan snapshot + jurnal per file Excel (dibagi semua sesi dalam satu proses)
+_journal_state = {}
+_journal_lock = threading.RLock()
+_compaction_threads = {}
+
+
+class ExcelBackend:
+    """Backend penyimpanan berbasis file Excel (sheet Alat dan Servis)
+
+    Perubahan satu baris tidak langsung menulis ulang workbook, melainkan ditambahkan
+    ke jurnal append-only (JSON-lines) di sebelah file Excel. Pembacaan menggabungkan
+    jurnal di atas snapshot workbook terakhir, dan compaction melipat jurnal kembali
+    ke workbook saat jurnal mencapai JOURNAL_COMPACT_BYTES. Sheet Servis hanya berisi
+    partisi panas; servis tahun-tahun sebelumnya ada di partisi arsip (_ArsipServis).
+    """
+
+    name = "excel"
+
+    def __init__(self, excel_file):
+        self.excel_file = excel_file
+        self.journal_file = os.path.splitext(excel_file)[0] + ".journal.jsonl"
+        self.sequence_file = os.path.splitext(excel_file)[0] + ".seq.json"
+        self.arsip_folder = os.path.splitext(excel_file)[0] + ".arsip"
+
+    def write_lock(self):
+        """Kunci tulis lintas proses untuk workbook dan jurnalnya"""
+        return get_write_lock(self.excel_file)
+
+    def versi(self):
+        """Token murah (hanya stat) yang berubah setiap isi penyimpanan berubah: jurnal hanya
+        bertambah panjang, dan compaction mengganti workbook dengan file (inode) baru"""
+        try:
+            st_file = os.stat(self.excel_file)
+        except OSError:
+            return None
+        return (st_file.st_ino, st_file.st_mtime_ns, st_file.st_size, self._journal_size())
+
+    def init(self):
+        """Buat file Excel kosong jika belum ada dan pulihkan jurnal sisa crash"""
+        with _journal_lock:
+            if self.excel_file in _journal_state and os.path.exists(self.excel_file):
+                return
+        with self.write_lock():
+            if not os.path.exists(self.excel_file):
+                self._write(pd.DataFrame(columns=KOLOM_ALAT), pd.DataFrame(columns=KOLOM_SERVIS))
+            # Pertama kali file ini dibuka di proses ini: replay jurnal ke workbook, dan segel
+            # servis tahun lalu yang masih ada di partisi panas (misal setelah pergantian tahun)
+            if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > 0:
+                self.compact()
+            else:
+                with _journal_lock:
+                    perlu_segel = ARSIP_ENABLED and _baris_tahun_lama(self._current_state()["servis"]).any()
+                if perlu_segel:
+                    self.compact()
+
+    def _parse(self):
+        """Baca kedua sheet: dari snapshot kolumnar jika valid, jika tidak parse xlsx lalu buat snapshot"""
+        signature = _file_signature(self.excel_file)
+        snapshot = _read_snapshot(self.excel_file, signature)
+        if snapshot is not None:
+            return _terapkan_skema(snapshot[0], "alat"), _terapkan_skema(snapshot[1], "servis")
+        try:
+            sheets = pd.read_excel(self.excel_file, sheet_name=['Alat', 'Servis'])
+            record_io(bytes_read=os.path.getsize(self.excel_file))
+        except Exception:
+            return (_terapkan_skema(pd.DataFrame(columns=KOLOM_ALAT), "alat"),
+                    _terapkan_skema(pd.DataFrame(columns=KOLOM_SERVIS), "servis"))
+        df_alat, df_servis = _terapkan_skema(sheets['Alat'], "alat"), _terapkan_skema(sheets['Servis'], "servis")
+        try:
+            _write_snapshot(self.excel_file, {"Alat": df_alat, "Servis": df_servis}, signature)
+        except OSError as e:
+            logger.warning("Gagal menulis snapshot %s: %s", self.excel_file, e)
+        return df_alat, df_servis
+
+    def _read_journal(self, offset):
+        """Baca entri jurnal lengkap mulai dari offset byte; kembalikan (ops, offset_baru)"""
+        ops = []
+        awal = offset
+        try:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Baris terakhir terpotong (crash saat menulis), abaikan
+                        break
+                    offset += len(line)
+                    if line.strip():
+                        ops.append(json.loads(line))
+        except FileNotFoundError:
+            pass
+        record_io(bytes_read=offset - awal)
+        return ops, offset
+
+    def _journal_stat(self):
+        """(inode, ukuran) jurnal; (None, 0) jika belum ada"""
+        try:
+            st_file = os.stat(self.journal_file)
+        except OSError:
+            return None, 0
+        return st_file.st_ino, st_file.st_size
+
+    def _journal_size(self):
+        return self._journal_stat()[1]
+
+    def _current_state(self):
+        """State terkini (snapshot + jurnal); panggil sambil memegang _journal_lock"""
+        signature = _file_signature(self.excel_file)
+        journal_id, size = self._journal_stat()
+        state = _journal_state.get(self.excel_file)
+        # Compaction menulis ulang jurnal (file baru) berisi entri yang belum terlipat saja,
+        # jadi offset hanya berlaku selama file jurnalnya masih sama
+        if (state is None or state["signature"] != signature or size < state["offset"]
+                or (state["offset"] and journal_id != state["journal_id"])):
+            df_alat, df_servis = _load_sheets_cached(self.excel_file, self._parse)
+            arsip = _ArsipServis.load(self.arsip_folder)
+            # "servis" hanya partisi panas; "riwayat" = arsip + panas (per alat / None untuk semua),
+            # dibentuk saat dibutuhkan
+            state = {"signature": signature, "offset": 0, "journal_id": None, "alat": df_alat,
+                     "servis": arsip.saring_panas(df_servis, signature), "arsip": arsip, "riwayat": {},
+                     "idx_alat": None, "idx_servis": None, "agg": None, "search": None,
+                     "biaya": None, "sorted": {}}
+            _journal_state[self.excel_file] = state
+        else:
+            with _sheet_cache_lock:
+                _cache_stats["hits"] += 1
+        if size > state["offset"]:
+            state["journal_id"] = journal_id
+            dedupe = state["offset"] == 0
+            ops, state["offset"] = self._read_journal(state["offset"])
+            n_alat, n_servis = len(state["alat"]), len(state["servis"])
+            state["alat"], state["servis"] = _apply_journal(
+                state["alat"], state["servis"], ops, dedupe=dedupe, arsip=state["arsip"]
+            )
+            for op in ops:
+                state["arsip"].apply_op(op)
+            if state["agg"] is not None:
+                for op in ops:
+                    _apply_aggregate_delta(state["agg"], op)
+            if state["search"] is not None:
+                for op in ops:
+                    state["search"].apply_op(op)
+            if state["biaya"] is not None:
+                for op in ops:
+                    state["biaya"].apply_op(op)
+            state["sorted"] = {}
+            state["riwayat"] = {}
+            if any(op.get("op") == "delete_alat" for op in ops):
+                # Delete menggeser posisi baris, index dibangun ulang saat dibutuhkan
+                state["idx_alat"] = state["idx_servis"] = None
+            else:
+                # Insert hanya menambah baris di akhir, update tidak mengubah posisi
+                _extend_indexes(state, n_alat, n_servis)
+        return state
+
+    def aggregates(self):
+        """Ringkasan agregat dashboard tanpa menyentuh baris mentah"""
+        with _journal_lock:
+            state = self._current_state()
+            if state["agg"] is None:
+                # Sekali per snapshot workbook (partisi panas); setelah itu hanya delta dari jurnal
+                state["agg"] = _compute_aggregates(state["alat"], state["servis"])
+            agg = state["agg"]
+            # Partisi arsip cukup dari ringkasan manifest, filenya tidak dibuka
+            jumlah_arsip, biaya_arsip = state["arsip"].total()
+            return _ringkas_aggregates(
+                agg["kondisi"], agg["total_servis"] + jumlah_arsip, agg["total_biaya"] + biaya_arsip
+            )
+
+    def alat_aggregate(self, alat_id):
+        """Agregat servis satu alat: jumlah, total biaya, tanggal servis terakhir"""
+        with _journal_lock:
+            state = self._current_state()
+            if state["agg"] is None:
+                state["agg"] = _compute_aggregates(state["alat"], state["servis"])
+            panas = state["agg"]["per_alat"].get(alat_id, {"jumlah": 0, "biaya": 0, "terakhir": None})
+            return _gabung_ringkasan_alat(state["arsip"].per_alat(alat_id), panas)
+
+    def cost_rollup(self):
+        """Rollup biaya bulan x Jenis_Servis x ID_Alat (dibangun sekali, lalu delta dari jurnal)"""
+        with _journal_lock:
+            state = self._current_state()
+            if state["biaya"] is None:
+                state["biaya"] = _RollupBiaya.from_frame(state["servis"])
+            return _read_only_view(_gabung_rollup(state["arsip"].rollup(), state["biaya"].frame()))
+
+    def search_alat(self, keyword, kondisi="Semua"):
+        """ID alat yang cocok dengan keyword, urut relevansi"""
+        with _journal_lock:
+            return self._search_index().search(keyword, kondisi)
+
+    def complete_id(self, prefix, limit=10):
+        with _journal_lock:
+            return self._search_index().complete_id(prefix, limit)
+
+    def _search_index(self):
+        state = self._current_state()
+        if state["search"] is None:
+            state["search"] = _SearchIndex.from_frame(state["alat"])
+        return state["search"]
+
+    def get_alat_many(self, alat_ids):
+        """Baris alat untuk daftar ID, mengikuti urutan daftar"""
+        with _journal_lock:
+            state = self._current_state()
+            idx_alat = _ensure_indexes(state)[0]
+            posisi = [idx_alat[i] for i in alat_ids if i in idx_alat]
+            return _read_only_view(state["alat"].iloc[posisi])
+
+    def page(self, tabel, sort_by, descending=False, limit=PAGE_SIZE, offset=0, after=None, alat_id=None,
+             kondisi=None):
+        """Satu halaman baris terurut (offset atau cursor keyset `after`), opsional hanya alat
+        dengan `kondisi` tertentu"""
+        _validate_sort(tabel, sort_by)
+        with _journal_lock:
+            state = self._current_state()
+            kunci = (tabel, sort_by, alat_id, kondisi)
+            if kunci not in state["sorted"]:
+                # Urutan disimpan sampai ada perubahan data berikutnya; riwayat servis per alat
+                # hanya membuka partisi arsip yang berisi alat itu
+                df = self._riwayat(state, alat_id) if tabel == "servis" else state[tabel]
+                if kondisi is not None:
+                    df = df[df['Kondisi'] == kondisi]
+                posisi = list(range(len(df)))
+                pasangan = sorted(zip(_sort_keys(df, tabel, sort_by, posisi), posisi))
+                state["sorted"][kunci] = ([k for k, _ in pasangan], [p for _, p in pasangan], df)
+            keys, urutan, df = state["sorted"][kunci]
+            n = len(keys)
+            if descending:
+                akhir = bisect.bisect_left(keys, tuple(after)) if after is not None else n - offset
+                pilih = list(range(akhir - 1, max(akhir - limit, 0) - 1, -1))
+                ada_lagi = bool(pilih) and pilih[-1] > 0
+            else:
+                awal = bisect.bisect_right(keys, tuple(after)) if after is not None else offset
+                pilih = list(range(max(awal, 0), min(awal + limit, n)))
+                ada_lagi = bool(pilih) and pilih[-1] < n - 1
+            return {
+                "rows": _read_only_view(df.iloc[[urutan[i] for i in pilih]]),
+                "total": n,
+                "next_cursor": _cursor(keys[pilih[-1]]) if ada_lagi else None,
+            }
+
+    def iter_servis(self, alat_id=None, mulai=None, sampai=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Baris servis per chunk (urutan penyimpanan), difilter alat dan rentang tanggal YYYY-MM-DD"""
+        with _journal_lock:
+            state = self._current_state()
+            arsip = state["arsip"]
+            # Partisi arsip di luar rentang tahun atau tanpa servis alat ini tidak dibuka
+            tahun = arsip.tahun_alat(alat_id) if alat_id is not None else arsip.tahun()
+            tahun = [t for t in tahun if (mulai is None or t >= int(mulai[:4]))
+                     and (sampai is None or t <= int(sampai[:4]))]
+            bagian = []
+            for t in tahun:
+                df = arsip.frame(t)
+                posisi = arsip.posisi_alat(t, alat_id) if alat_id is not None else np.arange(len(df))
+                bagian.append((df, posisi))
+            df = state["servis"]
+            if alat_id is not None:
+                bagian.append((df, np.asarray(_ensure_indexes(state)[1].get(alat_id, []), dtype=np.intp)))
+            else:
+                bagian.append((df, np.arange(len(df))))
+        # Frame servis tidak pernah diubah di tempat (jurnal selalu membuat frame baru),
+        # jadi aman dibaca per chunk di luar lock; yang disimpan hanya array posisi
+        for df, posisi in bagian:
+            if mulai is not None or sampai is not None:
+                tanggal = df['Tanggal'].to_numpy(dtype=DTYPE_TANGGAL)[posisi]
+                cocok = np.ones(len(posisi), dtype=bool)
+                if mulai is not None:
+                    cocok &= tanggal >= np.datetime64(mulai)
+                if sampai is not None:
+                    cocok &= tanggal <= np.datetime64(sampai)
+                posisi = posisi[cocok]
+            for awal in range(0, len(posisi), chunk_size):
+                yield _read_only_view(df.iloc[posisi[awal:awal + chunk_size]])
+
+    def _riwayat(self, state, alat_id=None):
+        """Riwayat servis: partisi arsip (urut tahun) lalu partisi panas; panggil sambil memegang _journal_lock
+
+        Hasilnya disimpan di state["riwayat"] sampai ada perubahan berikutnya, karena rerun
+        Streamlit membaca riwayat alat yang sama berulang kali.
+        """
+        riwayat = state["riwayat"]
+        if alat_id not in riwayat:
+            arsip = state["arsip"]
+            if alat_id is None:
+                bagian = [arsip.frame(tahun) for tahun in arsip.tahun()] + [state["servis"]]
+            else:
+                bagian = [arsip.frame(tahun).iloc[arsip.posisi_alat(tahun, alat_id)]
+                          for tahun in arsip.tahun_alat(alat_id)]
+                bagian.append(state["servis"].iloc[_ensure_indexes(state)[1].get(alat_id, [])])
+            if len(riwayat) >= 256:
+                # Batasi memori jika banyak alat berbeda dibuka dalam satu proses
+                riwayat.clear()
+            riwayat[alat_id] = _gabung_servis(bagian)
+        return riwayat[alat_id]
+
+    def servis_terbaru(self, limit):
+        """limit baris servis terakhir (urutan penyimpanan); partisi arsip dibuka dari tahun
+        terbaru hanya jika partisi panas berisi kurang dari limit baris"""
+        with _journal_lock:
+            state = self._current_state()
+            bagian = [state["servis"].iloc[max(len(state["servis"]) - limit, 0):]]
+            sisa = limit - len(bagian[0])
+            for tahun in reversed(state["arsip"].tahun()):
+                if sisa <= 0:
+                    break
+                df = state["arsip"].frame(tahun)
+                bagian.insert(0, df.iloc[max(len(df) - sisa, 0):])
+                sisa -= len(bagian[0])
+            return _read_only_view(_gabung_servis(bagian))
+
+    def _append_journal(self, *ops):
+        """Tambahkan entri ke jurnal dalam satu kali tulis lalu picu compaction jika perlu"""
+        lines = "".join(json.dumps(op, default=_json_default) + "\n" for op in ops)
+        with self.write_lock():
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                record_io(bytes_written=len(lines.encode('utf-8')))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+        if size >= JOURNAL_COMPACT_BYTES:
+            self.compact_in_background()
+
+    def _write(self, df_alat, df_servis):
+        df_alat, df_servis = _terapkan_skema(df_alat, "alat"), _terapkan_skema(df_servis, "servis")
+        try:
+            with self.write_lock():
+                _atomic_write_excel(self.excel_file, {"Alat": df_alat, "Servis": df_servis})
+                # Snapshot langsung dari frame yang baru ditulis, tanpa parse ulang xlsx
+                try:
+                    _write_snapshot(self.excel_file, {"Alat": df_alat, "Servis": df_servis})
+                except OSError as e:
+                    logger.warning("Gagal menulis snapshot %s: %s", self.excel_file, e)
+        finally:
+            invalidate_cache(self.excel_file)
+
+    def compact(self):
+        """Lipat jurnal ke workbook, segel servis tahun lalu ke partisi arsip, lalu buang entri
+        jurnal yang sudah terlipat
+
+        Kunci hanya dipegang saat mengambil state dan saat memasang workbook baru. Selama
+        workbook ditulis, pembaca tetap memakai workbook lama + jurnal dan penulis tetap
+        menambah ke jurnal; entri susulan itu disisakan di jurnal saat pemasangan.
+        """
+        with self.write_lock(), _journal_lock:
+            state = self._current_state()
+            if ARSIP_ENABLED and _baris_tahun_lama(state["servis"]).any():
+                # Segel (biasanya sekali setahun) memindahkan baris ke partisi arsip yang dibaca
+                # bersama partisi panas, jadi dikerjakan seluruhnya di bawah kunci
+                servis = state["arsip"].segel(state["servis"], state["signature"])
+                self._write(state["alat"], servis)
+                if os.path.exists(self.journal_file):
+                    os.remove(self.journal_file)
+                self._pasang_state(state, disegel=True)
+                return
+            if state["arsip"].berubah:
+                state["arsip"].simpan()      # tombstone alat yang dihapus
+            signature, journal_id, offset = state["signature"], state["journal_id"], state["offset"]
+            df_alat, df_servis = _read_only_view(state["alat"]), _read_only_view(state["servis"])
+        df_alat, df_servis = _terapkan_skema(df_alat, "alat"), _terapkan_skema(df_servis, "servis")
+        tmp_path = _tulis_excel_sementara(self.excel_file, {"Alat": df_alat, "Servis": df_servis})
+        try:
+            with self.write_lock(), _journal_lock:
+                if _file_signature(self.excel_file) != signature or (
+                        offset and self._journal_stat()[0] != journal_id):
+                    # Workbook atau jurnal sudah diganti selama penulisan (replace_all, atau
+                    # compaction proses lain): hasil compaction ini sudah basi
+                    return
+                # Susul state lama sampai akhir jurnal sebelum workbook diganti
+                state = self._current_state()
+                os.replace(tmp_path, self.excel_file)
+                try:
+                    _write_snapshot(self.excel_file, {"Alat": df_alat, "Servis": df_servis})
+                except OSError as e:
+                    logger.warning("Gagal menulis snapshot %s: %s", self.excel_file, e)
+                invalidate_cache(self.excel_file)
+                self._potong_jurnal(offset)
+                self._pasang_state(state)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _potong_jurnal(self, offset):
+        """Buang `offset` byte awal jurnal (sudah terlipat ke workbook); sisanya ditulis ke file
+        jurnal baru. Workbook harus sudah diganti lebih dulu: crash di antaranya hanya
+        menyisakan entri yang dilewati dedupe saat replay."""
+        try:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(offset)
+                sisa = f.read()
+        except FileNotFoundError:
+            return
+        if not sisa:
+            os.remove(self.journal_file)
+            return
+        folder = os.path.dirname(os.path.abspath(self.journal_file))
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".jsonl", dir=folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(sisa)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        record_io(bytes_written=len(sisa))
+
+    def _pasang_state(self, state, disegel=False):
+        """Ganti state lama dengan state dari workbook yang baru dipasang (+ sisa jurnal)"""
+        _journal_state.pop(self.excel_file, None)
+        # Isinya sama dengan state lama, jadi index pencarian tetap berlaku; agregat dan rollup
+        # partisi panas hanya jika tidak ada baris yang pindah ke arsip
+        baru = self._current_state()
+        baru["arsip"], baru["search"] = state["arsip"], state["search"]
+        if not disegel:
+            baru["agg"], baru["biaya"] = state["agg"], state["biaya"]
+
+    def compact_in_background(self):
+        """Jalankan compaction di thread background (maksimal satu per file)"""
+        with _journal_lock:
+            thread = _compaction_threads.get(self.excel_file)
+            if thread is not None and thread.is_alive():
+                return thread
+            thread = threading.Thread(target=self.compact, name="journal-compaction", daemon=True)
+            _compaction_threads[self.excel_file] = thread
+            thread.start()
+            return thread
+
+    def read_alat(self):
+        with _journal_lock:
+            return _read_only_view(self._current_state()["alat"])
+
+    def read_tanpa_skema(self):
+        """(alat, servis) langsung dari read_excel workbook tanpa skema dtype (untuk memory_report)"""
+        sheets = pd.read_excel(self.excel_file, sheet_name=['Alat', 'Servis'])
+        record_io(bytes_read=os.path.getsize(self.excel_file))
+        return sheets['Alat'], sheets['Servis']
+
+    def read_servis(self):
+        """Seluruh riwayat servis: partisi arsip lalu partisi panas (gabungan workbook + jurnal)"""
+        with _journal_lock:
+            return _read_only_view(self._riwayat(self._current_state()))
+
+    def get_alat(self, alat_id):
+        with _journal_lock:
+            state = self._current_state()
+            pos = _ensure_indexes(state)[0].get(alat_id)
+            if pos is None:
+                return None
+            return state["alat"].iloc[pos].to_dict()
+
+    def get_servis_by_alat(self, alat_id):
+        with _journal_lock:
+            return _read_only_view(self._riwayat(self._current_state(), alat_id))
+
+    def scan_card(self, alat_id):
+        """Baris alat dan riwayat servisnya dari state yang sama; (None, None) jika tidak ada"""
+        with _journal_lock:
+            state = self._current_state()
+            pos = _ensure_indexes(state)[0].get(alat_id)
+            if pos is None:
+                return None, None
+            return state["alat"].iloc[pos].to_dict(), _read_only_view(self._riwayat(state, alat_id))
+
+    def next_sequence(self, nama, n, seed):
+        """Majukan counter `nama` sebanyak n secara atomik, kembalikan nomor pertama"""
+        with self.write_lock():
+            try:
+                with open(self.sequence_file, 'r', encoding='utf-8') as f:
+                    counters = json.load(f)
+            except (FileNotFoundError, ValueError):
+                counters = {}
+            if nama not in counters:
+                counters[nama] = seed()
+            start = counters[nama] + 1
+            counters[nama] += n
+            _atomic_write_json(self.sequence_file, counters)
+        return start
+
+    def insert_alat(self, row):
+        self.insert_alat_many([row])
+
+    def insert_alat_many(self, rows):
+        self._append_journal(*[
+            {"op": "insert_alat", "row": _baris_simpan(row)}
+            for row in rows
+        ])
+
+    def update_alat(self, alat_id, values):
+        with self.write_lock():
+            if self.get_alat(alat_id) is None:
+                return False
+            self.update_alat_many([(alat_id, values)])
+        return True
+
+    def update_alat_many(self, updates):
+        """Update banyak alat sekaligus; updates berisi (alat_id, values) yang sudah divalidasi"""
+        self._append_journal(*[
+            {"op": "update_alat", "id": alat_id, "values": _baris_simpan(values)}
+            for alat_id, values in updates
+        ])
+        return len(updates)
+
+    def delete_alat(self, alat_id):
+        self._append_journal({"op": "delete_alat", "id": alat_id})
+
+    def insert_servis(self, row):
+        self.insert_servis_many([row])
+
+    def insert_servis_many(self, rows):
+        self._append_journal(*[
+            {"op": "insert_servis", "row": _baris_simpan(row)}
+            for row in rows
+        ])
+
+    def replace_all(self, df_alat, df_servis):
+        """Timpa seluruh isi penyimpanan (dipakai migrasi)"""
+        with self.write_lock(), _journal_lock:
+            arsip = _ArsipServis(self.arsip_folder)
+            arsip.hapus_semua()
+            df_servis = _terapkan_skema(df_servis[KOLOM_SERVIS], "servis")
+            if ARSIP_ENABLED:
+                df_servis = arsip.segel(df_servis)
+            self._write(df_alat[KOLOM_ALAT], df_servis)
+            for path in (self.journal_file, self.sequence_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            _journal_state.pop(self.excel_file, None)
+
+
+class SQLiteBackend:
+    """Backend penyimpanan SQLite dengan index pada ID, ID_Alat, dan Tanggal"""
+
+    name = "sqlite"
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS alat (
+            ID TEXT PRIMARY KEY,
+            Nama TEXT,
+            Kondisi TEXT,
+            Tanggal_Beli TEXT,
+            Keterangan TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS servis (
+            ID_Servis TEXT PRIMARY KEY,
+            ID_Alat TEXT,
+            Tanggal TEXT,
+            Jenis_Servis TEXT,
+            Biaya INTEGER,
+            Keterangan TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_servis_id_alat ON servis (ID_Alat)",
+        "CREATE INDEX IF NOT EXISTS idx_servis_tanggal ON servis (Tanggal)",
+        """CREATE TABLE IF NOT EXISTS sequence (
+            nama TEXT PRIMARY KEY,
+            nilai INTEGER NOT NULL
+        )""",
+        # Agregat dashboard, dijaga trigger agar setiap tulis hanya memberi delta O(1)
+        """CREATE TABLE IF NOT EXISTS agg_kondisi (
+            Kondisi TEXT PRIMARY KEY,
+            jumlah INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS agg_alat (
+            ID_Alat TEXT PRIMARY KEY,
+            jumlah INTEGER NOT NULL,
+            biaya INTEGER NOT NULL,
+            terakhir TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS agg_total (
+            nama TEXT PRIMARY KEY,
+            nilai INTEGER NOT NULL
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS trg_alat_insert AFTER INSERT ON alat BEGIN
+            INSERT INTO agg_kondisi (Kondisi, jumlah) VALUES (COALESCE(NEW.Kondisi, ''), 1)
+                ON CONFLICT (Kondisi) DO UPDATE SET jumlah = jumlah + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_alat_delete AFTER DELETE ON alat BEGIN
+            UPDATE agg_kondisi SET jumlah = jumlah - 1 WHERE Kondisi = COALESCE(OLD.Kondisi, '');
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_alat_kondisi AFTER UPDATE OF Kondisi ON alat BEGIN
+            UPDATE agg_kondisi SET jumlah = jumlah - 1 WHERE Kondisi = COALESCE(OLD.Kondisi, '');
+            INSERT INTO agg_kondisi (Kondisi, jumlah) VALUES (COALESCE(NEW.Kondisi, ''), 1)
+                ON CONFLICT (Kondisi) DO UPDATE SET jumlah = jumlah + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_servis_insert AFTER INSERT ON servis BEGIN
+            INSERT INTO agg_alat (ID_Alat, jumlah, biaya, terakhir)
+                VALUES (NEW.ID_Alat, 1, COALESCE(NEW.Biaya, 0), substr(NEW.Tanggal, 1, 10))
+                ON CONFLICT (ID_Alat) DO UPDATE SET
+                    jumlah = jumlah + 1,
+                    biaya = biaya + excluded.biaya,
+                    terakhir = CASE WHEN terakhir IS NULL OR excluded.terakhir > terakhir
+                                    THEN excluded.terakhir ELSE terakhir END;
+            UPDATE agg_total SET nilai = nilai + 1 WHERE nama = 'servis';
+            UPDATE agg_total SET nilai = nilai + COALESCE(NEW.Biaya, 0) WHERE nama = 'biaya';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_servis_delete AFTER DELETE ON servis BEGIN
+            UPDATE agg_alat SET
+                jumlah = jumlah - 1,
+                biaya = biaya - COALESCE(OLD.Biaya, 0),
+                terakhir = (SELECT MAX(substr(Tanggal, 1, 10)) FROM servis WHERE ID_Alat = OLD.ID_Alat)
+                WHERE ID_Alat = OLD.ID_Alat;
+            DELETE FROM agg_alat WHERE ID_Alat = OLD.ID_Alat AND jumlah <= 0;
+            UPDATE agg_total SET nilai = nilai - 1 WHERE nama = 'servis';
+            UPDATE agg_total SET nilai = nilai - COALESCE(OLD.Biaya, 0) WHERE nama = 'biaya';
+        END""",
+        # Rollup biaya bulan x jenis servis x alat untuk halaman analitik
+        """CREATE TABLE IF NOT EXISTS agg_biaya (
+            Bulan TEXT NOT NULL,
+            Jenis_Servis TEXT NOT NULL,
+            ID_Alat TEXT NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            biaya INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Bulan, Jenis_Servis, ID_Alat)
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS trg_biaya_insert AFTER INSERT ON servis BEGIN
+            INSERT INTO agg_biaya (Bulan, Jenis_Servis, ID_Alat, jumlah, biaya)
+                VALUES (COALESCE(substr(NEW.Tanggal, 1, 7), ''), COALESCE(NULLIF(NEW.Jenis_Servis, ''), '-'),
+                        COALESCE(NEW.ID_Alat, ''), 1, COALESCE(NEW.Biaya, 0))
+                ON CONFLICT (Bulan, Jenis_Servis, ID_Alat) DO UPDATE SET
+                    jumlah = jumlah + 1,
+                    biaya = biaya + excluded.biaya;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_biaya_delete AFTER DELETE ON servis BEGIN
+            UPDATE agg_biaya SET jumlah = jumlah - 1, biaya = biaya - COALESCE(OLD.Biaya, 0)
+                WHERE Bulan = COALESCE(substr(OLD.Tanggal, 1, 7), '')
+                  AND Jenis_Servis = COALESCE(NULLIF(OLD.Jenis_Servis, ''), '-')
+                  AND ID_Alat = COALESCE(OLD.ID_Alat, '');
+            DELETE FROM agg_biaya WHERE jumlah <= 0
+                AND Bulan = COALESCE(substr(OLD.Tanggal, 1, 7), '') AND ID_Alat = COALESCE(OLD.ID_Alat, '');
+        END""",
+        # Log ID alat yang berubah, dipakai index pencarian di setiap proses untuk
+        # memperbarui diri secara incremental
+        """CREATE TABLE IF NOT EXISTS alat_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            ID TEXT
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS trg_alat_log_insert AFTER INSERT ON alat BEGIN
+            INSERT INTO alat_log (ID) VALUES (NEW.ID);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_alat_log_update AFTER UPDATE ON alat BEGIN
+            INSERT INTO alat_log (ID) VALUES (NEW.ID);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_alat_log_delete AFTER DELETE ON alat BEGIN
+            INSERT INTO alat_log (ID) VALUES (OLD.ID);
+        END""",
+    ]
+
+    # Jumlah entri alat_log yang disimpan; index yang tertinggal lebih jauh dibangun ulang
+    LOG_KEEP = 10000
+
+    def __init__(self, sqlite_file, excel_file=None):
+        self.sqlite_file = sqlite_file
+        # Workbook sumber migrasi saat database baru dibuat (None = mulai dari database kosong)
+        self.excel_file = excel_file
+        self._siap = False
+        self._search = None
+        self._search_seq = 0
+        self._search_lock = threading.Lock()
+
+    def write_lock(self):
+        """Kunci tulis lintas proses (alokasi ID + insert harus satu langkah). Semua tulis
+        memegangnya, seperti jurnal Excel, sehingga perubahan versi() selama kunci dipegang
+        pasti berasal dari pemegang kunci"""
+        return get_write_lock(self.sqlite_file)
+
+    def versi(self):
+        """Token yang berubah setiap ada transaksi tulis: file change counter di header database
+        (offset 24), tanpa membuka koneksi"""
+        try:
+            with open(self.sqlite_file, 'rb') as f:
+                header = f.read(28)
+        except OSError:
+            return None
+        return header[24:28]
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.sqlite_file, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def init(self):
+        """Buat tabel dan index; migrasi otomatis dari Excel jika database belum ada"""
+        # Cukup sekali per proses; dicek ulang hanya jika file database hilang
+        if self._siap and os.path.exists(self.sqlite_file):
+            return
+        baru = not os.path.exists(self.sqlite_file)
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            belum_terisi = conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM agg_total WHERE nama = 'servis') "
+                "OR (EXISTS (SELECT 1 FROM servis) AND NOT EXISTS (SELECT 1 FROM agg_biaya))"
+            ).fetchone()[0]
+            if belum_terisi:
+                # Database lama sebelum ada tabel agregat: isi sekali dari data yang ada
+                self._rebuild_aggregates(conn)
+            conn.execute(
+                "DELETE FROM alat_log WHERE seq <= (SELECT MAX(seq) FROM alat_log) - ?", (self.LOG_KEEP,)
+            )
+        if baru and self.excel_file and os.path.exists(self.excel_file):
+            migrate_excel_to_sqlite(self.excel_file, self.sqlite_file)
+        self._siap = True
+
+    def _rebuild_aggregates(self, conn):
+        conn.execute("DELETE FROM agg_kondisi")
+        conn.execute("DELETE FROM agg_alat")
+        conn.execute("DELETE FROM agg_total")
+        conn.execute("DELETE FROM agg_biaya")
+        conn.execute(
+            "INSERT INTO agg_kondisi (Kondisi, jumlah) "
+            "SELECT COALESCE(Kondisi, ''), COUNT(*) FROM alat GROUP BY COALESCE(Kondisi, '')"
+        )
+        conn.execute(
+            "INSERT INTO agg_alat (ID_Alat, jumlah, biaya, terakhir) "
+            "SELECT ID_Alat, COUNT(*), COALESCE(SUM(Biaya), 0), MAX(substr(Tanggal, 1, 10)) "
+            "FROM servis GROUP BY ID_Alat"
+        )
+        conn.execute("INSERT INTO agg_total (nama, nilai) SELECT 'servis', COUNT(*) FROM servis")
+        conn.execute("INSERT INTO agg_total (nama, nilai) SELECT 'biaya', COALESCE(SUM(Biaya), 0) FROM servis")
+        conn.execute(
+            "INSERT INTO agg_biaya (Bulan, Jenis_Servis, ID_Alat, jumlah, biaya) "
+            "SELECT COALESCE(substr(Tanggal, 1, 7), ''), COALESCE(NULLIF(Jenis_Servis, ''), '-'), "
+            "COALESCE(ID_Alat, ''), COUNT(*), COALESCE(SUM(Biaya), 0) FROM servis GROUP BY 1, 2, 3"
+        )
+
+    def aggregates(self):
+        """Ringkasan agregat dashboard tanpa menyentuh baris mentah"""
+        with self._connect() as conn:
+            kondisi = {
+                (k if k != '' else None): n
+                for k, n in conn.execute("SELECT Kondisi, jumlah FROM agg_kondisi").fetchall()
+            }
+            totals = dict(conn.execute("SELECT nama, nilai FROM agg_total").fetchall())
+        return _ringkas_aggregates(kondisi, int(totals.get("servis", 0)), totals.get("biaya", 0))
+
+    def alat_aggregate(self, alat_id):
+        """Agregat servis satu alat: jumlah, total biaya, tanggal servis terakhir"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT jumlah, biaya, terakhir FROM agg_alat WHERE ID_Alat = ?", (alat_id,)
+            ).fetchone()
+        if row is None:
+            return {"jumlah": 0, "biaya": 0, "terakhir": None}
+        return {"jumlah": row[0], "biaya": row[1], "terakhir": row[2]}
+
+    def cost_rollup(self):
+        """Rollup biaya bulan x Jenis_Servis x ID_Alat dari tabel agg_biaya (dijaga trigger)"""
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                "SELECT Bulan, Jenis_Servis, ID_Alat, jumlah AS Jumlah, biaya AS Biaya FROM agg_biaya", conn
+            )
+        df['Bulan'] = pd.to_datetime(df['Bulan'], format="%Y-%m", errors="coerce")
+        df['Jenis_Servis'] = df['Jenis_Servis'].astype("string")
+        df['ID_Alat'] = df['ID_Alat'].astype("string")
+        df['Biaya'] = df['Biaya'].astype("float64")
+        return df
+
+    def _search_index(self):
+        """Index pencarian proses ini, disusulkan dengan perubahan di alat_log"""
+        with self._connect() as conn:
+            if self._search is not None:
+                seq_awal = conn.execute("SELECT MIN(seq) FROM alat_log").fetchone()[0]
+                if seq_awal is not None and seq_awal > self._search_seq + 1:
+                    self._search = None     # log sudah dipangkas melewati posisi index
+            if self._search is None:
+                self._search_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM alat_log").fetchone()[0]
+                df = pd.read_sql_query("SELECT ID, Nama, Kondisi, Keterangan FROM alat ORDER BY rowid", conn)
+                self._search = _SearchIndex.from_frame(df)
+                return self._search
+            log = conn.execute(
+                "SELECT seq, ID FROM alat_log WHERE seq > ? ORDER BY seq", (self._search_seq,)
+            ).fetchall()
+            if not log:
+                return self._search
+            ids = list(dict.fromkeys(alat_id for _, alat_id in log))
+            rows = {}
+            for i in range(0, len(ids), 500):
+                bagian = ids[i:i + 500]
+                cursor = conn.execute(
+                    f"SELECT ID, Nama, Kondisi, Keterangan FROM alat WHERE ID IN ({','.join('?' * len(bagian))})",
+                    bagian,
+                )
+                kolom = [c[0] for c in cursor.description]
+                rows.update((row[0], dict(zip(kolom, row))) for row in cursor.fetchall())
+        for alat_id in ids:
+            if alat_id in rows:
+                self._search.upsert(rows[alat_id])
+            else:
+                self._search.remove(alat_id)
+        self._search_seq = log[-1][0]
+        return self._search
+
+    def search_alat(self, keyword, kondisi="Semua"):
+        """ID alat yang cocok dengan keyword, urut relevansi"""
+        with self._search_lock:
+            return self._search_index().search(keyword, kondisi)
+
+    def complete_id(self, prefix, limit=10):
+        with self._search_lock:
+            return self._search_index().complete_id(prefix, limit)
+
+    def page(self, tabel, sort_by, descending=False, limit=PAGE_SIZE, offset=0, after=None, alat_id=None,
+             kondisi=None):
+        """Satu halaman baris terurut (offset atau cursor keyset `after`), opsional hanya alat
+        dengan `kondisi` tertentu"""
+        _validate_sort(tabel, sort_by)
+        exprs = _sql_sort_exprs(tabel, sort_by)
+        where, params = [], []
+        if alat_id is not None:
+            where.append("ID_Alat = ?")
+            params.append(alat_id)
+        if kondisi is not None:
+            where.append("Kondisi = ?")
+            params.append(kondisi)
+        with self._connect() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM {tabel}" + (" WHERE " + " AND ".join(where) if where else ""), params
+            ).fetchone()[0]
+            if after is not None:
+                where.append(f"({', '.join(exprs)}) {'<' if descending else '>'} ({', '.join('?' * len(exprs))})")
+                params.extend(after)
+                offset = 0
+            arah = "DESC" if descending else "ASC"
+            kolom_kunci = [f"{e} AS _k{i}" for i, e in enumerate(exprs)]
+            sql = (
+                f"SELECT *, {', '.join(kolom_kunci)} FROM {tabel}"
+                + (" WHERE " + " AND ".join(where) if where else "")
+                + f" ORDER BY {', '.join(f'{e} {arah}' for e in exprs)} LIMIT ? OFFSET ?"
+            )
+            # Ambil satu baris lebih untuk tahu apakah masih ada halaman berikutnya
+            df = pd.read_sql_query(sql, conn, params=params + [limit + 1, offset])
+        ada_lagi = len(df) > limit
+        df = df.iloc[:limit]
+        kolom_k = [f"_k{i}" for i in range(len(exprs))]
+        next_cursor = _cursor(df[kolom_k].iloc[-1].tolist()) if ada_lagi else None
+        rows = df.drop(columns=kolom_k)
+        if len(rows.columns) == 0:
+            rows = pd.DataFrame(columns=KOLOM_ALAT if tabel == "alat" else KOLOM_SERVIS)
+        rows = _terapkan_skema(rows, tabel)
+        return {"rows": rows, "total": total, "next_cursor": next_cursor}
+
+    def iter_servis(self, alat_id=None, mulai=None, sampai=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Baris servis per chunk (urutan rowid), difilter alat dan rentang tanggal YYYY-MM-DD"""
+        where, params = [], []
+        if alat_id is not None:
+            where.append("ID_Alat = ?")
+            params.append(alat_id)
+        if mulai is not None:
+            where.append("substr(Tanggal, 1, 10) >= ?")
+            params.append(mulai)
+        if sampai is not None:
+            where.append("substr(Tanggal, 1, 10) <= ?")
+            params.append(sampai)
+        sql = (
+            f"SELECT {', '.join(KOLOM_SERVIS)} FROM servis"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY rowid"
+        )
+        with self._connect() as conn:
+            # Satu cursor untuk seluruh export (snapshot baca yang konsisten); yang ada di
+            # memori hanya satu chunk
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield _terapkan_skema(pd.DataFrame(rows, columns=KOLOM_SERVIS), "servis")
+
+    def get_alat_many(self, alat_ids):
+        """Baris alat untuk daftar ID, mengikuti urutan daftar"""
+        alat_ids = list(alat_ids)
+        bagian = [
+            self._query(
+                f"SELECT * FROM alat WHERE ID IN ({','.join('?' * len(alat_ids[i:i + 500]))})",
+                alat_ids[i:i + 500],
+            )
+            for i in range(0, len(alat_ids), 500)
+        ]
+        if not bagian:
+            return _terapkan_skema(pd.DataFrame(columns=KOLOM_ALAT), "alat")
+        df = pd.concat(bagian, ignore_index=True)
+        df = df.set_index('ID', drop=False).reindex(alat_ids).dropna(subset=['ID']).reset_index(drop=True)
+        return _terapkan_skema(df, "alat")
+
+    def _query(self, sql, params=(), columns=None, tabel=None, conn=None):
+        if conn is not None:
+            df = pd.read_sql_query(sql, conn, params=params)
+        else:
+            with self._connect() as conn:
+                df = pd.read_sql_query(sql, conn, params=params)
+        if columns is not None and len(df.columns) == 0:
+            df = pd.DataFrame(columns=columns)
+        return df if tabel is None else _terapkan_skema(df, tabel)
+
+    def read_alat(self):
+        return self._query("SELECT * FROM alat ORDER BY rowid", columns=KOLOM_ALAT, tabel="alat")
+
+    def read_servis(self):
+        return self._query("SELECT * FROM servis ORDER BY rowid", columns=KOLOM_SERVIS, tabel="servis")
+
+    def read_tanpa_skema(self):
+        """(alat, servis) langsung dari read_sql tanpa skema dtype (untuk memory_report)"""
+        with self._connect() as conn:
+            return (self._query("SELECT * FROM alat ORDER BY rowid", columns=KOLOM_ALAT, conn=conn),
+                    self._query("SELECT * FROM servis ORDER BY rowid", columns=KOLOM_SERVIS, conn=conn))
+
+    def get_alat(self, alat_id):
+        df = self._query("SELECT * FROM alat WHERE ID = ?", (alat_id,), tabel="alat")
+        if len(df) > 0:
+            return df.iloc[0].to_dict()
+        return None
+
+    def get_servis_by_alat(self, alat_id, conn=None):
+        return self._query(
+            "SELECT * FROM servis WHERE ID_Alat = ? ORDER BY rowid", (alat_id,), columns=KOLOM_SERVIS,
+            tabel="servis", conn=conn,
+        )
+
+    def scan_card(self, alat_id):
+        """Baris alat dan riwayat servisnya dalam satu transaksi baca; (None, None) jika tidak ada"""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            df = self._query("SELECT * FROM alat WHERE ID = ?", (alat_id,), tabel="alat", conn=conn)
+            if len(df) == 0:
+                return None, None
+            return df.iloc[0].to_dict(), self.get_servis_by_alat(alat_id, conn=conn)
+
+    def servis_terbaru(self, limit):
+        return self._query(
+            "SELECT * FROM servis WHERE rowid IN (SELECT rowid FROM servis ORDER BY rowid DESC LIMIT ?) "
+            "ORDER BY rowid", (max(limit, 0),), columns=KOLOM_SERVIS, tabel="servis",
+        )
+
+    def next_sequence(self, nama, n, seed):
+        """Majukan counter `nama` sebanyak n secara atomik, kembalikan nomor pertama"""
+        with self.write_lock():
+            with self._connect() as conn:
+                row = conn.execute("SELECT nilai FROM sequence WHERE nama = ?", (nama,)).fetchone()
+            current = row[0] if row else seed()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sequence (nama, nilai) VALUES (?, ?)", (nama, current + n)
+                )
+        return current + 1
+
+    def insert_alat(self, row):
+        self.insert_alat_many([row])
+
+    def insert_alat_many(self, rows):
+        with self.write_lock(), self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO alat (ID, Nama, Kondisi, Tanggal_Beli, Keterangan) VALUES (?, ?, ?, ?, ?)",
+                [[_nilai_simpan(k, row[k]) for k in KOLOM_ALAT] for row in rows],
+            )
+
+    def update_alat(self, alat_id, values):
+        kolom = [k for k in values if k in KOLOM_ALAT and k != "ID"]
+        if not kolom:
+            return self.get_alat(alat_id) is not None
+        return self.update_alat_many([(alat_id, values)]) > 0
+
+    def update_alat_many(self, updates):
+        """Update banyak alat dalam satu transaksi; kembalikan jumlah baris yang berubah"""
+        jumlah = 0
+        with self.write_lock(), self._connect() as conn:
+            for alat_id, values in updates:
+                kolom = [k for k in values if k in KOLOM_ALAT and k != "ID"]
+                if not kolom:
+                    continue
+                set_clause = ", ".join(f"{k} = ?" for k in kolom)
+                params = [_nilai_simpan(k, values[k]) for k in kolom] + [alat_id]
+                jumlah += conn.execute(f"UPDATE alat SET {set_clause} WHERE ID = ?", params).rowcount
+        return jumlah
+
+    def delete_alat(self, alat_id):
+        with self.write_lock(), self._connect() as conn:
+            conn.execute("DELETE FROM servis WHERE ID_Alat = ?", (alat_id,))
+            conn.execute("DELETE FROM alat WHERE ID = ?", (alat_id,))
+
+    def insert_servis(self, row):
+        self.insert_servis_many([row])
+
+    def insert_servis_many(self, rows):
+        with self.write_lock(), self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO servis (ID_Servis, ID_Alat, Tanggal, Jenis_Servis, Biaya, Keterangan) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [[_nilai_simpan(k, row[k]) for k in KOLOM_SERVIS] for row in rows],
+            )
+
+    def replace_all(self, df_alat, df_servis):
+        """Timpa seluruh isi penyimpanan (dipakai migrasi)"""
+        with self.write_lock(), self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            conn.execute("DELETE FROM servis")
+            conn.execute("DELETE FROM alat")
+            conn.execute("DELETE FROM sequence")
+            conn.executemany(
+                "INSERT INTO alat (ID, Nama, Kondisi, Tanggal_Beli, Keterangan) VALUES (?, ?, ?, ?, ?)",
+                [[_nilai_simpan(k, v) for k, v in zip(KOLOM_ALAT, row)]
+                 for row in df_alat[KOLOM_ALAT].itertuples(index=False)],
+            )
+            conn.executemany(
+                "INSERT INTO servis (ID_Servis, ID_Alat, Tanggal, Jenis_Servis, Biaya, Keterangan) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [[_nilai_simpan(k, v) for k, v in zip(KOLOM_SERVIS, row)]
+                 for row in df_servis[KOLOM_SERVIS].itertuples(index=False)],
+            )
+
+
+_backend = None
+
+def get_backend():
+    """Ambil backend penyimpanan aktif sesuai STORAGE_BACKEND"""
+    global _backend
+    if STORAGE_BACKEND == "sqlite":
+        kunci = ("sqlite", SQLITE_FILE, EXCEL_FILE)
+    else:
+        kunci = ("excel", EXCEL_FILE)
+    if _backend is None or _backend[0] != kunci:
+        if kunci[0] == "sqlite":
+            backend = SQLiteBackend(SQLITE_FILE, excel_file=EXCEL_FILE)
+        else:
+            backend = ExcelBackend(EXCEL_FILE)
+        _backend = (kunci, backend)
+    return _backend[1]
+
+def migrate_excel_to_sqlite(excel_file=None, sqlite_file=None):
+    """Migrasi satu kali isi file Excel ke database SQLite"""
+    excel_file = excel_file or EXCEL_FILE
+    sqlite_file = sqlite_file or SQLITE_FILE
+    sumber = ExcelBackend(excel_file)
+    df_alat = sumber.read_alat().reindex(columns=KOLOM_ALAT)
+    df_servis = sumber.read_servis().reindex(columns=KOLOM_SERVIS)
+    SQLiteBackend(sqlite_file).replace_all(df_alat, df_servis)
+    return {"alat": len(df_alat), "servis": len(df_servis)}
+
+def export_to_excel(file_path=None):
+    """Export data dari backend aktif ke Excel (file atau BytesIO untuk download)"""
+    init_excel()
+    backend = get_backend()
+    df_alat = backend.read_alat()
+    df_servis = backend.read_servis()
+    target = file_path if file_path else BytesIO()
+    with pd.ExcelWriter(target, engine='openpyxl', date_format="YYYY-MM-DD") as writer:
+        _tanggal_untuk_excel(df_alat).to_excel(writer, sheet_name='Alat', index=False)
+        _tanggal_untuk_excel(df_servis).to_excel(writer, sheet_name='Servis', index=False)
+    if file_path:
+        return file_path
+    target.seek(0)
+    return target
+
+# ==================== ALOKASI ID ====================
+
+# Prefix dan lebar minimum angka ID. Lebar tidak diperbesar agar ID lama (dan label QR
+# yang sudah tercetak) tetap berlaku; urutkan ID dengan id_sort_key, bukan string.
+ID_FORMAT = {
+    "alat": ("ALT", 2),
+    "servis": ("SRV", 3),
+}
+
+def id_sort_key(value):
+    """Kunci urut natural untuk ID (ALT99 sebelum ALT100)"""
+    text = str(value)
+    digits = text.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz")
+    prefix = text[:len(text) - len(digits)]
+    return (prefix, int(digits)) if digits.isdigit() else (prefix, -1)
+
+def _max_id_number(ids, prefix):
+    """Angka terbesar dari daftar ID berprefix tertentu (0 jika kosong)"""
+    if len(ids) == 0:
+        return 0
+    angka = pd.to_numeric(
+        pd.Series(ids, dtype=object).astype(str).str.extract(rf"^{prefix}(\d+)$")[0],
+        errors='coerce'
+    )
+    return int(angka.max()) if angka.notna().any() else 0
+
+def _seed_sequence(jenis):
+    """Seeding satu kali: mulai counter di atas ID terbesar yang sudah ada"""
+    backend = get_backend()
+    prefix = ID_FORMAT[jenis][0]
+    if jenis == "alat":
+        return _max_id_number(backend.read_alat()['ID'], prefix)
+    return _max_id_number(backend.read_servis()['ID_Servis'], prefix)
+
+def allocate_ids(jenis, n=1):
+    """Alokasikan n ID berurutan ('alat' / 'servis') tanpa membaca sheet
+
+    Counter disimpan di metadata backend dan hanya maju, sehingga ID yang pernah
+    dipakai tidak akan diberikan lagi walaupun barisnya sudah dihapus.
+    """
+    init_excel()
+    prefix, lebar = ID_FORMAT[jenis]
+    start = get_backend().next_sequence(jenis, n, lambda: _seed_sequence(jenis))
+    return [f"{prefix}{num:0{lebar}d}" for num in range(start, start + n)]
 
 # ==================== FUNGSI INISIALISASI ====================
 
@@ -26,258 +2541,986 @@ def init_folders():
     return True
 
 def init_excel():
-    """Inisialisasi file Excel jika belum ada"""
+    """Inisialisasi penyimpanan (file Excel / database SQLite) jika belum ada"""
     init_folders()
-    if not os.path.exists(EXCEL_FILE):
-        df_alat = pd.DataFrame(columns=[
-            "ID", "Nama", "Kondisi", "Tanggal_Beli", "Keterangan"
-        ])
-        df_servis = pd.DataFrame(columns=[
-            "ID_Servis", "ID_Alat", "Tanggal", "Jenis_Servis", "Biaya", "Keterangan"
-        ])
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            df_alat.to_excel(writer, sheet_name='Alat', index=False)
-            df_servis.to_excel(writer, sheet_name='Servis', index=False)
+    get_backend().init()
     return True
 
 # ==================== FUNGSI CRUD ALAT ====================
 
 def get_all_alat():
-    """Ambil semua data alat dari Excel"""
+    """Ambil semua data alat dari penyimpanan"""
     init_excel()
-    try:
-        df = pd.read_excel(EXCEL_FILE, sheet_name='Alat')
-        return df
-    except Exception:
-        return pd.DataFrame(columns=[
-            "ID", "Nama", "Kondisi", "Tanggal_Beli", "Keterangan"
-        ])
+    return get_backend().read_alat()
 
 def get_alat_by_id(alat_id):
     """Ambil data alat berdasarkan ID"""
-    df = get_all_alat()
-    result = df[df['ID'] == alat_id]
-    if len(result) > 0:
-        return result.iloc[0].to_dict()
-    return None
+    init_excel()
+    return get_backend().get_alat(alat_id)
 
 def generate_new_id():
-    """Generate ID baru untuk alat"""
-    df = get_all_alat()
-    if len(df) == 0:
-        return "ALT01"
-    last_id = df['ID'].iloc[-1]
-    try:
-        num = int(last_id[3:]) + 1
-        return f"ALT{num:02d}"
-    except:
-        return f"ALT{len(df)+1:02d}"
+    """Generate (alokasikan) ID baru untuk alat"""
+    return allocate_ids("alat")[0]
 
 def add_alat(nama, kondisi, tanggal_beli, keterangan):
-    """Tambah alat baru ke Excel"""
+    """Tambah alat baru"""
     init_excel()
-    df_alat = get_all_alat()
-    new_id = generate_new_id()
-    new_row = pd.DataFrame([{
-        "ID": new_id,
-        "Nama": nama,
-        "Kondisi": kondisi,
-        "Tanggal_Beli": tanggal_beli,
-        "Keterangan": keterangan
-    }])
-    df_alat = pd.concat([df_alat, new_row], ignore_index=True)
-    df_servis = pd.read_excel(EXCEL_FILE, sheet_name='Servis')
-    with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-        df_alat.to_excel(writer, sheet_name='Alat', index=False)
-        df_servis.to_excel(writer, sheet_name='Servis', index=False)
+    backend = get_backend()
+    with backend.write_lock():
+        new_id = generate_new_id()
+        backend.insert_alat({
+            "ID": new_id,
+            "Nama": nama,
+            "Kondisi": kondisi,
+            "Tanggal_Beli": tanggal_beli,
+            "Keterangan": keterangan
+        })
     return new_id
 
 def update_alat(alat_id, nama, kondisi, tanggal_beli, keterangan):
     """Update data alat berdasarkan ID"""
-    df_alat = get_all_alat()
-    df_servis = pd.read_excel(EXCEL_FILE, sheet_name='Servis')
-    mask = df_alat['ID'] == alat_id
-    if mask.any():
-        df_alat.loc[mask, 'Nama'] = nama
-        df_alat.loc[mask, 'Kondisi'] = kondisi
-        df_alat.loc[mask, 'Tanggal_Beli'] = tanggal_beli
-        df_alat.loc[mask, 'Keterangan'] = keterangan
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            df_alat.to_excel(writer, sheet_name='Alat', index=False)
-            df_servis.to_excel(writer, sheet_name='Servis', index=False)
-        return True
-    return False
+    init_excel()
+    return get_backend().update_alat(alat_id, {
+        "Nama": nama,
+        "Kondisi": kondisi,
+        "Tanggal_Beli": tanggal_beli,
+        "Keterangan": keterangan
+    })
 
 def delete_alat(alat_id):
     """Hapus alat beserta riwayat servisnya"""
-    df_alat = get_all_alat()
-    df_servis = pd.read_excel(EXCEL_FILE, sheet_name='Servis')
-    df_alat = df_alat[df_alat['ID'] != alat_id]
-    df_servis = df_servis[df_servis['ID_Alat'] != alat_id]
-    with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-        df_alat.to_excel(writer, sheet_name='Alat', index=False)
-        df_servis.to_excel(writer, sheet_name='Servis', index=False)
+    init_excel()
+    get_backend().delete_alat(alat_id)
     return True
 
 def filter_alat(keyword="", kondisi="Semua"):
-    """Filter data alat berdasarkan keyword dan kondisi"""
-    df = get_all_alat()
-    if len(df) == 0:
+    """Filter data alat berdasarkan keyword (Nama/ID/Keterangan) dan kondisi"""
+    if not str(keyword).strip():
+        df = get_all_alat()
+        if kondisi != "Semua" and len(df) > 0:
+            df = df[df['Kondisi'] == kondisi]
         return df
-    
-    # Filter by keyword (nama atau ID)
-    if keyword:
-        keyword_lower = keyword.lower()
-        mask = (df['Nama'].str.lower().str.contains(keyword_lower, na=False) | 
-                df['ID'].str.lower().str.contains(keyword_lower, na=False))
-        df = df[mask]
-    
-    # Filter by kondisi
-    if kondisi != "Semua":
-        df = df[df['Kondisi'] == kondisi]
-    
-    return df
+    # Hasil pencarian diurutkan dari yang paling relevan
+    init_excel()
+    backend = get_backend()
+    return backend.get_alat_many(backend.search_alat(keyword, kondisi))
+
+def search_alat(keyword, kondisi="Semua"):
+    """Daftar ID alat yang cocok dengan keyword, urut relevansi"""
+    init_excel()
+    return get_backend().search_alat(keyword, kondisi)
+
+def autocomplete_id(prefix, limit=10):
+    """Saran ID alat yang diawali prefix"""
+    init_excel()
+    if not str(prefix).strip():
+        return []
+    return get_backend().complete_id(prefix, limit)
 
 # ==================== FUNGSI CRUD SERVIS ====================
 
 def get_all_servis():
-    """Ambil semua data servis dari Excel"""
+    """Ambil semua data servis dari penyimpanan"""
     init_excel()
-    try:
-        df = pd.read_excel(EXCEL_FILE, sheet_name='Servis')
-        return df
-    except Exception:
-        return pd.DataFrame(columns=[
-            "ID_Servis", "ID_Alat", "Tanggal", "Jenis_Servis", "Biaya", "Keterangan"
-        ])
+    return get_backend().read_servis()
 
 def get_riwayat_servis(alat_id):
     """Ambil riwayat servis berdasarkan ID alat"""
-    df = get_all_servis()
-    return df[df['ID_Alat'] == alat_id]
+    init_excel()
+    return get_backend().get_servis_by_alat(alat_id)
+
+def get_versi_data():
+    """Token versi isi penyimpanan (berubah setiap ada tulis, dari proses mana pun); murah
+    dipanggil per request untuk memvalidasi cache di luar utils
+
+    Hanya stat / baca header file, tanpa init_excel dan tanpa kunci, sehingga tidak ikut
+    menunggu compaction dan aman dipanggil dari event loop. None jika penyimpanan belum ada.
+    """
+    return get_backend().versi()
+
+def baris_json(data):
+    """Baris alat/servis (dict atau DataFrame) siap ditulis ke JSON: tanggal 'YYYY-MM-DD',
+    Biaya int, sel kosong None"""
+    if isinstance(data, pd.DataFrame):
+        # to_numpy(object) jauh lebih murah dari to_dict('records') untuk frame kecil
+        kolom = list(data.columns)
+        return [_baris_simpan(dict(zip(kolom, row))) for row in data.to_numpy(object).tolist()]
+    return _baris_simpan(data)
+
+def kolom_json(df):
+    """Seperti baris_json tetapi per kolom ({kolom: list nilai}) dan vektoris; untuk frame
+    besar yang barisnya diambil satu per satu belakangan"""
+    return {kolom: series.tolist() for kolom, series in _tanpa_skema(df).items()}
+
+def join_nama_alat(df_servis, df_alat=None):
+    """Tambahkan kolom Nama_Alat ke tabel servis dalam satu kali join (vectorized)"""
+    if df_alat is None:
+        df_alat = get_all_alat()
+    df_alat = df_alat.drop_duplicates('ID')
+    df = df_servis.copy()
+    if all(getattr(kolom.dtype, "storage", None) == "pyarrow" for kolom in (df['ID_Alat'], df_alat['ID'])):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        # Kolom teks Arrow (skema): hash join di Arrow, jauh lebih cepat dari Series.map
+        posisi = pc.index_in(pa.array(df['ID_Alat']), value_set=pa.array(df_alat['ID']))
+        nama = pc.fill_null(pa.array(df_alat['Nama'], type=pa.large_string()).take(posisi), "-")
+        df['Nama_Alat'] = pd.Series(pd.array(nama, dtype=DTYPE_TEKS), index=df.index)
+        return df
+    df['Nama_Alat'] = df['ID_Alat'].map(df_alat.set_index('ID')['Nama']).fillna("-")
+    return df
 
 def generate_servis_id():
-    """Generate ID baru untuk servis"""
-    df = get_all_servis()
-    if len(df) == 0:
-        return "SRV001"
-    last_id = df['ID_Servis'].iloc[-1]
-    try:
-        num = int(last_id[3:]) + 1
-        return f"SRV{num:03d}"
-    except:
-        return f"SRV{len(df)+1:03d}"
+    """Generate (alokasikan) ID baru untuk servis"""
+    return allocate_ids("servis")[0]
 
 def add_servis(alat_id, tanggal, jenis_servis, biaya, keterangan):
     """Tambah catatan servis baru"""
     init_excel()
-    df_alat = get_all_alat()
-    df_servis = get_all_servis()
-    new_id = generate_servis_id()
-    new_row = pd.DataFrame([{
-        "ID_Servis": new_id,
-        "ID_Alat": alat_id,
-        "Tanggal": tanggal,
-        "Jenis_Servis": jenis_servis,
-        "Biaya": biaya,
-        "Keterangan": keterangan
-    }])
-    df_servis = pd.concat([df_servis, new_row], ignore_index=True)
-    with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-        df_alat.to_excel(writer, sheet_name='Alat', index=False)
-        df_servis.to_excel(writer, sheet_name='Servis', index=False)
+    backend = get_backend()
+    with backend.write_lock():
+        new_id = generate_servis_id()
+        backend.insert_servis({
+            "ID_Servis": new_id,
+            "ID_Alat": alat_id,
+            "Tanggal": tanggal,
+            "Jenis_Servis": jenis_servis,
+            "Biaya": biaya,
+            "Keterangan": keterangan
+        })
     return new_id
 
+# ==================== FUNGSI HALAMAN (PAGINASI) ====================
+
+def get_alat_page(page=1, page_size=PAGE_SIZE, sort_by="ID", descending=False, cursor=None,
+                  keyword="", kondisi="Semua"):
+    """Satu halaman data alat terurut, opsional difilter keyword (Nama/ID/Keterangan) dan kondisi
+
+    Pakai `page` (offset) untuk navigasi nomor halaman, atau `cursor` (next_cursor dari
+    halaman sebelumnya) untuk keyset pagination yang tetap stabil saat ada data baru.
+    Dengan keyword, urutan mengikuti relevansi dari index pencarian (seperti filter_alat) dan
+    hanya baris halaman itu yang dibaca; sort_by dan cursor diabaikan.
+    Hasil: {"rows": DataFrame, "total": jumlah baris, "next_cursor": cursor atau None}
+    """
+    init_excel()
+    backend = get_backend()
+    offset = (max(page, 1) - 1) * page_size
+    if str(keyword).strip():
+        ids = backend.search_alat(keyword, kondisi)
+        return {"rows": backend.get_alat_many(ids[offset:offset + page_size]), "total": len(ids),
+                "next_cursor": None}
+    return backend.page(
+        "alat", sort_by, descending, limit=page_size, offset=offset, after=cursor,
+        kondisi=None if kondisi == "Semua" else kondisi,
+    )
+
+def get_servis_page(page=1, page_size=PAGE_SIZE, sort_by="ID_Servis", descending=False, cursor=None,
+                    alat_id=None):
+    """Satu halaman riwayat servis terurut (opsional hanya untuk satu alat), plus kolom Nama_Alat"""
+    init_excel()
+    backend = get_backend()
+    hasil = backend.page(
+        "servis", sort_by, descending, limit=page_size, offset=(max(page, 1) - 1) * page_size,
+        after=cursor, alat_id=alat_id,
+    )
+    # Nama alat cukup dicari untuk baris di halaman ini saja
+    ids = list(dict.fromkeys(hasil["rows"]['ID_Alat'].tolist()))
+    hasil["rows"] = join_nama_alat(hasil["rows"], backend.get_alat_many(ids))
+    return hasil
+
+def page_count(total, page_size=PAGE_SIZE):
+    """Jumlah halaman untuk total baris tertentu (minimal 1)"""
+    return max((total + page_size - 1) // page_size, 1)
+
+def alat_options(keyword="", limit=50):
+    """Pilihan "ID - Nama" untuk selector alat, diisi dari index pencarian (maksimal limit)"""
+    init_excel()
+    backend = get_backend()
+    if str(keyword).strip():
+        df = backend.get_alat_many(backend.search_alat(keyword)[:limit])
+    else:
+        df = backend.page("alat", "ID", limit=limit)["rows"]
+    return (df['ID'].astype(str) + " - " + df['Nama'].fillna("").astype(str)).tolist()
+
 # ==================== FUNGSI STATISTIK & GRAFIK ====================
 
 def get_statistik():
-    """Ambil statistik peralatan untuk dashboard"""
-    df = get_all_alat()
-    df_servis = get_all_servis()
-    total = len(df)
-    kondisi_baik = len(df[df['Kondisi'] == 'Baik'])
-    kondisi_rusak_ringan = len(df[df['Kondisi'] == 'Rusak Ringan'])
-    kondisi_rusak_berat = len(df[df['Kondisi'] == 'Rusak Berat'])
-    total_servis = len(df_servis)
-    total_biaya = df_servis['Biaya'].sum() if len(df_servis) > 0 else 0
-    
+    """Ambil statistik peralatan untuk dashboard (dari agregat, tanpa membaca baris)"""
+    init_excel()
+    agg = get_backend().aggregates()
     return {
-        "total": total,
-        "baik": kondisi_baik,
-        "rusak_ringan": kondisi_rusak_ringan,
-        "rusak_berat": kondisi_rusak_berat,
-        "total_servis": total_servis,
-        "total_biaya": total_biaya
+        "total": agg['total_alat'],
+        "baik": agg['kondisi'].get('Baik', 0),
+        "rusak_ringan": agg['kondisi'].get('Rusak Ringan', 0),
+        "rusak_berat": agg['kondisi'].get('Rusak Berat', 0),
+        "total_servis": agg['total_servis'],
+        "total_biaya": agg['total_biaya']
     }
 
 def get_chart_kondisi():
     """Ambil data untuk grafik kondisi alat"""
-    df = get_all_alat()
-    if len(df) == 0:
+    init_excel()
+    kondisi = get_backend().aggregates()['kondisi']
+    if not kondisi:
         return None
-    kondisi_count = df['Kondisi'].value_counts().to_dict()
-    return kondisi_count
+    # Urutan sama seperti value_counts: terbanyak lebih dulu
+    return dict(sorted(
+        ((k, v) for k, v in kondisi.items() if k is not None),
+        key=lambda item: item[1], reverse=True
+    ))
 
+def get_alat_aggregate(alat_id):
+    """Jumlah servis, total biaya, dan tanggal servis terakhir untuk satu alat"""
+    init_excel()
+    return get_backend().alat_aggregate(alat_id)
 
+def check_aggregates():
+    """Cek konsistensi: bandingkan agregat tersimpan dengan hitung ulang dari baris mentah"""
+    init_excel()
+    backend = get_backend()
+    df_alat, df_servis = backend.read_alat(), backend.read_servis()
+    full = _compute_aggregates(df_alat, df_servis)
+    expected = _ringkas_aggregates(full["kondisi"], full["total_servis"], full["total_biaya"])
+    actual = backend.aggregates()
+    selisih = {}
+    for kunci in ("kondisi", "total_alat", "total_servis"):
+        if expected[kunci] != actual[kunci]:
+            selisih[kunci] = (actual[kunci], expected[kunci])
+    if abs(float(expected["total_biaya"]) - float(actual["total_biaya"])) > 1e-6:
+        selisih["total_biaya"] = (actual["total_biaya"], expected["total_biaya"])
+    for alat_id in set(full["per_alat"]) | set(df_alat['ID'].tolist()):
+        harapan = full["per_alat"].get(alat_id, {"jumlah": 0, "biaya": 0, "terakhir": None})
+        nyata = backend.alat_aggregate(alat_id)
+        if (harapan["jumlah"], harapan["terakhir"]) != (nyata["jumlah"], nyata["terakhir"]) \
+                or abs(float(harapan["biaya"]) - float(nyata["biaya"])) > 1e-6:
+            selisih[f"alat:{alat_id}"] = (nyata, harapan)
+    kunci_rollup = ["Bulan", "Jenis_Servis", "ID_Alat"]
+    harapan = _gabung_rollup(_rollup_biaya(df_servis)).set_index(kunci_rollup).sort_index()
+    nyata = backend.cost_rollup().set_index(kunci_rollup).sort_index()
+    if not (harapan.index.equals(nyata.index)
+            and (harapan['Jumlah'].to_numpy() == nyata['Jumlah'].to_numpy()).all()
+            and ((harapan['Biaya'] - nyata['Biaya']).abs() <= 1e-6).all()):
+        selisih["rollup_biaya"] = (len(nyata), len(harapan))
+    return {"ok": not selisih, "selisih": selisih}
 
 def get_servis_terbaru(limit=5):
-    """Ambil catatan servis terbaru"""
-    df = get_all_servis()
-    if len(df) == 0:
-        return df
-    return df.tail(limit)
+    """Ambil catatan servis terbaru (tanpa membaca seluruh riwayat)"""
+    init_excel()
+    return get_backend().servis_terbaru(limit)
+
+# ==================== KARTU SCAN ====================
+# Kartu scan terakhir disimpan per ID selama token versi data sama, sehingga scan ulang alat
+# yang sama (misal beberapa kali selama satu pekerjaan) cukup satu lookup dict.
+SCAN_CACHE_SIZE = 32
+
+_scan_cache = OrderedDict()
+_scan_cache_lock = threading.Lock()
+
+def get_scan_card(alat_id):
+    """Semua yang dibutuhkan satu scan QR dari satu snapshot data
+
+    Kembalikan dict {"alat": baris alat, "servis": riwayat servis (DataFrame), "jumlah",
+    "biaya", "terakhir" (seperti get_alat_aggregate)}, atau None jika alat tidak ada.
+    """
+    init_excel()
+    backend = get_backend()
+    versi = backend.versi()
+    with _scan_cache_lock:
+        entri = _scan_cache.get(alat_id)
+        if entri is not None and entri[0] is backend and entri[1] == versi:
+            _scan_cache.move_to_end(alat_id)
+            return _salin_kartu(entri[2])
+    alat, servis = backend.scan_card(alat_id)
+    kartu = None
+    if alat is not None:
+        terakhir = servis['Tanggal'].max() if len(servis) > 0 else pd.NaT
+        kartu = {
+            "alat": alat,
+            "servis": servis,
+            "jumlah": len(servis),
+            "biaya": int(servis['Biaya'].sum()),
+            "terakhir": None if pd.isna(terakhir) else f"{terakhir:%Y-%m-%d}",
+        }
+    with _scan_cache_lock:
+        # Versi dibaca sebelum data: jika ada tulis di antaranya, entri ini langsung basi
+        _scan_cache[alat_id] = (backend, versi, kartu)
+        _scan_cache.move_to_end(alat_id)
+        while len(_scan_cache) > SCAN_CACHE_SIZE:
+            _scan_cache.popitem(last=False)
+    return _salin_kartu(kartu)
+
+def _salin_kartu(kartu):
+    """Salinan kartu dari cache yang aman dimodifikasi pemanggil"""
+    if kartu is None:
+        return None
+    return dict(kartu, alat=dict(kartu["alat"]), servis=_read_only_view(kartu["servis"]))
+
+# ==================== ANALITIK BIAYA ====================
+# Semua fungsi di bawah hanya membaca rollup biaya (bulan x Jenis_Servis x ID_Alat), bukan
+# baris servis mentah, sehingga tetap cepat walau riwayat servis bertahun-tahun.
+PERIODE_BIAYA = ("bulan", "tahun")
+KELOMPOK_BIAYA = (None, "Jenis_Servis", "ID_Alat")
+
+def get_rollup_biaya():
+    """Rollup biaya servis per bulan x Jenis_Servis x ID_Alat (kolom Bulan bertipe datetime64)"""
+    init_excel()
+    return get_backend().cost_rollup()
+
+def _filter_rollup(df, tahun=None, alat_id=None):
+    if tahun is not None:
+        df = df[df['Bulan'].dt.year == int(tahun)]
+    if alat_id is not None:
+        df = df[df['ID_Alat'] == alat_id]
+    return df
+
+def get_biaya_periode(periode="bulan", kelompok=None, tahun=None, alat_id=None):
+    """Jumlah dan total biaya servis per bulan atau per tahun
+
+    `kelompok` memecah hasil per "Jenis_Servis" atau "ID_Alat". Kolom periode bernama "Bulan"
+    (datetime64 awal bulan) atau "Tahun" (int); servis tanpa tanggal valid tidak ikut.
+    """
+    if periode not in PERIODE_BIAYA:
+        raise ValueError(f"Periode tidak dikenal: {periode}")
+    if kelompok not in KELOMPOK_BIAYA:
+        raise ValueError(f"Kelompok tidak dikenal: {kelompok}")
+    df = _filter_rollup(get_rollup_biaya(), tahun, alat_id).dropna(subset=['Bulan'])
+    kolom = "Bulan" if periode == "bulan" else "Tahun"
+    if periode == "tahun":
+        df = df.assign(Tahun=df['Bulan'].dt.year.astype("int64"))
+    kunci = [kolom] + ([kelompok] if kelompok else [])
+    return df.groupby(kunci, sort=True).agg(
+        Jumlah=("Jumlah", "sum"), Biaya=("Biaya", "sum")
+    ).reset_index()
+
+def get_biaya_per_jenis(tahun=None, alat_id=None):
+    """Jumlah dan total biaya servis per Jenis_Servis, terbesar lebih dulu"""
+    df = _filter_rollup(get_rollup_biaya(), tahun, alat_id)
+    return df.groupby("Jenis_Servis", sort=False).agg(
+        Jumlah=("Jumlah", "sum"), Biaya=("Biaya", "sum")
+    ).reset_index().sort_values("Biaya", ascending=False, ignore_index=True)
+
+def get_top_alat_biaya(limit=10, tahun=None):
+    """Alat dengan total biaya servis terbesar: ID_Alat, Jumlah, Biaya"""
+    df = _filter_rollup(get_rollup_biaya(), tahun)
+    return df.groupby("ID_Alat", sort=False).agg(
+        Jumlah=("Jumlah", "sum"), Biaya=("Biaya", "sum")
+    ).reset_index().nlargest(limit, "Biaya").reset_index(drop=True)
+
+# ==================== EXPORT RIWAYAT SERVIS ====================
+# Riwayat servis dialirkan per chunk (EXPORT_CHUNK_SIZE baris) dari backend ke CSV/XLSX,
+# sehingga memori yang dipakai tidak bertambah dengan panjang riwayat.
+
+KOLOM_EXPORT_SERVIS = ["ID_Servis", "ID_Alat", "Nama_Alat", "Tanggal", "Jenis_Servis", "Biaya", "Keterangan"]
+FORMAT_EXPORT = {
+    "CSV": ("csv", "text/csv"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+def _tanggal_filter(value, nama):
+    """Batas rentang tanggal sebagai 'YYYY-MM-DD' (None jika kosong)"""
+    if _kosongkan_nan(value) is None or value == "":
+        return None
+    teks = _nilai_simpan("Tanggal", value)
+    if teks is None:
+        raise ValueError(f"Tanggal {nama} '{value}' bukan tanggal YYYY-MM-DD")
+    return teks
+
+def iter_servis_chunks(alat_id=None, mulai=None, sampai=None, dengan_nama=True, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generator DataFrame riwayat servis per chunk, opsional per alat, rentang tanggal, dan + Nama_Alat"""
+    mulai, sampai = _tanggal_filter(mulai, "mulai"), _tanggal_filter(sampai, "sampai")
+    init_excel()
+    backend = get_backend()
+    nama_alat = None
+    if dengan_nama:
+        # Cukup ID dan Nama; tabel alat jauh lebih kecil dari riwayat servis
+        df_alat = backend.get_alat_many([alat_id]) if alat_id is not None else backend.read_alat()
+        nama_alat = df_alat[['ID', 'Nama']]
+    for chunk in backend.iter_servis(alat_id, mulai, sampai, chunk_size):
+        if nama_alat is not None:
+            chunk = join_nama_alat(chunk, nama_alat)[KOLOM_EXPORT_SERVIS]
+        yield chunk
+
+def iter_servis_csv(alat_id=None, mulai=None, sampai=None, dengan_nama=True, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generator bytes CSV (UTF-8) riwayat servis, satu potongan per chunk; header di potongan pertama"""
+    header = True
+    for chunk in iter_servis_chunks(alat_id, mulai, sampai, dengan_nama, chunk_size):
+        yield chunk.to_csv(index=False, header=header, date_format="%Y-%m-%d", lineterminator="\n").encode("utf-8")
+        header = False
+    if header:
+        # Riwayat kosong: tetap hasilkan baris header
+        kolom = KOLOM_EXPORT_SERVIS if dengan_nama else KOLOM_SERVIS
+        yield (",".join(kolom) + "\n").encode("utf-8")
+
+def _tulis_xlsx_servis(target, chunks, kolom):
+    """Tulis chunk ke workbook openpyxl mode write-only (baris langsung di-stream ke file sementara)"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Servis")
+    ws.append(kolom)
+    for chunk in chunks:
+        # Tanggal sebagai date (sel berformat tanggal), kosong sebagai sel kosong
+        chunk = _tanggal_untuk_excel(chunk).astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(target)
+
+def export_servis(target=None, file_format="CSV", alat_id=None, mulai=None, sampai=None, dengan_nama=True,
+                  chunk_size=EXPORT_CHUNK_SIZE):
+    """Export riwayat servis ke CSV/XLSX per chunk dengan memori terbatas
+
+    target bisa path file atau file biner; tanpa target hasil ditulis ke file sementara di
+    disk yang dikembalikan dengan posisi di awal (misal untuk st.download_button).
+    """
+    file_format = file_format.upper()
+    if file_format not in FORMAT_EXPORT:
+        raise ValueError(f"Format export '{file_format}' tidak dikenal")
+
+    def tulis(f):
+        if file_format == "CSV":
+            for potongan in iter_servis_csv(alat_id, mulai, sampai, dengan_nama, chunk_size):
+                f.write(potongan)
+        else:
+            chunks = iter_servis_chunks(alat_id, mulai, sampai, dengan_nama, chunk_size)
+            _tulis_xlsx_servis(f, chunks, KOLOM_EXPORT_SERVIS if dengan_nama else KOLOM_SERVIS)
+
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'wb') as f:
+            tulis(f)
+        record_io(bytes_written=os.path.getsize(target))
+        return target
+    if target is not None:
+        tulis(target)
+        return target
+    f = tempfile.TemporaryFile()
+    try:
+        tulis(f)
+    except BaseException:
+        f.close()
+        raise
+    record_io(bytes_written=f.tell())
+    f.seek(0)
+    return f
+
+# ==================== RENDER GRAFIK ====================
+# "matplotlib" (PNG/SVG ter-cache) atau "vega" (grafik native Streamlit, tanpa Matplotlib)
+CHART_RENDERER = os.environ.get("BENGKEL_CHART", "matplotlib").lower()
+
+CHART_THEME = {
+    "colors": {"Baik": "#28a745", "Rusak Ringan": "#ffc107", "Rusak Berat": "#dc3545"},
+    "fallback_color": "#6c757d",
+    "text_color": "white",
+    "figsize": (3, 3),
+    "dpi": 100,
+}
+CHART_CACHE_MAX = 32
+
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+_chart_cache_stats = {"hits": 0, "misses": 0}
+
+def _chart_fingerprint(data, theme, fmt):
+    """Sidik jari isi grafik: angka, tema, dan format keluaran"""
+    payload = json.dumps([list(data.items()), theme, fmt], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _chart_colors(labels, theme):
+    return [theme["colors"].get(label, theme["fallback_color"]) for label in labels]
+
+def _render_pie(data, theme, fmt):
+    """Render pie chart dengan backend Agg; figure ditutup sebelum return"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=theme["figsize"], dpi=theme["dpi"])
+    try:
+        fig.patch.set_alpha(0)
+        ax.set_facecolor('none')
+        ax.pie(
+            list(data.values()),
+            labels=list(data.keys()),
+            autopct='%1.0f%%',
+            colors=_chart_colors(data.keys(), theme),
+            startangle=90,
+            textprops={'color': theme["text_color"]}
+        )
+        ax.axis('equal')
+        buffer = BytesIO()
+        fig.savefig(buffer, format=fmt, transparent=True, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+def render_chart_kondisi(chart_kondisi, fmt="png", theme=None):
+    """Bytes gambar grafik kondisi; dirender ulang hanya jika angka/tema berubah"""
+    theme = theme or CHART_THEME
+    key = _chart_fingerprint(chart_kondisi, theme, fmt)
+    with _chart_cache_lock:
+        data = _chart_cache.get(key)
+        if data is not None:
+            _chart_cache.move_to_end(key)
+            _chart_cache_stats["hits"] += 1
+            return data
+        _chart_cache_stats["misses"] += 1
+
+    data = _render_pie(chart_kondisi, theme, fmt)
+    with _chart_cache_lock:
+        _chart_cache[key] = data
+        while len(_chart_cache) > CHART_CACHE_MAX:
+            _chart_cache.popitem(last=False)
+    return data
+
+def chart_kondisi_spec(chart_kondisi, theme=None):
+    """Spesifikasi Vega-Lite grafik kondisi untuk st.vega_lite_chart"""
+    theme = theme or CHART_THEME
+    labels = list(chart_kondisi.keys())
+    return {
+        "data": {"values": [{"Kondisi": k, "Jumlah": v} for k, v in chart_kondisi.items()]},
+        "mark": {"type": "arc", "tooltip": True},
+        "encoding": {
+            "theta": {"field": "Jumlah", "type": "quantitative", "stack": True},
+            "color": {
+                "field": "Kondisi", "type": "nominal",
+                "scale": {"domain": labels, "range": _chart_colors(labels, theme)},
+            },
+            "order": {"field": "Jumlah", "type": "quantitative", "sort": "descending"},
+        },
+        "view": {"stroke": None},
+    }
+
+def get_chart_cache_stats():
+    """Statistik cache grafik (hit, miss, jumlah entri)"""
+    with _chart_cache_lock:
+        return {
+            "hits": _chart_cache_stats["hits"],
+            "misses": _chart_cache_stats["misses"],
+            "entries": len(_chart_cache),
+        }
+
 
 # ==================== FUNGSI QR CODE ====================
 
-def generate_qr(alat_id):
-    """Generate QR Code dari ID alat"""
+# Parameter render QR; ikut menentukan hash isi file di /qr
+QR_VERSION = 1
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+QR_ERROR_CORRECTION = "L"
+
+# Jumlah proses untuk generate QR massal (None = jumlah CPU)
+QR_BULK_WORKERS = None
+# Minimal jumlah file sebelum process pool dipakai: proses spawn perlu ~1-2 detik untuk import
+# utils/pandas, sedangkan satu QR hanya beberapa milidetik
+QR_BULK_MIN_POOL = 1000
+QR_MANIFEST_FILE = os.path.join(QR_DIR, "manifest.json")
+
+_qr_manifest_lock = threading.Lock()
+
+def _qr_params():
+    return (QR_VERSION, QR_BOX_SIZE, QR_BORDER, QR_ERROR_CORRECTION)
+
+def _render_qr_png(alat_id, version, box_size, border, error_correction):
+    """Render QR Code menjadi bytes PNG"""
+    import qrcode
     qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+        version=version,
+        error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{error_correction}"),
+        box_size=box_size,
+        border=border,
     )
     qr.add_data(alat_id)
     qr.make(fit=True)
     img = qr.make_image(fill_color="black", back_color="white")
     img_bytes = BytesIO()
     img.save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+def qr_content_hash(alat_id, params=None):
+    """Hash isi QR: ID + parameter render"""
+    params = params or _qr_params()
+    return hashlib.sha256(repr((str(alat_id),) + tuple(params)).encode("utf-8")).hexdigest()[:16]
+
+# Batas memori cache PNG QR (byte); entri paling lama tidak dipakai dibuang lebih dulu
+QR_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+_qr_cache = OrderedDict()
+_qr_cache_lock = threading.Lock()
+_qr_cache_stats = {"hits": 0, "misses": 0, "disk": 0, "bytes": 0}
+
+def _qr_png_cached(alat_id):
+    """Bytes PNG QR dari cache LRU, file /qr yang masih valid, atau render baru"""
+    params = _qr_params()
+    key = (str(alat_id),) + params
+    with _qr_cache_lock:
+        data = _qr_cache.get(key)
+        if data is not None:
+            _qr_cache.move_to_end(key)
+            _qr_cache_stats["hits"] += 1
+            return data
+        _qr_cache_stats["misses"] += 1
+
+    data = None
+    file_path = _qr_file_path(alat_id)
+    if os.path.exists(file_path) and _load_qr_manifest().get(str(alat_id)) == qr_content_hash(alat_id, params):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        record_io(bytes_read=len(data))
+        with _qr_cache_lock:
+            _qr_cache_stats["disk"] += 1
+    if data is None:
+        data = _render_qr_png(alat_id, *params)
+
+    with _qr_cache_lock:
+        if key not in _qr_cache and len(data) <= QR_CACHE_MAX_BYTES:
+            _qr_cache[key] = data
+            _qr_cache_stats["bytes"] += len(data)
+            while _qr_cache_stats["bytes"] > QR_CACHE_MAX_BYTES:
+                _, lama = _qr_cache.popitem(last=False)
+                _qr_cache_stats["bytes"] -= len(lama)
+    return data
+
+def get_qr_cache_stats():
+    """Statistik cache QR (hit, miss, baca dari disk, ukuran)"""
+    with _qr_cache_lock:
+        hits, misses = _qr_cache_stats["hits"], _qr_cache_stats["misses"]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "disk_reads": _qr_cache_stats["disk"],
+            "entries": len(_qr_cache),
+            "bytes": _qr_cache_stats["bytes"],
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+def generate_qr(alat_id):
+    """Generate QR Code dari ID alat"""
+    # BytesIO baru per pemanggil (posisi baca sendiri) di atas bytes yang sama tanpa salinan
+    img_bytes = BytesIO(_qr_png_cached(alat_id))
     img_bytes.seek(0)
     return img_bytes
 
+def _qr_file_path(alat_id):
+    return os.path.join(QR_DIR, f"QR_{alat_id}.png")
+
+def _load_qr_manifest():
+    try:
+        with open(QR_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _update_qr_manifest(entries):
+    """Simpan hash file QR yang baru ditulis ke manifest"""
+    with _qr_manifest_lock:
+        manifest = _load_qr_manifest()
+        manifest.update(entries)
+        _atomic_write_json(QR_MANIFEST_FILE, manifest)
+
+def _write_qr_file(args):
+    """Worker: render dan simpan satu file QR, kembalikan (ID, hash, byte ditulis)
+
+    Berjalan di proses pool, jadi tidak menyentuh state proses induk (metrik dicatat pemanggil).
+    """
+    alat_id, qr_dir, params = args
+    file_path = os.path.join(qr_dir, f"QR_{alat_id}.png")
+    with open(file_path, 'wb') as f:
+        f.write(_render_qr_png(alat_id, *params))
+        return alat_id, qr_content_hash(alat_id, params), f.tell()
+
 def save_qr_to_file(alat_id):
     """Simpan QR Code ke folder /qr"""
     init_folders()
-    qr_bytes = generate_qr(alat_id)
-    file_path = os.path.join(QR_DIR, f"QR_{alat_id}.png")
-    with open(file_path, 'wb') as f:
-        f.write(qr_bytes.getvalue())
-    return file_path
+    alat_id, content_hash, n_byte = _write_qr_file((alat_id, QR_DIR, _qr_params()))
+    record_io(bytes_written=n_byte)
+    _update_qr_manifest({alat_id: content_hash})
+    return _qr_file_path(alat_id)
 
 def get_qr_file_path(alat_id):
     """Ambil path file QR untuk alat tertentu"""
-    file_path = os.path.join(QR_DIR, f"QR_{alat_id}.png")
+    file_path = _qr_file_path(alat_id)
     if os.path.exists(file_path):
         return file_path
     return None
 
-def decode_qr(image_bytes):
-    """Decode QR Code dari gambar menggunakan zxingcpp"""
+def generate_qr_bulk(alat_ids=None, workers=None, force=False):
+    """Generate file QR untuk banyak alat sekaligus memakai process pool
+
+    File yang hash-nya (ID + parameter render) masih sama di manifest dilewati.
+    Kembalikan {"generated": [...], "skipped": [...]}.
+    """
+    init_folders()
+    if alat_ids is None:
+        alat_ids = get_all_alat()['ID'].tolist()
+    alat_ids = [str(a) for a in dict.fromkeys(alat_ids)]
+    params = _qr_params()
+    manifest = {} if force else _load_qr_manifest()
+    stale = [
+        alat_id for alat_id in alat_ids
+        if manifest.get(alat_id) != qr_content_hash(alat_id, params)
+        or not os.path.exists(_qr_file_path(alat_id))
+    ]
+    tasks = [(alat_id, QR_DIR, params) for alat_id in stale]
+    workers = workers or QR_BULK_WORKERS or os.cpu_count() or 1
+    if workers > 1 and len(tasks) >= QR_BULK_MIN_POOL:
+        # spawn, bukan fork: server Streamlit multi-thread, dan fork saat thread lain memegang
+        # lock (misal _metrics_lock) membuat proses anak deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            hasil = list(pool.map(_write_qr_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        hasil = [_write_qr_file(task) for task in tasks]
+    if hasil:
+        record_io(bytes_written=sum(n_byte for _, _, n_byte in hasil))
+        _update_qr_manifest({alat_id: content_hash for alat_id, content_hash, _ in hasil})
+    stale_set = set(stale)
+    return {
+        "generated": stale,
+        "skipped": [alat_id for alat_id in alat_ids if alat_id not in stale_set],
+    }
+
+def export_qr_zip(df_alat):
+    """Buat arsip ZIP berisi file QR untuk alat di df_alat (BytesIO)"""
+    generate_qr_bulk(df_alat['ID'].tolist())
+    buffer = BytesIO()
+    # PNG sudah terkompresi, simpan tanpa kompresi ulang
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for alat_id in df_alat['ID'].astype(str):
+            zf.write(_qr_file_path(alat_id), arcname=f"QR_{alat_id}.png")
+    buffer.seek(0)
+    return buffer
+
+# Tata letak lembar label A4 (200 dpi)
+LABEL_PAGE_SIZE = (1654, 2339)
+LABEL_COLUMNS = 4
+LABEL_ROWS = 6
+
+def _label_pages(df_alat):
+    """Susun label QR (kode + ID + Nama) dalam halaman-halaman A4"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    generate_qr_bulk(df_alat['ID'].tolist())
+    lebar, tinggi = LABEL_PAGE_SIZE
+    margin = 60
+    cell_w = (lebar - 2 * margin) // LABEL_COLUMNS
+    cell_h = (tinggi - 2 * margin) // LABEL_ROWS
+    qr_size = min(cell_w, cell_h) - 90
     try:
-        # Load image dengan PIL
-        image = Image.open(BytesIO(image_bytes))
-        
-        # Decode dengan zxingcpp
-        results = zxingcpp.read_barcodes(image)
-        
+        font = ImageFont.load_default(size=24)
+    except TypeError:
+        font = ImageFont.load_default()
+
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+    rows = df_alat[['ID', 'Nama']].astype(str).values.tolist()
+    pages = []
+    for start in range(0, max(len(rows), 1), per_page):
+        page = Image.new("RGB", LABEL_PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+        for i, (alat_id, nama) in enumerate(rows[start:start + per_page]):
+            x = margin + (i % LABEL_COLUMNS) * cell_w
+            y = margin + (i // LABEL_COLUMNS) * cell_h
+            with Image.open(_qr_file_path(alat_id)) as qr_img:
+                qr_img = qr_img.convert("RGB").resize((qr_size, qr_size), Image.NEAREST)
+            page.paste(qr_img, (x + (cell_w - qr_size) // 2, y))
+            for j, teks in enumerate([alat_id, nama[:28]]):
+                text_w = draw.textlength(teks, font=font)
+                draw.text((x + (cell_w - text_w) / 2, y + qr_size + 8 + j * 30), teks, fill="black", font=font)
+            draw.rectangle([x, y - 10, x + cell_w - 1, y + cell_h - 20], outline="#cccccc")
+        pages.append(page)
+    return pages
+
+def export_qr_label_sheet(df_alat, file_format="PDF"):
+    """Buat lembar label QR siap cetak (PDF multi halaman, atau PNG per halaman dalam ZIP)"""
+    pages = _label_pages(df_alat)
+    buffer = BytesIO()
+    if file_format.upper() == "PDF":
+        pages[0].save(buffer, format="PDF", resolution=200, save_all=True, append_images=pages[1:])
+    elif len(pages) == 1:
+        pages[0].save(buffer, format="PNG", dpi=(200, 200))
+    else:
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as zf:
+            for nomor, page in enumerate(pages, start=1):
+                page_bytes = BytesIO()
+                page.save(page_bytes, format="PNG", dpi=(200, 200))
+                zf.writestr(f"label_qr_hal{nomor:03d}.png", page_bytes.getvalue())
+    buffer.seek(0)
+    return buffer
+
+# Sisi terpanjang gambar untuk percobaan decode cepat (foto kamera diperkecil dulu)
+DECODE_FAST_MAX_SIDE = 800
+DECODE_MEDIUM_MAX_SIDE = 1600
+
+_decode_stats = {}
+_decode_stats_lock = threading.Lock()
+
+def _open_gray(image_bytes, max_side=None):
+    """Buka gambar sebagai grayscale, diperkecil sampai max_side jika diberikan"""
+    from PIL import Image
+    image = Image.open(BytesIO(image_bytes))
+    if max_side:
+        # Untuk JPEG, draft() membuat decoder langsung membaca versi kecil (jauh lebih cepat)
+        image.draft("L", (max_side, max_side))
+    image = image.convert("L")
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side))
+    return image
+
+def _stage_cepat(image_bytes):
+    import zxingcpp
+    image = _open_gray(image_bytes, DECODE_FAST_MAX_SIDE)
+    return zxingcpp.read_barcodes(
+        image, formats=zxingcpp.BarcodeFormat.QRCode,
+        try_rotate=False, try_downscale=False, try_invert=False
+    )
+
+def _stage_penuh(image_bytes):
+    import zxingcpp
+    image = _open_gray(image_bytes)
+    return zxingcpp.read_barcodes(image, formats=zxingcpp.BarcodeFormat.QRCode)
+
+def _stage_biner(image_bytes):
+    # Pantulan cahaya (glare): tarik kontras lalu binarisasi global
+    from PIL import ImageOps
+    import zxingcpp
+    image = ImageOps.autocontrast(_open_gray(image_bytes, DECODE_MEDIUM_MAX_SIDE), cutoff=2)
+    return zxingcpp.read_barcodes(
+        image, formats=zxingcpp.BarcodeFormat.QRCode, binarizer=zxingcpp.Binarizer.GlobalHistogram
+    )
+
+def _stage_rotasi(image_bytes):
+    # Foto miring: coba beberapa sudut (90/180/270 sudah ditangani zxing)
+    import zxingcpp
+    image = _open_gray(image_bytes, DECODE_MEDIUM_MAX_SIDE)
+    for sudut in (45, -20, 20):
+        results = zxingcpp.read_barcodes(
+            image.rotate(sudut, expand=True, fillcolor=255), formats=zxingcpp.BarcodeFormat.QRCode
+        )
         if results:
-            # Ambil hasil pertama
-            return results[0].text
-        
-        return None
+            return results
+    return []
+
+# Urutan tahap decode: dari yang paling murah, naik hanya jika tahap sebelumnya gagal
+DECODE_STAGES = [
+    ("cepat", _stage_cepat),
+    ("penuh", _stage_penuh),
+    ("biner", _stage_biner),
+    ("rotasi", _stage_rotasi),
+]
+
+def decode_qr_detail(image_bytes):
+    """Decode QR bertahap; kembalikan {"text", "stage", "timings" (ms per tahap), "error"}"""
+    hasil = {"text": None, "stage": None, "timings": {}, "error": None}
+    for nama, stage in DECODE_STAGES:
+        t0 = time.perf_counter()
+        try:
+            results = stage(image_bytes)
+        except Exception as e:
+            results = []
+            hasil["error"] = str(e)
+        durasi = (time.perf_counter() - t0) * 1000
+        hasil["timings"][nama] = durasi
+        berhasil = bool(results)
+        with _decode_stats_lock:
+            stat = _decode_stats.setdefault(nama, {"attempts": 0, "success": 0, "total_ms": 0.0})
+            stat["attempts"] += 1
+            stat["success"] += int(berhasil)
+            stat["total_ms"] += durasi
+        if berhasil:
+            hasil["text"], hasil["stage"], hasil["error"] = results[0].text, nama, None
+            break
+        if hasil["error"]:
+            # Gambar tidak bisa dibuka sama sekali, tahap berikutnya juga akan gagal
+            break
+    if hasil["error"]:
+        logger.warning("Error decode: %s", hasil["error"])
+    return hasil
+
+def get_decode_stats():
+    """Statistik per tahap decode: jumlah percobaan, berhasil, rata-rata waktu (ms)"""
+    with _decode_stats_lock:
+        return {
+            nama: {
+                "attempts": stat["attempts"],
+                "success": stat["success"],
+                "avg_ms": stat["total_ms"] / stat["attempts"] if stat["attempts"] else 0.0,
+            }
+            for nama, stat in _decode_stats.items()
+        }
+
+def decode_qr(image_bytes):
+    """Decode QR Code dari gambar menggunakan zxingcpp (pipeline bertahap)"""
+    return decode_qr_detail(image_bytes)["text"]
+
+# ==================== STOCKTAKE (SCAN MASSAL) ====================
+
+# Jumlah thread decode (zxing-cpp melepas GIL saat decode)
+DECODE_WORKERS = None
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+
+def decode_qr_all(image_bytes):
+    """Decode semua QR Code dalam satu gambar, kembalikan list teks"""
+    from PIL import Image
+    import zxingcpp
+    image = Image.open(BytesIO(image_bytes))
+    return [r.text for r in zxingcpp.read_barcodes(image) if r.text]
+
+def _expand_images(files):
+    """Ubah daftar (nama, bytes) menjadi daftar gambar, isi ZIP ikut dibuka"""
+    images = []
+    for nama, data in files:
+        if nama.lower().endswith(".zip"):
+            with zipfile.ZipFile(BytesIO(data)) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                        images.append((f"{nama}/{info.filename}", zf.read(info)))
+        else:
+            images.append((nama, data))
+    return images
+
+def _decode_one(item):
+    nama, data = item
+    try:
+        return {"file": nama, "ids": decode_qr_all(data), "error": None}
     except Exception as e:
-        print(f"Error decode: {e}")
-        return None
+        return {"file": nama, "ids": [], "error": str(e)}
+
+def decode_qr_batch(files, workers=None):
+    """Decode banyak foto (atau ZIP berisi foto) secara paralel dengan thread pool
+
+    files berisi pasangan (nama file, bytes). Kembalikan list
+    {"file", "ids", "error"} per gambar, berisi semua QR yang terbaca.
+    """
+    images = _expand_images(files)
+    workers = workers or DECODE_WORKERS or min(8, (os.cpu_count() or 1) + 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_decode_one, images))
+
+def reconcile_stocktake(hasil_decode, df_alat=None):
+    """Laporan stocktake: alat yang terscan, alat yang tidak terscan, dan ID tidak dikenal"""
+    if df_alat is None:
+        df_alat = get_all_alat()
+    index = {alat_id: pos for pos, alat_id in enumerate(df_alat['ID'].tolist())}
+    file_per_id = {}
+    for hasil in hasil_decode:
+        for alat_id in hasil["ids"]:
+            file_per_id.setdefault(alat_id, []).append(hasil["file"])
+
+    posisi_terlihat, tidak_dikenal = [], []
+    for alat_id, nama_file in file_per_id.items():
+        if alat_id in index:
+            posisi_terlihat.append(index[alat_id])
+        else:
+            tidak_dikenal.append({"ID": alat_id, "Jumlah_Scan": len(nama_file), "File": ", ".join(nama_file)})
+
+    terlihat = df_alat.iloc[sorted(posisi_terlihat)][['ID', 'Nama', 'Kondisi']].copy()
+    terlihat['Jumlah_Scan'] = terlihat['ID'].map(lambda a: len(file_per_id[a]))
+    mask_tidak = pd.Series(True, index=range(len(df_alat)))
+    mask_tidak[posisi_terlihat] = False
+    tidak_terscan = df_alat[mask_tidak.values][['ID', 'Nama', 'Kondisi']]
+    return {
+        "terlihat": terlihat,
+        "tidak_terscan": tidak_terscan,
+        "tidak_dikenal": pd.DataFrame(tidak_dikenal, columns=["ID", "Jumlah_Scan", "File"]),
+        "gagal": [h for h in hasil_decode if h["error"] or not h["ids"]],
+    }
 
 # ==================== FUNGSI VALIDASI ====================
 
@@ -287,3 +3530,217 @@ def validate_input(nama):
     if not nama or nama.strip() == "":
         errors.append("Nama alat tidak boleh kosong")
     return errors
+
+# ==================== FUNGSI BATCH / IMPORT ====================
+
+def read_import_file(file, file_name=None):
+    """Baca file import CSV/XLSX (path atau file upload) menjadi DataFrame"""
+    file_name = file_name or getattr(file, "name", None) or str(file)
+    if file_name.lower().endswith(".csv"):
+        return pd.read_csv(file)
+    return pd.read_excel(file)
+
+def _teks(value, default=""):
+    """Nilai sel sebagai string (sel kosong -> default)"""
+    value = _kosongkan_nan(value)
+    return default if value is None else str(value).strip()
+
+def _lapor(progress, fraksi, pesan):
+    if progress is not None:
+        progress(fraksi, pesan)
+
+def add_alat_many(data, progress=None):
+    """Tambah banyak alat sekaligus dari DataFrame / file CSV / XLSX
+
+    Semua baris divalidasi dulu (validate_input), ID dialokasikan satu blok, lalu baris
+    yang valid disimpan dengan satu kali tulis. Kembalikan {"ids": [...], "errors": [...]}
+    dengan errors berisi (nomor baris spreadsheet, pesan).
+    """
+    df = data if isinstance(data, pd.DataFrame) else read_import_file(data)
+    _lapor(progress, 0.1, "Validasi data")
+    rows, errors = [], []
+    for pos, row in enumerate(df.to_dict('records')):
+        baris = pos + 2  # baris 1 adalah header
+        nama = _teks(row.get("Nama"))
+        kondisi = _teks(row.get("Kondisi"), "Baik")
+        pesan = validate_input(nama)
+        if kondisi not in KONDISI_OPTIONS:
+            pesan.append(f"Kondisi '{kondisi}' tidak dikenal")
+        tanggal_beli = _teks(row.get("Tanggal_Beli"), str(pd.Timestamp.today().date()))
+        if _nilai_simpan("Tanggal_Beli", tanggal_beli) is None:
+            pesan.append(f"Tanggal_Beli '{tanggal_beli}' bukan tanggal YYYY-MM-DD")
+        if pesan:
+            errors.extend((baris, p) for p in pesan)
+            continue
+        rows.append({
+            "Nama": nama,
+            "Kondisi": kondisi,
+            "Tanggal_Beli": tanggal_beli,
+            "Keterangan": _teks(row.get("Keterangan")),
+        })
+    if not rows:
+        _lapor(progress, 1.0, "Tidak ada baris valid")
+        return {"ids": [], "errors": errors}
+
+    _lapor(progress, 0.4, "Alokasi ID")
+    backend = get_backend()
+    with backend.write_lock():
+        ids = allocate_ids("alat", len(rows))
+        for new_id, row in zip(ids, rows):
+            row["ID"] = new_id
+        _lapor(progress, 0.7, f"Menyimpan {len(rows)} alat")
+        backend.insert_alat_many(rows)
+    _lapor(progress, 1.0, "Selesai")
+    return {"ids": ids, "errors": errors}
+
+def add_servis_many(data, progress=None):
+    """Tambah banyak catatan servis sekaligus dari DataFrame / file CSV / XLSX"""
+    df = data if isinstance(data, pd.DataFrame) else read_import_file(data)
+    _lapor(progress, 0.1, "Validasi data")
+    backend = get_backend()
+    with backend.write_lock():
+        # Cukup cek ID yang dirujuk, bukan membaca seluruh tabel alat (POST satu servis dari API)
+        dirujuk = list(dict.fromkeys(_teks(v) for v in df['ID_Alat'])) if 'ID_Alat' in df.columns else []
+        id_alat = set(backend.get_alat_many(dirujuk)['ID'])
+        rows, errors = [], []
+        for pos, row in enumerate(df.to_dict('records')):
+            baris = pos + 2
+            alat_id = _teks(row.get("ID_Alat"))
+            pesan = []
+            if alat_id not in id_alat:
+                pesan.append(f"ID alat '{alat_id}' tidak ditemukan")
+            try:
+                biaya = _biaya_bulat(row.get("Biaya"))
+            except ValueError:
+                biaya = None
+            if biaya is None or biaya < 0:
+                pesan.append("Biaya harus bilangan bulat >= 0")
+            tanggal = _teks(row.get("Tanggal"))
+            if not tanggal:
+                pesan.append("Tanggal tidak boleh kosong")
+            elif _nilai_simpan("Tanggal", tanggal) is None:
+                pesan.append(f"Tanggal '{tanggal}' bukan tanggal YYYY-MM-DD")
+            if pesan:
+                errors.extend((baris, p) for p in pesan)
+                continue
+            rows.append({
+                "ID_Alat": alat_id,
+                "Tanggal": tanggal,
+                "Jenis_Servis": _teks(row.get("Jenis_Servis"), "Lainnya"),
+                "Biaya": biaya,
+                "Keterangan": _teks(row.get("Keterangan")),
+            })
+        if not rows:
+            _lapor(progress, 1.0, "Tidak ada baris valid")
+            return {"ids": [], "errors": errors}
+        _lapor(progress, 0.4, "Alokasi ID")
+        ids = allocate_ids("servis", len(rows))
+        for new_id, row in zip(ids, rows):
+            row["ID_Servis"] = new_id
+        _lapor(progress, 0.7, f"Menyimpan {len(rows)} catatan servis")
+        backend.insert_servis_many(rows)
+    _lapor(progress, 1.0, "Selesai")
+    return {"ids": ids, "errors": errors}
+
+def update_kondisi_many(data, progress=None):
+    """Update Kondisi banyak alat sekaligus (stocktake)
+
+    data boleh dict {ID: Kondisi}, DataFrame / file dengan kolom ID dan Kondisi.
+    Kembalikan {"updated": jumlah, "errors": [...]}.
+    """
+    if isinstance(data, dict):
+        df = pd.DataFrame({"ID": list(data.keys()), "Kondisi": list(data.values())})
+    else:
+        df = data if isinstance(data, pd.DataFrame) else read_import_file(data)
+    _lapor(progress, 0.1, "Validasi data")
+    backend = get_backend()
+    with backend.write_lock():
+        dirujuk = list(dict.fromkeys(_teks(v) for v in df['ID'])) if 'ID' in df.columns else []
+        id_alat = set(backend.get_alat_many(dirujuk)['ID'])
+        updates, errors = [], []
+        for pos, row in enumerate(df.to_dict('records')):
+            baris = pos + 2
+            alat_id = _teks(row.get("ID"))
+            kondisi = _teks(row.get("Kondisi"))
+            if alat_id not in id_alat:
+                errors.append((baris, f"ID alat '{alat_id}' tidak ditemukan"))
+            elif kondisi not in KONDISI_OPTIONS:
+                errors.append((baris, f"Kondisi '{kondisi}' tidak dikenal"))
+            else:
+                updates.append((alat_id, {"Kondisi": kondisi}))
+        updated = 0
+        if updates:
+            _lapor(progress, 0.6, f"Menyimpan {len(updates)} perubahan kondisi")
+            updated = backend.update_alat_many(updates)
+    _lapor(progress, 1.0, "Selesai")
+    return {"updated": updated, "errors": errors}
+
+# ==================== PASANG INSTRUMENTASI ====================
+# Fungsi dibungkus lewat nama global, sehingga panggilan antar fungsi di modul ini maupun
+# `from utils import ...` (dilakukan setelah modul selesai dimuat) ikut terukur.
+INSTRUMENTED_FUNCTIONS = [
+    "init_excel", "get_all_alat", "get_alat_by_id", "add_alat", "update_alat", "delete_alat",
+    "filter_alat", "search_alat", "autocomplete_id", "get_all_servis", "get_riwayat_servis",
+    "join_nama_alat", "add_servis", "get_alat_page", "get_servis_page", "alat_options",
+    "get_statistik", "get_chart_kondisi", "get_alat_aggregate", "get_servis_terbaru", "get_scan_card",
+    "get_rollup_biaya", "get_biaya_periode", "get_biaya_per_jenis", "get_top_alat_biaya",
+    "render_chart_kondisi", "generate_qr", "_render_qr_png", "save_qr_to_file", "generate_qr_bulk",
+    "export_qr_zip", "export_qr_label_sheet", "decode_qr", "decode_qr_batch", "reconcile_stocktake",
+    "read_import_file", "add_alat_many", "add_servis_many", "update_kondisi_many",
+    "export_to_excel", "export_servis", "migrate_excel_to_sqlite", "allocate_ids",
+]
+for _nama in INSTRUMENTED_FUNCTIONS:
+    globals()[_nama] = instrument(_nama)(globals()[_nama])
+for _kelas, _metode in [
+    (ExcelBackend, "_parse"), (ExcelBackend, "compact"), (ExcelBackend, "_append_journal"),
+    (ExcelBackend, "_current_state"), (SQLiteBackend, "_query"), (SQLiteBackend, "page"),
+]:
+    setattr(_kelas, _metode, instrument(f"{_kelas.name}.{_metode.lstrip('_')}")(getattr(_kelas, _metode)))
+del _nama, _kelas, _metode
+
+# ==================== CLI ====================
+
+if __name__ == "__main__":
+    import sys
+
+    perintah = sys.argv[1] if len(sys.argv) > 1 else ""
+    if perintah == "migrate":
+        init_folders()
+        hasil = migrate_excel_to_sqlite()
+        print(f"Migrasi selesai: {hasil['alat']} alat, {hasil['servis']} servis -> {SQLITE_FILE}")
+    elif perintah == "export":
+        tujuan = sys.argv[2] if len(sys.argv) > 2 else "laporan_peralatan.xlsx"
+        print(f"Export selesai: {export_to_excel(tujuan)}")
+    elif perintah == "export-servis":
+        # Riwayat servis ke CSV/XLSX per chunk; format mengikuti ekstensi file
+        tujuan = sys.argv[2] if len(sys.argv) > 2 else "riwayat_servis.csv"
+        init_folders()
+        file_format = "XLSX" if tujuan.lower().endswith(".xlsx") else "CSV"
+        print(f"Export selesai: {export_servis(tujuan, file_format)}")
+    elif perintah == "snapshot":
+        # Bangun ulang snapshot kolumnar dari workbook (misal setelah mengganti versi pyarrow)
+        remove_snapshot()
+        invalidate_cache()
+        df_alat, df_servis = ExcelBackend(EXCEL_FILE)._parse()
+        print(f"Snapshot dibuat: {len(df_alat)} alat, {len(df_servis)} servis")
+    elif perintah == "arsip":
+        # Segel servis tahun-tahun lalu sekarang (biasanya terjadi saat compaction) lalu tampilkan partisinya
+        init_folders()
+        backend = ExcelBackend(EXCEL_FILE)
+        backend.init()
+        backend.compact()
+        with _journal_lock:
+            state = backend._current_state()
+            arsip, n_panas = state["arsip"], len(state["servis"])
+        for tahun in arsip.tahun():
+            p = arsip.partisi[tahun]
+            print(f"{tahun}: {p['jumlah']} servis, Rp {p['biaya']:,.0f} -> {arsip.path(tahun)}")
+        print(f"Partisi panas: {n_panas} servis -> {EXCEL_FILE}")
+    elif perintah == "memori":
+        # Memori per kolom tanpa dan dengan skema dtype
+        init_folders()
+        laporan = memory_report()
+        print(laporan.to_string(index=False))
+        print(f"Total: {laporan['Sebelum'].sum() / 1024:,.1f} KB -> {laporan['Sesudah'].sum() / 1024:,.1f} KB")
+    else:
+        print("Penggunaan: python utils.py [migrate | export <file.xlsx> | export-servis <file.csv|.xlsx> | snapshot | arsip | memori]")